@@ -0,0 +1,27 @@
+"""
+URL configuration for requests served through BE/asgi.py.
+
+The hot read endpoints resolve to the async views in
+portfolio/async_views.py and company/async_views.py; everything else falls
+through to the regular URLconf. Selected by BE.middleware.asgi_urlconf.
+"""
+from django.urls import path, re_path
+
+from company.async_views import AsyncCompanyProfileViewSet, AsyncFeaturedDeveloperViewSet
+from portfolio.async_views import AsyncPortfolioViewSet, AsyncProjectViewSet, AsyncBlogPostViewSet
+
+from . import urls
+
+urlpatterns = [
+    re_path(
+        r'^api/portfolios/(?P<username>[^/.]+)/$',
+        AsyncPortfolioViewSet.as_view({'get': 'retrieve'}), name='portfolio-detail',
+    ),
+    path('api/company/profile/', AsyncCompanyProfileViewSet.as_view({'get': 'list'}), name='company-profile-list'),
+    path(
+        'api/company/featured-developers/best/',
+        AsyncFeaturedDeveloperViewSet.as_view({'get': 'best'}), name='featured-developers-best',
+    ),
+    path('api/<str:username>/projects/', AsyncProjectViewSet.as_view({'get': 'list'}), name='portfolio-projects'),
+    path('api/<str:username>/blog/', AsyncBlogPostViewSet.as_view({'get': 'list'}), name='portfolio-blog'),
+] + urls.urlpatterns
@@ -0,0 +1,65 @@
+"""
+Project middleware.
+
+asgi_urlconf routes requests served under ASGI to the async views of the
+hot read endpoints (settings.ASGI_URLCONF). CompressionMiddleware encodes
+JSON responses with gzip, brotli or zstd.
+"""
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import sync_and_async_middleware
+from django.utils.deprecation import MiddlewareMixin
+
+from portfolio import compression
+
+
+@sync_and_async_middleware
+def asgi_urlconf(get_response):
+    """Resolve requests served under ASGI against settings.ASGI_URLCONF"""
+    if not iscoroutinefunction(get_response):
+        return get_response
+
+    async def middleware(request):
+        if settings.ASGI_URLCONF:
+            request.urlconf = settings.ASGI_URLCONF
+        return await get_response(request)
+
+    return middleware
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """
+    Compress JSON responses with the best coding the client accepts (see
+    portfolio/compression.py). Responses from the response cache carry
+    their encodings in `precompressed` and are sent without compressing.
+    Only API JSON is compressed, and it holds no secrets, so unlike
+    GZipMiddleware no random padding is added against BREACH.
+    """
+
+    def process_response(self, request, response):
+        if not compression.is_compressible(response):
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = compression.negotiate(request.META.get('HTTP_ACCEPT_ENCODING'))
+        if coding is None:
+            return response
+        precompressed = getattr(response, 'precompressed', None)
+        if precompressed is not None:
+            # None when compressing did not make it smaller
+            body = precompressed.get(coding)
+        else:
+            body = compression.compress(coding, response.content)
+            if len(body) >= len(response.content):
+                body = None
+        if body is None:
+            return response
+        response.content = body
+        response['Content-Length'] = str(len(body))
+        # Weak, as the bytes differ from the identity response's; the
+        # conditional GET checks compare ETags weakly
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = coding
+        return response
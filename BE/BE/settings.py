@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'BE.middleware.asgi_urlconf',
+    'BE.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,6 +62,11 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'BE.urls'
 
+# Requests served through BE/asgi.py resolve here first, so the hot read
+# endpoints get their async views (see portfolio/async_views.py); None
+# serves ASGI requests from the sync views
+ASGI_URLCONF = 'BE.asgi_urls'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -70,6 +77,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'company.context_processors.company_profile',
             ],
         },
     },
@@ -89,6 +97,83 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'portfolio',
+    },
+    # View/download counts waiting to be written (see portfolio/counters.py);
+    # apart from 'default' so that culling response entries never drops a count
+    'counters': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'counters',
+        'OPTIONS': {'MAX_ENTRIES': 1_000_000},
+    },
+}
+
+# Versioned response cache for the public read API (see portfolio/cache.py)
+PORTFOLIO_CACHE_ALIAS = 'default'
+PORTFOLIO_CACHE_TIMEOUT = 60 * 60
+# username -> portfolio id lookups (see portfolio/resolver.py)
+PORTFOLIO_RESOLVER_TIMEOUT = 5 * 60
+
+# BlogPost.views / Resource.downloads are buffered in the cache and written
+# in batches (see portfolio/counters.py); set to False to write immediately.
+# The counter cache must not evict. With LocMem each process flushes its own
+# counts; point it at a shared memcached/redis to flush from the worker.
+COUNTER_BUFFERING = True
+COUNTER_CACHE_ALIAS = 'counters'
+COUNTER_FLUSH_INTERVAL = 10  # seconds
+
+# Responsive image derivatives (see portfolio/images.py); formats that the
+# installed Pillow cannot encode are skipped
+IMAGE_DERIVATIVE_WIDTHS = [160, 320, 640, 1280]
+IMAGE_DERIVATIVE_FORMATS = ['avif', 'webp']
+
+# Background jobs run by `manage.py runworker` (see portfolio/jobs.py).
+# JOBS_EAGER runs each job right after the enqueueing transaction commits,
+# for development without a worker.
+JOBS_EAGER = False
+JOB_RETRY_BACKOFF = 10  # seconds, doubled on every retry
+JOB_TIMEOUT = 10 * 60  # seconds before a running job is considered lost
+JOB_RETENTION_DAYS = 7  # finished jobs are purged by the worker after this
+
+# Token buckets for the contact and newsletter POSTs, per client IP and
+# portfolio (see portfolio/throttling.py): scope -> (burst, tokens per minute)
+WRITE_RATE_LIMITS = {
+    'contact': (5, 1),
+    'newsletter': (5, 2),
+}
+# Buffer accepted contact messages and subscriptions in the cache and insert
+# them in batches (see portfolio/coalescing.py); needs a shared cache that
+# does not evict, and a worker.
+WRITE_COALESCING = False
+WRITE_COALESCING_INTERVAL = 2  # seconds
+
+# Resource and resume downloads (see portfolio/delivery.py) are streamed by
+# Django with Range support, or handed to the front proxy with
+# 'x-accel-redirect' (nginx, serving FILE_DELIVERY_ACCEL_PREFIX from
+# MEDIA_ROOT as an internal location) or 'x-sendfile' (Apache, lighttpd).
+FILE_DELIVERY = None
+FILE_DELIVERY_ACCEL_PREFIX = '/protected-media/'
+
+# JSON responses are compressed with the first of these codings that the
+# client accepts (see portfolio/compression.py); 'br' needs the brotli
+# package and 'zstd' the zstandard package, and are skipped without them
+RESPONSE_COMPRESSION_CODINGS = ['br', 'zstd', 'gzip']
+RESPONSE_COMPRESSION_MIN_SIZE = 512  # bytes
+
+# Compiled serializer fields and orjson encoding for the read API (see
+# portfolio/fastjson.py); the output is the same as DRF's either way
+FAST_SERIALIZATION = True
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+DEFAULT_FROM_EMAIL = 'noreply@dev-link.cloud'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -129,6 +214,15 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = 'media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are named by content hash and stored once (see portfolio/storage.py)
+STORAGES = {
+    'default': {'BACKEND': 'portfolio.storage.ContentAddressedStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Output of `manage.py export_static` (see portfolio/export.py)
+STATIC_EXPORT_ROOT = BASE_DIR / 'export'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -156,9 +250,13 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'portfolio.fastjson.FastJSONRenderer',
         'rest_framework.renderers.BrowsableAPIRenderer',
     ],
+    # Requests come through one reverse proxy (see SECURE_PROXY_SSL_HEADER),
+    # which appends the client address to X-Forwarded-For; the rate limits
+    # tell clients apart by that entry
+    'NUM_PROXIES': 1,
 }
 
 SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
\ No newline at end of file
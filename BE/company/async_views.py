@@ -0,0 +1,38 @@
+from rest_framework.decorators import action
+from portfolio.async_views import AsyncReadMixin
+from portfolio.conditional import aaggregate_content_state
+from . import carousel, profile as company_profile
+from .views import CompanyProfileViewSet, FeaturedDeveloperViewSet
+
+
+class AsyncCompanyProfileViewSet(AsyncReadMixin, CompanyProfileViewSet):
+    """ASGI version of CompanyProfileViewSet (see portfolio/async_views.py)"""
+
+    async def aget_content_state(self):
+        return (await self.aget_entry()).state
+
+    async def aget_entry(self):
+        if not hasattr(self, '_entry'):
+            self._entry = await company_profile.aget_entry()
+        return self._entry
+
+    async def list(self, request, *args, **kwargs):
+        return self.profile_response(await self.aget_entry())
+
+
+class AsyncFeaturedDeveloperViewSet(AsyncReadMixin, FeaturedDeveloperViewSet):
+    """ASGI version of FeaturedDeveloperViewSet (see portfolio/async_views.py)"""
+
+    async def aget_content_state(self):
+        if self.action_map.get(self.request.method.lower()) == 'best':
+            return (await self.aget_snapshot())['state']
+        return await aaggregate_content_state(self.queryset, 'updated_at', 'portfolio__updated_at')
+
+    async def aget_snapshot(self):
+        if not hasattr(self, '_snapshot'):
+            self._snapshot = await carousel.aget(self.request)
+        return self._snapshot
+
+    @action(detail=False, methods=['get'])
+    async def best(self, request):
+        return self.snapshot_response(await self.aget_snapshot())
@@ -0,0 +1,26 @@
+"""Company parts for portfolio page bundles (see portfolio/bundle.py)"""
+from portfolio.bundle import register
+from portfolio.conditional import aggregate_content_state
+from . import carousel, profile
+from .views import FeaturedDeveloperViewSet
+
+
+def render_company_profile(context):
+    entry = profile.get_entry()
+    if entry.profile is None:
+        return None
+    return profile.serialize(entry, context['request'])
+
+
+def render_featured_developers(context):
+    return carousel.get_data(context['request'])
+
+
+register(
+    'company_profile', render_company_profile,
+    state=lambda: profile.get_entry().state,
+)
+register(
+    'featured_developers', render_featured_developers,
+    state=lambda: aggregate_content_state(FeaturedDeveloperViewSet.queryset, 'updated_at', 'portfolio__updated_at'),
+)
@@ -0,0 +1,104 @@
+"""
+Pre-rendered snapshot of the featured developers carousel.
+
+`featured-developers/best/` serves the JSON stored here, with validators
+from the state recorded at build time, so steady-state requests make no
+database queries. Image URLs are absolute, so there is one snapshot per
+base URL (scheme and host). Snapshots live in the portfolio cache under a
+version that signals.py bumps whenever a FeaturedDeveloper, Portfolio or
+Skill changes; the change also queues a rebuild job for every base URL
+served so far. A missing snapshot is rebuilt by the next request.
+"""
+import hashlib
+import json
+from urllib.parse import urljoin
+
+from asgiref.sync import sync_to_async
+from rest_framework.renderers import JSONRenderer
+
+from portfolio import cache, jobs
+from portfolio.conditional import aggregate_content_state
+from .models import FeaturedDeveloper
+from .serializers import FeaturedDeveloperSerializer
+
+NAMESPACE = 'company:featured-developers'
+BASES_KEY = 'company:featured-developers:bases'
+REBUILD_LOCK_KEY = 'company:featured-developers:rebuild-queued'
+
+# Developers shown in the carousel
+SIZE = 12
+
+
+class BaseURL:
+    """Stands in for the request in serializers that only build absolute URLs"""
+
+    def __init__(self, base):
+        self.base = base
+
+    def build_absolute_uri(self, location):
+        return urljoin(self.base, location)
+
+
+def get_queryset():
+    return FeaturedDeveloper.objects.filter(
+        is_active=True,
+        portfolio__is_active=True
+    ).select_related('portfolio').prefetch_related('portfolio__skills')
+
+
+def get_base(request):
+    return request.build_absolute_uri('/')
+
+
+def _key(base):
+    return f'snapshot:{hashlib.md5(base.encode()).hexdigest()}'
+
+
+def build(base):
+    """
+    Render the carousel for a base URL and store it. Returns the snapshot:
+    {'state': content state, 'content': JSON bytes}.
+    """
+    key = cache.versioned_key(NAMESPACE, _key(base))
+    queryset = get_queryset()
+    state = aggregate_content_state(queryset, 'updated_at', 'portfolio__updated_at')
+    data = FeaturedDeveloperSerializer(queryset[:SIZE], many=True, context={'request': BaseURL(base)}).data
+    snapshot = {'state': state, 'content': JSONRenderer().render(data)}
+    cache.get_cache().set(key, snapshot, None)
+    bases = cache.get_cache().get(BASES_KEY, set())
+    if base not in bases:
+        cache.get_cache().set(BASES_KEY, bases | {base}, None)
+    return snapshot
+
+
+def get(request):
+    """The snapshot for the request's base URL, built if missing"""
+    base = get_base(request)
+    snapshot = cache.get_cache().get(cache.versioned_key(NAMESPACE, _key(base)))
+    return snapshot or build(base)
+
+
+async def aget(request):
+    """Async get()"""
+    base = get_base(request)
+    snapshot = await cache.acall('get', await cache.aversioned_key(NAMESPACE, _key(base)))
+    return snapshot or await sync_to_async(build)(base)
+
+
+def get_data(request):
+    return json.loads(get(request)['content'])
+
+
+def rebuild(bases=()):
+    """Rebuild the snapshot for `bases` and every base URL served so far"""
+    cache.get_cache().delete(REBUILD_LOCK_KEY)
+    bases = set(bases) | cache.get_cache().get(BASES_KEY, set())
+    return {base: build(base) for base in sorted(bases)}
+
+
+def invalidate():
+    """Drop every snapshot and queue one rebuild for all of them"""
+    cache.bump_version(NAMESPACE)
+    # A change made while a rebuild is queued is picked up by that rebuild
+    if cache.get_cache().add(REBUILD_LOCK_KEY, 1, jobs.get_timeout()):
+        jobs.enqueue(rebuild)
@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from .profile import get_active_profile
+
+
+def company_profile(request):
+    """The active CompanyProfile as `company_profile`, e.g. for meta tags; loaded on first use"""
+    return {'company_profile': SimpleLazyObject(get_active_profile)}
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from company import carousel
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the pre-rendered featured developers carousel'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'bases', nargs='*',
+            help='Base URLs to build for, e.g. https://api.example.com/, besides those served so far',
+        )
+
+    def handle(self, *args, **options):
+        for base in options['bases']:
+            if not base.startswith(('http://', 'https://')):
+                raise CommandError(f'Expected an http(s):// base URL, got {base!r}')
+        snapshots = carousel.rebuild(base.rstrip('/') + '/' for base in options['bases'])
+        if not snapshots:
+            self.stdout.write('No base URLs served yet; pass one to build for it')
+            return
+        for base, snapshot in snapshots.items():
+            self.stdout.write(f'{base}: {len(snapshot["content"])} bytes')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {len(snapshots)} snapshots'))
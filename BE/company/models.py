@@ -8,6 +8,7 @@ class CompanyProfile(models.Model):
     tagline = models.CharField(max_length=300, blank=True)
     description = models.TextField(help_text="Company description and mission")
     logo = models.ImageField(upload_to='company/', blank=True, null=True)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     website = models.URLField(blank=True)
     email = models.EmailField(blank=True)
     phone = models.CharField(max_length=20, blank=True)
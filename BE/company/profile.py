@@ -0,0 +1,72 @@
+"""
+Process-local singleton for the active CompanyProfile.
+
+There is one active profile and it changes a few times a year, yet the
+homepage asks for it on every visit. Each process keeps the profile, its
+content state and its serialized form in memory, tagged with a version
+number from the portfolio cache. Saving or deleting a CompanyProfile bumps
+that version (see signals.py), so every process sharing the cache backend
+reloads on its next request; in steady state a request costs one cache read
+and no queries. Serialized data is kept per base URL, since the logo URLs
+are absolute.
+"""
+from collections import namedtuple
+
+from asgiref.sync import sync_to_async
+
+from portfolio import cache
+from portfolio.conditional import aggregate_content_state
+from .models import CompanyProfile
+from .serializers import CompanyProfileSerializer
+
+NAMESPACE = 'company:profile'
+
+Entry = namedtuple('Entry', ['version', 'profile', 'state', 'data'])
+
+_entry = None
+
+
+def _load(version):
+    queryset = CompanyProfile.objects.filter(is_active=True)
+    return Entry(version, queryset.first(), aggregate_content_state(queryset, 'updated_at'), {})
+
+
+def _current(version):
+    global _entry
+    entry = _entry
+    if entry is None or entry.version != version:
+        # Read the version before loading: a change made meanwhile bumps it
+        # again and the next request reloads
+        entry = _entry = _load(version)
+    return entry
+
+
+def get_entry():
+    return _current(cache.get_version(NAMESPACE))
+
+
+async def aget_entry():
+    """Async get_entry()"""
+    version = await cache.aget_version(NAMESPACE)
+    entry = _entry
+    if entry is not None and entry.version == version:
+        return entry
+    return await sync_to_async(_current)(version)
+
+
+def get_active_profile():
+    """The active CompanyProfile, or None"""
+    return get_entry().profile
+
+
+def serialize(entry, request):
+    """CompanyProfileSerializer data for the entry's profile, built once per base URL"""
+    base = request.build_absolute_uri('/')
+    data = entry.data.get(base)
+    if data is None:
+        data = entry.data[base] = CompanyProfileSerializer(entry.profile, context={'request': request}).data
+    return data
+
+
+def invalidate():
+    cache.bump_version(NAMESPACE)
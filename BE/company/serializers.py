@@ -1,16 +1,18 @@
 from rest_framework import serializers
 from .models import CompanyProfile, FeaturedDeveloper
-from portfolio.serializers import PortfolioSummarySerializer, PortfolioSerializer, SkillSerializer
+from portfolio.serializers import PortfolioSummarySerializer, PortfolioSerializer, SkillSerializer, SrcsetField
+from portfolio.fastjson import CompiledFieldsMixin
 from portfolio.models import Portfolio
 
 
-class CompanyProfileSerializer(serializers.ModelSerializer):
+class CompanyProfileSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     services_list = serializers.SerializerMethodField()
+    logo_srcset = SrcsetField('logo')
     
     class Meta:
         model = CompanyProfile
         fields = [
-            'id', 'name', 'tagline', 'description', 'logo', 'website',
+            'id', 'name', 'tagline', 'description', 'logo', 'logo_srcset', 'website',
             'email', 'phone', 'address', 'services', 'services_list',
             'linkedin_url', 'github_url', 'twitter_url',
             'meta_title', 'meta_description', 'is_active',
@@ -22,16 +24,17 @@ class CompanyProfileSerializer(serializers.ModelSerializer):
         return obj.get_services_list()
 
 
-class PortfolioCarouselSerializer(serializers.ModelSerializer):
+class PortfolioCarouselSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     """Serializer for portfolio carousel with skills"""
     skills = SkillSerializer(many=True, read_only=True)
+    profile_image_srcset = SrcsetField('profile_image')
     
     class Meta:
         model = Portfolio
-        fields = ['id', 'username', 'name', 'tagline', 'profile_image', 'theme_color', 'skills']
+        fields = ['id', 'username', 'name', 'tagline', 'profile_image', 'profile_image_srcset', 'theme_color', 'skills']
 
 
-class FeaturedDeveloperSerializer(serializers.ModelSerializer):
+class FeaturedDeveloperSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     portfolio = PortfolioCarouselSerializer(read_only=True)
     
     class Meta:
@@ -43,7 +46,7 @@ class FeaturedDeveloperSerializer(serializers.ModelSerializer):
         read_only_fields = ['featured_since', 'updated_at']
 
 
-class FeaturedDeveloperDetailSerializer(serializers.ModelSerializer):
+class FeaturedDeveloperDetailSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     """Detailed serializer with full portfolio information"""
     portfolio = PortfolioSerializer(read_only=True)
     
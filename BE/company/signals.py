@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from portfolio.models import Portfolio, Skill
+from . import carousel, profile
+from .models import CompanyProfile, FeaturedDeveloper
+
+# Models rendered in the featured developers carousel
+CAROUSEL_MODELS = (FeaturedDeveloper, Portfolio, Skill)
+
+
+@receiver([post_save, post_delete])
+def invalidate_carousel(sender, instance, **kwargs):
+    if sender not in CAROUSEL_MODELS:
+        return
+    # Bump again on commit, as for the portfolio response cache; registered
+    # first so that an eager rebuild job runs after it
+    transaction.on_commit(carousel.invalidate)
+    carousel.invalidate()
+
+
+@receiver([post_save, post_delete], sender=CompanyProfile)
+def invalidate_profile(sender, instance, **kwargs):
+    profile.invalidate()
+    transaction.on_commit(profile.invalidate)
@@ -1,3 +1,191 @@
-from django.test import TestCase
+from io import StringIO
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.template import engines
+from django.test import RequestFactory, TestCase
+from rest_framework.test import APIClient
+
+from portfolio import cache
+from portfolio.models import Job, Portfolio, Skill
+from . import carousel, profile
+from .models import CompanyProfile, FeaturedDeveloper
+
+
+class CompanyConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.profile = CompanyProfile.objects.create(description='About us', services='Web, AI')
+        user = User.objects.create(username='jane')
+        self.portfolio = Portfolio.objects.create(user=user, username='jane')
+        FeaturedDeveloper.objects.create(portfolio=self.portfolio)
+
+    def test_profile_etag_round_trip(self):
+        etag = self.client.get('/api/company/profile/')['ETag']
+        response = self.client.get('/api/company/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.profile.tagline = 'New tagline'
+        self.profile.save()
+        response = self.client.get('/api/company/profile/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_featured_developers_follow_portfolio_changes(self):
+        url = '/api/company/featured-developers/best/'
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        self.portfolio.tagline = 'Updated'
+        self.portfolio.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        for username in ['jane', 'john']:
+            user = User.objects.create(username=username)
+            portfolio = Portfolio.objects.create(user=user, username=username, tagline=f'{username} tagline')
+            FeaturedDeveloper.objects.create(portfolio=portfolio)
+
+    def aget(self, path, **headers):
+        return async_to_sync(self.async_client.get)(path, headers=headers)
+
+    def test_async_views_render_the_sync_representation(self):
+        # No profile yet: both answer 404
+        self.assertEqual(self.aget('/api/company/profile/').status_code, 404)
+        CompanyProfile.objects.create(description='About us', services='Web, AI')
+        for path in ['/api/company/profile/', '/api/company/featured-developers/best/']:
+            expected = self.client.get(path)
+            response = self.aget(path)
+            self.assertEqual(response.status_code, 200, path)
+            self.assertEqual(response.content, expected.content, path)
+            self.assertEqual(response['ETag'], expected['ETag'], path)
+            self.assertEqual(self.aget(path, if_none_match=response['ETag']).status_code, 304, path)
+
+
+class BundleTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        user = User.objects.create(username='jane')
+        portfolio = Portfolio.objects.create(user=user, username='jane')
+        FeaturedDeveloper.objects.create(portfolio=portfolio)
+        self.profile = CompanyProfile.objects.create(description='About us', services='Web, AI')
+        self.url = '/api/jane/bundle/?include=portfolio,company_profile,featured_developers'
+
+    def test_company_parts_match_their_endpoints(self):
+        bundle = self.client.get(self.url).data
+        self.assertEqual(bundle['company_profile'], self.client.get('/api/company/profile/').data)
+        self.assertEqual(
+            bundle['featured_developers'], self.client.get('/api/company/featured-developers/best/').json()
+        )
+
+    def test_company_changes_invalidate_the_bundle(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        self.profile.tagline = 'New tagline'
+        self.profile.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['company_profile']['tagline'], 'New tagline')
+
+
+class CarouselSnapshotTests(TestCase):
+    url = '/api/company/featured-developers/best/'
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        for i, username in enumerate(['jane', 'john']):
+            user = User.objects.create(username=username)
+            portfolio = Portfolio.objects.create(user=user, username=username)
+            Skill.objects.create(portfolio=portfolio, name=f'Skill {i}')
+            FeaturedDeveloper.objects.create(portfolio=portfolio, display_order=i)
+        self.portfolio = Portfolio.objects.get(username='jane')
+
+    def test_snapshot_matches_the_serialized_list(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.json(), self.client.get('/api/company/featured-developers/').json()['results'])
+        self.assertEqual(response.json()[0]['portfolio']['skills'][0]['name'], 'Skill 0')
+
+    def test_steady_state_makes_no_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_changes_rebuild_the_snapshot(self):
+        self.client.get(self.url)
+        Skill.objects.create(portfolio=self.portfolio, name='Django')
+        self.assertEqual(len(self.client.get(self.url).json()[0]['portfolio']['skills']), 2)
+        self.portfolio.tagline = 'Updated'
+        self.portfolio.save()
+        self.assertEqual(self.client.get(self.url).json()[0]['portfolio']['tagline'], 'Updated')
+        FeaturedDeveloper.objects.filter(portfolio=self.portfolio).delete()
+        self.assertEqual([d['portfolio']['username'] for d in self.client.get(self.url).json()], ['john'])
+
+    def test_changes_queue_one_rebuild_for_every_base_url(self):
+        self.client.get(self.url)
+        self.client.get(self.url, HTTP_HOST='localhost')
+        Job.objects.all().delete()
+        cache.get_cache().delete(carousel.REBUILD_LOCK_KEY)
+        self.portfolio.tagline = 'Updated'
+        self.portfolio.save()
+        self.portfolio.save()
+        self.assertEqual(Job.objects.filter(func='company.carousel.rebuild').count(), 1)
+
+        self.assertEqual(set(carousel.rebuild()), {'http://testserver/', 'http://localhost/'})
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_HOST='localhost')
+        self.assertEqual(response.json()[0]['portfolio']['tagline'], 'Updated')
+
+    def test_rebuild_command(self):
+        out = StringIO()
+        call_command('rebuild_featured_developers', 'https://api.example.com', stdout=out)
+        self.assertIn('https://api.example.com/', out.getvalue())
+        self.assertIn('https://api.example.com/', cache.get_cache().get(carousel.BASES_KEY))
+
+
+class ProfileSingletonTests(TestCase):
+    url = '/api/company/profile/'
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.profile = CompanyProfile.objects.create(
+            description='About us', services='Web, AI', meta_title='DevLink'
+        )
+
+    def test_steady_state_makes_no_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url)
+        self.assertEqual(response.data['services_list'], ['Web', 'AI'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_saves_reload_the_profile(self):
+        self.client.get(self.url)
+        self.profile.services = 'Web, AI, Mobile'
+        self.profile.save()
+        self.assertEqual(self.client.get(self.url).data['services_list'], ['Web', 'AI', 'Mobile'])
+        self.profile.is_active = False
+        self.profile.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_version_bumps_from_other_processes_reload_the_profile(self):
+        self.client.get(self.url)
+        # Another process saved the profile: same version key, no local signal
+        CompanyProfile.objects.filter(pk=self.profile.pk).update(tagline='Changed elsewhere')
+        self.assertEqual(self.client.get(self.url).data['tagline'], '')
+        cache.bump_version(profile.NAMESPACE)
+        self.assertEqual(self.client.get(self.url).data['tagline'], 'Changed elsewhere')
+
+    def test_templates_get_the_profile(self):
+        template = engines['django'].from_string('{{ company_profile.meta_title }}')
+        self.assertEqual(template.render({}, request=RequestFactory().get('/')), 'DevLink')
@@ -1,7 +1,12 @@
+import json
+
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
+from portfolio.conditional import ConditionalGetMixin, aggregate_content_state
+from . import carousel, profile as company_profile
 from .models import CompanyProfile, FeaturedDeveloper
 from .serializers import (
     CompanyProfileSerializer,
@@ -10,7 +15,7 @@ from .serializers import (
 )
 
 
-class CompanyProfileViewSet(viewsets.ReadOnlyModelViewSet):
+class CompanyProfileViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for company profile
     Returns the active company profile
@@ -18,23 +23,33 @@ class CompanyProfileViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = CompanyProfile.objects.filter(is_active=True)
     serializer_class = CompanyProfileSerializer
     
+    def get_content_state(self):
+        return self.get_entry().state
+    
+    def get_entry(self):
+        """The process-local active profile (see profile.py)"""
+        if not hasattr(self, '_entry'):
+            self._entry = company_profile.get_entry()
+        return self._entry
+    
     def list(self, request, *args, **kwargs):
         """Return the active company profile"""
-        profile = self.queryset.first()
-        if not profile:
+        return self.profile_response(self.get_entry())
+    
+    def profile_response(self, entry):
+        if not entry.profile:
             return Response(
                 {'detail': 'No active company profile found.'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        serializer = self.get_serializer(profile)
-        return Response(serializer.data)
+        return Response(company_profile.serialize(entry, self.request))
     
     def retrieve(self, request, *args, **kwargs):
         """Return the active company profile by ID"""
         return self.list(request, *args, **kwargs)
 
 
-class FeaturedDeveloperViewSet(viewsets.ReadOnlyModelViewSet):
+class FeaturedDeveloperViewSet(ConditionalGetMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for featured developers
     Returns active featured developers ordered by display_order
@@ -44,6 +59,17 @@ class FeaturedDeveloperViewSet(viewsets.ReadOnlyModelViewSet):
         portfolio__is_active=True
     ).select_related('portfolio').prefetch_related('portfolio__about', 'portfolio__skills')
     serializer_class = FeaturedDeveloperSerializer
+    conditional_actions = ('list', 'retrieve', 'best')
+    
+    def get_content_state(self):
+        if self.action_map.get(self.request.method.lower()) == 'best':
+            return self.get_snapshot()['state']
+        return aggregate_content_state(self.queryset, 'updated_at', 'portfolio__updated_at')
+    
+    def get_snapshot(self):
+        if not hasattr(self, '_snapshot'):
+            self._snapshot = carousel.get(self.request)
+        return self._snapshot
     
     def get_serializer_class(self):
         if self.action == 'retrieve':
@@ -53,6 +79,10 @@ class FeaturedDeveloperViewSet(viewsets.ReadOnlyModelViewSet):
     @action(detail=False, methods=['get'])
     def best(self, request):
         """Get best/featured developers (same as list but with explicit endpoint)"""
-        developers = self.queryset[:12]  # Limit to top 12
-        serializer = self.get_serializer(developers, many=True)
-        return Response(serializer.data)
+        return self.snapshot_response(self.get_snapshot())
+    
+    def snapshot_response(self, snapshot):
+        """Serve the pre-rendered carousel (see carousel.py)"""
+        if self.request.accepted_renderer.format == 'json':
+            return HttpResponse(snapshot['content'], content_type='application/json')
+        return Response(json.loads(snapshot['content']))
@@ -1,8 +1,10 @@
 from django.contrib import admin
+from django.utils import timezone
+from . import subscribers
 from .models import (
     Portfolio, About, Skill, Project, CaseStudy, Service,
     Testimonial, Achievement, BlogPost, Resource, Newsletter,
-    ContactMessage, Hobby
+    ContactMessage, Hobby, Tag, Technology, Job
 )
 
 
@@ -162,6 +164,15 @@ class NewsletterAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'portfolio', 'subscribed_at']
     search_fields = ['email', 'name']
     list_editable = ['is_active']
+    actions = ['export_csv', 'export_ndjson']
+
+    @admin.action(description='Export selected subscribers as CSV')
+    def export_csv(self, request, queryset):
+        return subscribers.export_response(request, queryset, 'csv', 'subscribers', subscribers.ALL_PORTFOLIO_FIELDS)
+
+    @admin.action(description='Export selected subscribers as NDJSON')
+    def export_ndjson(self, request, queryset):
+        return subscribers.export_response(request, queryset, 'ndjson', 'subscribers', subscribers.ALL_PORTFOLIO_FIELDS)
 
 
 @admin.register(ContactMessage)
@@ -181,6 +192,27 @@ class HobbyAdmin(admin.ModelAdmin):
     list_editable = ['order']
 
 
+@admin.register(Tag, Technology)
+class NormalizedNameAdmin(admin.ModelAdmin):
+    # Rows are derived from BlogPost.tags / Project.technologies on save
+    list_display = ['name', 'slug']
+    search_fields = ['name', 'slug']
+    readonly_fields = ['slug']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['func', 'status', 'attempts', 'run_at', 'locked_by', 'updated_at']
+    list_filter = ['status', 'func']
+    search_fields = ['func', 'idempotency_key']
+    readonly_fields = ['created_at', 'updated_at', 'last_error']
+    actions = ['retry']
+
+    @admin.action(description='Queue selected jobs again')
+    def retry(self, request, queryset):
+        queryset.exclude(status='running').update(status='queued', attempts=0, run_at=timezone.now())
+
+
 # Customize admin site
 admin.site.site_header = 'Portfolio Admin'
 admin.site.site_title = 'Portfolio Admin'
@@ -0,0 +1,174 @@
+"""
+ASGI-native versions of the hot read endpoints.
+
+Under ASGI, Django runs a sync view through sync_to_async on the single
+thread shared by every sync view, so concurrent requests queue behind each
+other's database and cache round trips. The views here are the regular
+viewsets with their GET actions written as coroutines: the validators, the
+response cache and the querysets go through the async cache and ORM APIs,
+and negotiation, serialization and JSON rendering run on the event loop.
+With a process-local cache (LocMem) a 304 or a cached response is served
+without leaving the loop; other backends' async methods still run their
+sync calls through sync_to_async.
+
+BE/asgi_urls.py routes ASGI requests here; WSGI keeps the sync views.
+"""
+import inspect
+from functools import update_wrapper
+
+from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponse
+from django.shortcuts import aget_object_or_404 as _aget_object_or_404
+from django.utils.decorators import classonlymethod
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.response import Response
+
+from . import cache
+from .conditional import ConditionalGetMixin, aaggregate_content_state, aportfolio_content_state
+from .models import Portfolio
+from .pagination import apaginate_queryset
+from .views import PortfolioViewSet, ProjectViewSet, BlogPostViewSet
+
+
+async def aget_object_or_404(queryset, **filter_kwargs):
+    """Async rest_framework.generics.get_object_or_404()"""
+    try:
+        return await _aget_object_or_404(queryset, **filter_kwargs)
+    except (TypeError, ValueError, ValidationError):
+        raise Http404
+
+
+def detach(response):
+    """
+    Render a JSON Response into a plain HttpResponse. Django renders
+    responses that still have a render() method through sync_to_async.
+    """
+    renderer = getattr(response, 'accepted_renderer', None)
+    if renderer is None or renderer.format != 'json':
+        return response
+    response.render()
+    detached = HttpResponse(response.content, status=response.status_code, headers=response.headers)
+    if hasattr(response, 'precompressed'):
+        detached.precompressed = response.precompressed
+    return detached
+
+
+class AsyncReadMixin:
+    """
+    Serve a viewset from a coroutine. Put it first in the bases and write
+    the actions that should not block as `async def`; sync actions (e.g.
+    OPTIONS) still work, they just run on the event loop.
+    """
+    # BasicAuthentication looks users up synchronously, and the read API
+    # is public; the session user is loaded in adispatch()
+    authentication_classes = [SessionAuthentication]
+
+    @classonlymethod
+    def as_view(cls, actions=None, **initkwargs):
+        bind = super().as_view(actions, **initkwargs)
+
+        async def view(request, *args, **kwargs):
+            # DRF's view function binds the actions and returns dispatch(),
+            # which is a coroutine here
+            return await bind(request, *args, **kwargs)
+
+        return update_wrapper(view, bind)
+
+    def dispatch(self, request, *args, **kwargs):
+        return self.adispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        if hasattr(request, 'auser'):
+            request.user = await request.auser()
+        if isinstance(self, ConditionalGetMixin) and self.is_conditional(request):
+            self.kwargs = kwargs
+            # Read by the ETag/Last-Modified callbacks, which are sync
+            self._content_state = await self.aget_content_state()
+            return await self.with_validators(request, self.arespond)(request, *args, **kwargs)
+        return await self.arespond(request, *args, **kwargs)
+
+    async def arespond(self, request, *args, **kwargs):
+        """APIView.dispatch() with the handler and the response cache awaited"""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        self._cache_read = self._cache_write = None
+
+        try:
+            self.initial(request, *args, **kwargs)
+            if self._cache_read is not None:
+                await self.aread_cache(request)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        response = self.finalize_response(request, response, *args, **kwargs)
+        if self._cache_write is not None:
+            await self.awrite_cache(response)
+        self.response = detach(response)
+        return self.response
+
+    # CachedResponseMixin hooks: remember the work for arespond() to await
+
+    def read_cache(self, request):
+        self._cache_read = request
+
+    def write_cache(self, response):
+        self._cache_write = response
+
+    async def aget_object(self):
+        """get_object() with the lookup awaited"""
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        obj = await aget_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def alist(self, queryset):
+        """ListModelMixin.list() over `queryset`, evaluated through the async ORM"""
+        queryset = self.filter_queryset(queryset)
+        if self.paginator is not None:
+            page = await apaginate_queryset(self.paginator, queryset, self.request, view=self)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer([obj async for obj in queryset], many=True).data)
+
+
+class AsyncPortfolioViewSet(AsyncReadMixin, PortfolioViewSet):
+    async def aget_content_state(self):
+        if 'username' in self.kwargs:
+            return await aportfolio_content_state(self.kwargs['username'])
+        return await cache.amemoize(cache.GLOBAL_NAMESPACE, 'content-state', lambda: aaggregate_content_state(
+            Portfolio.objects.filter(is_active=True), 'updated_at'
+        ))
+
+    async def retrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        return Response(self.get_serializer(instance).data)
+
+
+class AsyncProjectViewSet(AsyncReadMixin, ProjectViewSet):
+    async def aget_content_state(self):
+        return await aportfolio_content_state(self.kwargs['username'])
+
+    async def list(self, request, username=None):
+        return await self.alist(self.get_portfolio_queryset(await self.aget_portfolio_id()))
+
+
+class AsyncBlogPostViewSet(AsyncReadMixin, BlogPostViewSet):
+    async def aget_content_state(self):
+        return await aportfolio_content_state(self.kwargs['username'])
+
+    async def list(self, request, username=None):
+        return await self.alist(self.get_portfolio_queryset(await self.aget_portfolio_id()))
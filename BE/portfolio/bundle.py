@@ -0,0 +1,113 @@
+"""
+Page bundles: the payloads of several read endpoints in one response.
+
+`/api/<username>/bundle/?include=portfolio,featured_projects,featured_posts`
+looks the portfolio up once and renders each requested part against it.
+When the full portfolio is included, its prefetched projects also serve
+`featured_projects`, so that part costs no query.
+
+Parts are registered by name. Other apps add theirs from
+AppConfig.ready() (see company/bundle.py), passing a `state` function when
+their data lives outside the portfolio's cache namespace; the bundle's
+validators and cache key then follow that state too.
+"""
+from collections import namedtuple
+
+from django.shortcuts import get_object_or_404
+from rest_framework import viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin, portfolio_content_state
+from .models import Portfolio
+from .serializers import PortfolioSerializer, ProjectSerializer, BlogPostSerializer
+from .views import blog_post_queryset, portfolio_detail_prefetches, project_queryset
+
+Part = namedtuple('Part', ['render', 'state'])
+
+PARTS = {}
+DEFAULT_PARTS = ('portfolio', 'featured_projects', 'featured_posts')
+
+
+def register(name, render, state=None):
+    """
+    Add a bundle part. `render(context)` returns its JSON-ready payload,
+    where context holds the request, the portfolio and the included part
+    names. `state()` returns a content state (see portfolio.conditional)
+    for data that portfolio changes do not invalidate.
+    """
+    PARTS[name] = Part(render, state)
+
+
+def parse(value):
+    """Part names from an ?include= value, in order; None means the defaults"""
+    if value is None:
+        return list(DEFAULT_PARTS)
+    names = list(dict.fromkeys(name.strip() for name in value.split(',') if name.strip()))
+    unknown = [name for name in names if name not in PARTS]
+    if unknown:
+        raise ValidationError({'include': [f'Unknown part: {name}' for name in unknown]})
+    return names
+
+
+def serializer_context(context):
+    return {'request': context['request']}
+
+
+def render_portfolio(context):
+    return PortfolioSerializer(context['portfolio'], context=serializer_context(context)).data
+
+
+def render_featured_projects(context):
+    portfolio = context['portfolio']
+    if 'portfolio' in context['include']:
+        # Prefetched for the portfolio part, in the same order
+        projects = [project for project in portfolio.projects.all() if project.is_featured]
+    else:
+        projects = project_queryset().filter(portfolio=portfolio, is_featured=True)
+    return ProjectSerializer(projects, many=True, context=serializer_context(context)).data
+
+
+def render_featured_posts(context):
+    posts = blog_post_queryset().filter(portfolio=context['portfolio'], status='published', is_featured=True)
+    return BlogPostSerializer(posts, many=True, context=serializer_context(context)).data
+
+
+register('portfolio', render_portfolio)
+register('featured_projects', render_featured_projects)
+register('featured_posts', render_featured_posts)
+
+
+class BundleViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ViewSet):
+    """
+    API endpoint for several page payloads in one request
+    """
+    cached_actions = ('list',)
+    conditional_actions = ('list',)
+
+    def get_content_state(self):
+        try:
+            names = parse(self.request.GET.get('include'))
+        except ValidationError:
+            # Answered with a 400 by list()
+            return None
+        state = portfolio_content_state(self.kwargs['username'])
+        if state is None:
+            return None
+        extra = tuple(PARTS[name].state() for name in names if PARTS[name].state)
+        latest = max([state[0]] + [part[0] for part in extra if part])
+        return (latest, state, extra)
+
+    def get_cache_endpoint(self):
+        # Parts outside the portfolio's namespace are keyed by their state
+        return f'{super().get_cache_endpoint()}:{self._get_state()!r}'
+
+    def list(self, request, username=None):
+        names = parse(request.query_params.get('include'))
+        portfolios = Portfolio.objects.filter(is_active=True)
+        if 'portfolio' in names:
+            portfolios = portfolios.select_related('about').prefetch_related(*portfolio_detail_prefetches())
+        portfolio = get_object_or_404(portfolios, username=username)
+        context = {'request': request, 'portfolio': portfolio, 'include': names}
+        return Response({name: PARTS[name].render(context) for name in names})
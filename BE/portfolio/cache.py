@@ -0,0 +1,244 @@
+"""
+Versioned response cache for the public portfolio read API.
+
+Rendered JSON bytes are stored under keys that embed a per-portfolio
+version number. Model signals bump the version whenever the portfolio's
+content changes, so stale entries are simply never read again and expire
+on their own.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.http import HttpResponse
+
+from . import compression
+
+# Namespace used by endpoints that span every portfolio (e.g. the list)
+GLOBAL_NAMESPACE = '*'
+
+HIT = 'hit'
+MISS = 'miss'
+
+# Backends that live in process memory, so calling them never blocks
+LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def get_cache():
+    return caches[getattr(settings, 'PORTFOLIO_CACHE_ALIAS', 'default')]
+
+
+def get_timeout():
+    return getattr(settings, 'PORTFOLIO_CACHE_TIMEOUT', 60 * 60)
+
+
+def _version_key(namespace):
+    return f'portfolio:version:{namespace}'
+
+
+def get_version(namespace):
+    """Return the current content version for a portfolio username"""
+    cache = get_cache()
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        # Seed with a timestamp rather than 1 so an evicted version key can
+        # never make old entries readable again.
+        version = time.time_ns()
+        if not cache.add(_version_key(namespace), version, None):
+            version = cache.get(_version_key(namespace), version)
+    return version
+
+
+def bump_version(namespace):
+    """Invalidate every cached response for a portfolio username"""
+    cache = get_cache()
+    try:
+        cache.incr(_version_key(namespace))
+    except ValueError:
+        cache.set(_version_key(namespace), time.time_ns(), None)
+
+
+def _stats_key(kind):
+    return f'portfolio:stats:{kind}'
+
+
+def record(kind):
+    cache = get_cache()
+    try:
+        cache.incr(_stats_key(kind))
+    except ValueError:
+        cache.add(_stats_key(kind), 0, None)
+        cache.incr(_stats_key(kind))
+
+
+def get_stats():
+    """Return the hit/miss counters shared by all processes using the cache"""
+    cache = get_cache()
+    return {kind: cache.get(_stats_key(kind), 0) for kind in (HIT, MISS)}
+
+
+def reset_stats():
+    get_cache().delete_many([_stats_key(HIT), _stats_key(MISS)])
+
+
+def versioned_key(namespace, name):
+    """Key that is invalidated together with the namespace's version"""
+    return f'portfolio:{namespace}:{get_version(namespace)}:{name}'
+
+
+def _response_name(endpoint, params):
+    query = '&'.join(
+        f'{name}={value}' for name in sorted(params) for value in params.getlist(name)
+    )
+    return f'response:{hashlib.md5(f"{endpoint}?{query}".encode()).hexdigest()}'
+
+
+def build_key(namespace, endpoint, params):
+    """Cache key from username, endpoint and the (sorted) query parameters"""
+    return versioned_key(namespace, _response_name(endpoint, params))
+
+
+def memoize(namespace, name, func):
+    """Return func() from the versioned cache, computing it on a miss"""
+    key = versioned_key(namespace, name)
+    value = get_cache().get(key)
+    if value is None:
+        value = func()
+        if value is not None:
+            get_cache().set(key, value, get_timeout())
+    return value
+
+
+async def acall(method, *args, **kwargs):
+    """
+    Call a cache method from async code. In-process backends are called
+    directly; the others go through Django's async cache API, which runs
+    them in a thread pool.
+    """
+    cache = get_cache()
+    if isinstance(cache, LOCAL_BACKENDS):
+        return getattr(cache, method)(*args, **kwargs)
+    return await getattr(cache, f'a{method}')(*args, **kwargs)
+
+
+async def aget_version(namespace):
+    """Async get_version()"""
+    version = await acall('get', _version_key(namespace))
+    if version is None:
+        version = time.time_ns()
+        if not await acall('add', _version_key(namespace), version, None):
+            version = await acall('get', _version_key(namespace), version)
+    return version
+
+
+async def arecord(kind):
+    try:
+        await acall('incr', _stats_key(kind))
+    except ValueError:
+        await acall('add', _stats_key(kind), 0, None)
+        await acall('incr', _stats_key(kind))
+
+
+async def aversioned_key(namespace, name):
+    return f'portfolio:{namespace}:{await aget_version(namespace)}:{name}'
+
+
+async def abuild_key(namespace, endpoint, params):
+    return await aversioned_key(namespace, _response_name(endpoint, params))
+
+
+async def amemoize(namespace, name, func):
+    """Async memoize(); `func` returns an awaitable"""
+    key = await aversioned_key(namespace, name)
+    value = await acall('get', key)
+    if value is None:
+        value = await func()
+        if value is not None:
+            await acall('set', key, value, get_timeout())
+    return value
+
+
+class CachedResponseMixin:
+    """
+    Serve GET responses from the versioned cache.
+
+    Views list the actions to cache in `cached_actions`. Only JSON renders
+    are cached; the browsable API always goes to the database. Entries keep
+    the compressed encodings of the content too (see portfolio/compression.py),
+    so a cached response is compressed once rather than on every hit.
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def get_cache_namespace(self):
+        return self.kwargs.get('username') or GLOBAL_NAMESPACE
+
+    def get_cache_endpoint(self):
+        kwargs = ','.join(f'{k}={v}' for k, v in sorted(self.kwargs.items()))
+        return f'{type(self).__name__}:{self.action}:{kwargs}'
+
+    def is_cacheable(self, request):
+        return (
+            request.method == 'GET'
+            and self.action in self.cached_actions
+            and request.accepted_renderer.format == 'json'
+        )
+
+    def initial(self, request, *args, **kwargs):
+        self._cache_key = None
+        super().initial(request, *args, **kwargs)
+        if self.is_cacheable(request):
+            self.read_cache(request)
+
+    def read_cache(self, request):
+        key = build_key(self.get_cache_namespace(), self.get_cache_endpoint(), request.query_params)
+        record(self.use_cached(request, key, get_cache().get(key)))
+
+    async def aread_cache(self, request):
+        key = await abuild_key(self.get_cache_namespace(), self.get_cache_endpoint(), request.query_params)
+        await arecord(self.use_cached(request, key, await acall('get', key)))
+
+    def use_cached(self, request, key, cached):
+        """
+        Serve the cached (content type, content, encodings) entry, or
+        remember `key` to store the response under when there is none.
+        Returns HIT or MISS.
+        """
+        if cached is None:
+            self._cache_key = key
+            return MISS
+        content_type, content, encodings = cached
+        response = HttpResponse(content, content_type=content_type)
+        response.precompressed = encodings
+        response['X-Cache'] = 'HIT'
+        # Replace the bound action so dispatch() returns the cached bytes
+        # without touching the queryset or the serializer.
+        setattr(self, request.method.lower(), lambda *args, **kwargs: response)
+        return HIT
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        self.write_cache(response)
+        return response
+
+    def write_cache(self, response):
+        entry = self.get_cache_entry(response)
+        if entry is not None:
+            get_cache().set(*entry, get_timeout())
+
+    async def awrite_cache(self, response):
+        entry = self.get_cache_entry(response)
+        if entry is not None:
+            await acall('set', *entry, get_timeout())
+
+    def get_cache_entry(self, response):
+        """(key, value) to store for a freshly rendered response, if any"""
+        key = getattr(self, '_cache_key', None)
+        if key and response.status_code == 200 and hasattr(response, 'render'):
+            response.render()
+            response['X-Cache'] = 'MISS'
+            response.precompressed = compression.precompress(response.content)
+            return key, (response['Content-Type'], response.content, response.precompressed)
+        return None
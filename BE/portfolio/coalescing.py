@@ -0,0 +1,166 @@
+"""
+Write coalescing for contact messages and newsletter subscriptions.
+
+With WRITE_COALESCING on, the contact and newsletter endpoints validate
+the request and append the row to a buffer in the cache instead of
+inserting it, and a background job writes everything buffered in one
+transaction (`bulk_create()` and a few batched queries) at most once per
+WRITE_COALESCING_INTERVAL. SQLite has a single writer, so a burst of
+submissions then costs one write transaction instead of one each.
+
+The buffer is a sequence of numbered slots: writers take a number with
+`incr()` and `add()` their row to its slot; the flush walks the slots past
+the last one it handled. A slot still empty at flush time is claimed by
+the flush with `add()`, in which case the writer's `add()` fails and it
+inserts its row directly, so a row is never stranded behind the flush.
+Buffered rows live only in the cache: use a shared backend that does not
+evict them (e.g. redis) or leave coalescing off.
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import jobs, notifications
+from .cache import get_cache
+from .models import ContactMessage, Newsletter
+
+SEQUENCE_KEY = 'writes:sequence'
+HEAD_KEY = 'writes:head'
+FLUSH_SCHEDULED_KEY = 'writes:flush-scheduled'
+FLUSH_LOCK_KEY = 'writes:flush-lock'
+
+# Marks a slot given up by the flush
+SKIPPED = 'skipped'
+
+BATCH_SIZE = 500
+
+
+def is_enabled():
+    return getattr(settings, 'WRITE_COALESCING', False)
+
+
+def get_interval():
+    return getattr(settings, 'WRITE_COALESCING_INTERVAL', 2)
+
+
+def _slot(number):
+    return f'writes:slot:{number}'
+
+
+def buffer(kind, **fields):
+    """
+    Buffer a row of `kind` (a key of WRITERS) for the next flush. Returns
+    False when coalescing is off or the row could not be buffered, in which
+    case the caller writes it itself.
+    """
+    if not is_enabled():
+        return False
+    cache = get_cache()
+    cache.add(SEQUENCE_KEY, 0, None)
+    try:
+        number = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # Evicted between add() and incr()
+        return False
+    if not cache.add(_slot(number), (kind, fields), None):
+        # The flush already gave up on this slot
+        return False
+    if cache.add(FLUSH_SCHEDULED_KEY, 1, get_interval()):
+        # Delayed, so that the flush picks up everything sent meanwhile
+        jobs.enqueue(flush, delay=get_interval())
+    return True
+
+
+def flush():
+    """Write every buffered row; returns how many were written"""
+    cache = get_cache()
+    if not cache.add(FLUSH_LOCK_KEY, 1, 60):
+        # Another flush is running; it or the next one gets the rows
+        return 0
+    try:
+        head = cache.get(HEAD_KEY, 0)
+        tail = cache.get(SEQUENCE_KEY, 0)
+        if tail < head:
+            # The sequence was evicted and restarted
+            head = 0
+        written = 0
+        for start in range(head + 1, tail + 1, BATCH_SIZE):
+            keys = [_slot(number) for number in range(start, min(start + BATCH_SIZE, tail + 1))]
+            found = cache.get_many(keys)
+            for key in keys:
+                if key not in found and not cache.add(key, SKIPPED, 60):
+                    # The writer got there first after all
+                    found[key] = cache.get(key)
+            rows = defaultdict(list)
+            for key in keys:
+                if found.get(key, SKIPPED) != SKIPPED:
+                    kind, fields = found[key]
+                    rows[kind].append(fields)
+            with transaction.atomic():
+                for kind, batch in rows.items():
+                    WRITERS[kind](batch)
+            cache.set(HEAD_KEY, start + len(keys) - 1, None)
+            # Skipped slots expire by themselves, after any late writer has seen them
+            cache.delete_many([key for key in keys if found.get(key, SKIPPED) != SKIPPED])
+            written += sum(len(batch) for batch in rows.values())
+        return written
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def write_contact_messages(batch):
+    for message in ContactMessage.objects.bulk_create(ContactMessage(**fields) for fields in batch):
+        jobs.enqueue(
+            notifications.notify_contact_message, message_id=message.pk, key=f'contact-message:{message.pk}'
+        )
+
+
+def write_subscriptions(batch):
+    """
+    Subscribe each (portfolio_id, email) like NewsletterSubscribeView does:
+    create new subscribers, reactivate inactive ones and queue confirmations
+    """
+    names = {}
+    for fields in batch:
+        names.setdefault((fields['portfolio_id'], fields['email']), fields.get('name', ''))
+    emails = defaultdict(list)
+    for portfolio_id, email in names:
+        emails[portfolio_id].append(email)
+
+    def matching():
+        return Newsletter.objects.filter(reduce(or_, (
+            Q(portfolio_id=portfolio_id, email__in=addresses) for portfolio_id, addresses in emails.items()
+        )))
+
+    existing = {(row.portfolio_id, row.email): row for row in matching().only('portfolio_id', 'email', 'is_active')}
+    Newsletter.objects.bulk_create(
+        [
+            Newsletter(portfolio_id=portfolio_id, email=email, name=name)
+            for (portfolio_id, email), name in names.items() if (portfolio_id, email) not in existing
+        ],
+        ignore_conflicts=True,
+    )
+    for subscriber in matching().exclude(pk__in=[row.pk for row in existing.values()]).only('pk'):
+        jobs.enqueue(
+            notifications.send_newsletter_confirmation, subscriber_id=subscriber.pk,
+            key=f'newsletter-confirmation:{subscriber.pk}',
+        )
+    inactive = [row.pk for row in existing.values() if not row.is_active]
+    Newsletter.objects.filter(pk__in=inactive).update(is_active=True)
+    for pk in inactive:
+        # At most one confirmation per subscriber and day
+        jobs.enqueue(
+            notifications.send_newsletter_confirmation, subscriber_id=pk,
+            key=f'newsletter-confirmation:{pk}:{timezone.now().date()}',
+        )
+
+
+WRITERS = {
+    'contact': write_contact_messages,
+    'newsletter': write_subscriptions,
+}
@@ -0,0 +1,117 @@
+"""
+Negotiated compression of JSON API responses.
+
+`BE.middleware.CompressionMiddleware` encodes JSON responses with the best
+coding the client accepts out of RESPONSE_COMPRESSION_CODINGS: brotli and
+zstd where the `brotli` / `zstandard` packages are installed, gzip always.
+
+Responses served from the versioned response cache (portfolio/cache.py)
+are compressed once, when the entry is stored: the entry keeps every
+configured encoding next to the raw bytes and the middleware sends the
+matching one as is, so a hot response costs no compression at all.
+"""
+import gzip
+import re
+
+from django.conf import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Fast enough for responses rendered per request while getting most of
+# the size reduction
+LEVELS = {'br': 5, 'zstd': 10, 'gzip': 6}
+
+COMPRESSIBLE_TYPES = ('application/json',)
+
+ACCEPT_ENCODING_RE = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*')
+
+
+def _brotli(content):
+    return brotli.compress(content, quality=LEVELS['br'])
+
+
+def _zstd(content):
+    return zstandard.ZstdCompressor(level=LEVELS['zstd']).compress(content)
+
+
+def _gzip(content):
+    # mtime=0 so the same content always compresses to the same bytes
+    return gzip.compress(content, compresslevel=LEVELS['gzip'], mtime=0)
+
+
+ENCODERS = {
+    'br': _brotli if brotli else None,
+    'zstd': _zstd if zstandard else None,
+    'gzip': _gzip,
+}
+
+
+def get_codings():
+    """Configured codings that can be encoded here, most preferred first"""
+    codings = getattr(settings, 'RESPONSE_COMPRESSION_CODINGS', ['br', 'zstd', 'gzip'])
+    return [coding for coding in codings if ENCODERS.get(coding)]
+
+
+def get_min_size():
+    return getattr(settings, 'RESPONSE_COMPRESSION_MIN_SIZE', 512)
+
+
+def parse_accept_encoding(header):
+    """{coding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for item in (header or '').split(','):
+        match = ACCEPT_ENCODING_RE.fullmatch(item)
+        if not match:
+            continue
+        try:
+            q = float(match[2]) if match[2] is not None else 1.0
+        except ValueError:
+            continue
+        accepted[match[1].lower()] = q
+    return accepted
+
+
+def negotiate(header, codings=None):
+    """The coding of `codings` (default: get_codings()) to send, or None for identity"""
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0
+    for coding in get_codings() if codings is None else codings:
+        q = accepted.get(coding, accepted.get('*', 0))
+        # Ties go to the earlier, preferred coding
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(coding, content):
+    return ENCODERS[coding](content)
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return (
+        content_type in COMPRESSIBLE_TYPES
+        and not response.streaming
+        and not response.has_header('Content-Encoding')
+        and len(response.content) >= get_min_size()
+    )
+
+
+def precompress(content):
+    """{coding: bytes} of every configured coding that makes `content` smaller"""
+    if len(content) < get_min_size():
+        return {}
+    encoded = {}
+    for coding in get_codings():
+        body = compress(coding, content)
+        if len(body) < len(content):
+            encoded[coding] = body
+    return encoded
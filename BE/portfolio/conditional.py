@@ -0,0 +1,145 @@
+"""
+Conditional GET (ETag / Last-Modified) for the read API.
+
+Validators come from a single MAX(updated_at) query, so a matching
+If-None-Match or If-Modified-Since is answered with a 304 before any
+serialization happens.
+"""
+import hashlib
+
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.views.decorators.http import condition
+
+from . import cache
+from .models import Portfolio, Project, BlogPost
+
+
+def _latest_child(model):
+    return Subquery(
+        model.objects.filter(portfolio=OuterRef('pk'))
+        .order_by()
+        .values('portfolio')
+        .annotate(latest=Max('updated_at'))
+        .values('latest')
+    )
+
+
+def portfolio_content_state(username):
+    """
+    Latest updated_at across a portfolio and its timestamped children.
+
+    Children without their own timestamp touch Portfolio.updated_at from
+    the model signals, so this covers the whole tree. The result is kept in
+    the versioned response cache, so repeat requests cost no queries.
+    """
+    return cache.memoize(username, 'content-state', lambda: _portfolio_content_state(username))
+
+
+async def aportfolio_content_state(username):
+    """Async portfolio_content_state()"""
+    return await cache.amemoize(username, 'content-state', lambda: _aportfolio_content_state(username))
+
+
+def _with_child_timestamps(queryset):
+    return queryset.annotate(projects_updated=_latest_child(Project), posts_updated=_latest_child(BlogPost))
+
+
+def _portfolio_state_query(username):
+    return _with_child_timestamps(Portfolio.objects.filter(username=username, is_active=True)).values_list(
+        'updated_at', 'projects_updated', 'posts_updated'
+    )
+
+
+def _portfolio_state(row):
+    if row is None:
+        return None
+    return (max(ts for ts in row if ts),)
+
+
+def _portfolio_content_state(username):
+    return _portfolio_state(_portfolio_state_query(username).first())
+
+
+async def _aportfolio_content_state(username):
+    return _portfolio_state(await _portfolio_state_query(username).afirst())
+
+
+def portfolio_content_states(queryset):
+    """{username: portfolio_content_state()} for a Portfolio queryset, in one query"""
+    rows = _with_child_timestamps(queryset).values_list('username', 'updated_at', 'projects_updated', 'posts_updated')
+    return {username: _portfolio_state(timestamps) for username, *timestamps in rows}
+
+
+def _aggregates(fields):
+    return {'rows': Count('pk'), **{f'latest_{i}': Max(field) for i, field in enumerate(fields)}}
+
+
+def _aggregate_state(row):
+    rows = row.pop('rows')
+    timestamps = [ts for ts in row.values() if ts]
+    if not timestamps:
+        return None
+    return (max(timestamps), rows)
+
+
+def aggregate_content_state(queryset, *fields):
+    """
+    (latest timestamp, row count) over a queryset. The count catches
+    deletions, which would otherwise leave the maximum unchanged.
+    """
+    return _aggregate_state(queryset.order_by().aggregate(**_aggregates(fields)))
+
+
+async def aaggregate_content_state(queryset, *fields):
+    """Async aggregate_content_state()"""
+    return _aggregate_state(await queryset.order_by().aaggregate(**_aggregates(fields)))
+
+
+class ConditionalGetMixin:
+    """
+    Add ETag/Last-Modified validators to the actions in `conditional_actions`.
+
+    Subclasses implement `get_content_state()`, returning a tuple whose first
+    item is the last-modified datetime (or None when the resource is missing).
+    """
+    conditional_actions = ('list', 'retrieve')
+
+    def get_content_state(self):
+        raise NotImplementedError
+
+    async def aget_content_state(self):
+        """Async get_content_state(), used by the ASGI views"""
+        raise NotImplementedError
+
+    def _get_state(self):
+        if not hasattr(self, '_content_state'):
+            self._content_state = self.get_content_state()
+        return self._content_state
+
+    def _etag(self, request, *args, **kwargs):
+        state = self._get_state()
+        if state is None:
+            return None
+        # The query string selects the representation (page, filters, fields)
+        query = sorted(request.GET.lists())
+        raw = f'{self._conditional_action}:{sorted(kwargs.items())}:{query}:{state!r}'
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    def _last_modified(self, request, *args, **kwargs):
+        state = self._get_state()
+        return state[0] if state else None
+
+    def is_conditional(self, request):
+        action = self.action_map.get(request.method.lower())
+        return request.method in ('GET', 'HEAD') and action in self.conditional_actions
+
+    def with_validators(self, request, view):
+        """Wrap a (sync or async) dispatch in the ETag/Last-Modified checks"""
+        self._conditional_action = self.action_map.get(request.method.lower())
+        return condition(etag_func=self._etag, last_modified_func=self._last_modified)(view)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_conditional(request):
+            return super().dispatch(request, *args, **kwargs)
+        self.kwargs = kwargs
+        return self.with_validators(request, super().dispatch)(request, *args, **kwargs)
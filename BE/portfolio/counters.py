@@ -0,0 +1,208 @@
+"""
+Write-behind counters for BlogPost.views and Resource.downloads.
+
+Increments are accumulated atomically in the cache backend and written to
+the database in batches with `UPDATE ... SET field = field + n`, so page
+views never take a write lock and concurrent increments are never lost.
+At most once per flush interval a flush is scheduled.
+
+The counts live in the COUNTER_CACHE_ALIAS cache, which must never evict:
+an evicted counter is a lost count, so it has its own alias and is not
+shared with the response cache.
+
+- With a shared backend (memcached, redis with `maxmemory-policy
+  noeviction`) the flush is queued as a background job, and any process
+  (`runworker`, `flush_counters`) can write the counts.
+- With a process-local one (LocMem, the default) only the counting process
+  sees its counts, so it flushes them itself: once the request that
+  scheduled the flush has finished, i.e. after its response went out. A
+  process that exits loses at most one interval of counts.
+- A DummyCache cannot hold counts; increments are then written straight
+  to the database, as with COUNTER_BUFFERING = False.
+
+Rows with pending counts are tracked like the write buffer in
+coalescing.py: the increment that takes a row's counter from 0 puts the
+row in a numbered slot, and a flush walks only the slots past the last one
+it handled, so it costs the rows counted since then, not the whole table.
+"""
+import logging
+from collections import defaultdict
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.signals import request_finished
+from django.db.models import F
+
+from . import jobs
+
+logger = logging.getLogger(__name__)
+
+FLUSH_LOCK_KEY = 'counters:flush-lock'
+FLUSH_RUNNING_KEY = 'counters:flush-running'
+DIRTY_SEQUENCE_KEY = 'counters:dirty:sequence'
+DIRTY_HEAD_KEY = 'counters:dirty:head'
+
+# Marks a slot given up by the flush
+SKIPPED = 'skipped'
+
+BATCH_SIZE = 500
+
+
+def get_cache():
+    return caches[getattr(settings, 'COUNTER_CACHE_ALIAS', 'default')]
+
+
+def is_buffered():
+    return getattr(settings, 'COUNTER_BUFFERING', True) and not isinstance(get_cache(), DummyCache)
+
+
+def is_process_local():
+    return isinstance(get_cache(), LocMemCache)
+
+
+def get_flush_interval():
+    return getattr(settings, 'COUNTER_FLUSH_INTERVAL', 10)
+
+
+def _key(label, field, pk):
+    return f'counters:{label}:{field}:{pk}'
+
+
+def _slot(number):
+    return f'counters:dirty:{number}'
+
+
+def pending(model, field, pk):
+    """Increments recorded for a row that have not been flushed yet"""
+    if not is_buffered():
+        return 0
+    return get_cache().get(_key(model._meta.label, field, pk), 0)
+
+
+def increment(model, field, pk, amount=1):
+    """
+    Count `amount` against a row. Returns how many increments are missing
+    from a value read before the call, i.e. what to add for display.
+    """
+    if not is_buffered():
+        model.objects.filter(pk=pk).update(**{field: F(field) + amount})
+        return amount
+    cache = get_cache()
+    key = _key(model._meta.label, field, pk)
+    # add() is a no-op when the key exists, incr() is atomic on every
+    # backend that supports it, so no increments are lost.
+    cache.add(key, 0, None)
+    try:
+        value = cache.incr(key, amount)
+    except ValueError:
+        # Evicted between add() and incr()
+        cache.set(key, amount, None)
+        value = amount
+    if value == amount:
+        # Nothing was pending for the row, so no slot holds it
+        _mark_dirty(cache, (model._meta.label, field, pk))
+    maybe_flush()
+    return value
+
+
+def _mark_dirty(cache, row):
+    """Put a (label, field, pk) row in the next free slot for the flush"""
+    while True:
+        cache.add(DIRTY_SEQUENCE_KEY, 0, None)
+        try:
+            number = cache.incr(DIRTY_SEQUENCE_KEY)
+        except ValueError:
+            # Evicted between add() and incr()
+            continue
+        # Fails only when the flush already gave up on this slot
+        if cache.add(_slot(number), row, None):
+            return
+
+
+def maybe_flush():
+    """Schedule a flush at most once per flush interval"""
+    if not get_cache().add(FLUSH_LOCK_KEY, 1, get_flush_interval()):
+        return
+    if is_process_local():
+        # dispatch_uid: one flush however many requests finish meanwhile
+        request_finished.connect(flush_after_request, dispatch_uid=FLUSH_RUNNING_KEY)
+    else:
+        jobs.enqueue(flush)
+
+
+def flush_after_request(**kwargs):
+    """request_finished receiver flushing the process-local counts once"""
+    request_finished.disconnect(flush_after_request, dispatch_uid=FLUSH_RUNNING_KEY)
+    try:
+        flush()
+    except Exception:
+        # The counts stay pending for the next flush
+        logger.exception('Flushing counters failed')
+
+
+def flush():
+    """
+    Write the pending increments of every row marked since the last flush.
+
+    Rows with the same pending amount are updated together, so a flush is
+    one UPDATE per (field, amount) group rather than one per row. Returns
+    the total number of increments written.
+    """
+    if not is_buffered():
+        return 0
+    cache = get_cache()
+    if not cache.add(FLUSH_RUNNING_KEY, 1, 60):
+        # Another flush is running; it or the next one gets the counts
+        return 0
+    try:
+        head = cache.get(DIRTY_HEAD_KEY, 0)
+        tail = cache.get(DIRTY_SEQUENCE_KEY, 0)
+        if tail < head:
+            # The sequence was evicted and restarted
+            head = 0
+        total = 0
+        for start in range(head + 1, tail + 1, BATCH_SIZE):
+            slots = [_slot(number) for number in range(start, min(start + BATCH_SIZE, tail + 1))]
+            found = cache.get_many(slots)
+            for slot in slots:
+                if slot not in found and not cache.add(slot, SKIPPED, 60):
+                    # The writer got there first after all
+                    found[slot] = cache.get(slot)
+            marked = [found[slot] for slot in slots if found.get(slot, SKIPPED) != SKIPPED]
+            total += _write(cache, marked)
+            cache.set(DIRTY_HEAD_KEY, start + len(slots) - 1, None)
+            # Skipped slots expire by themselves, after any late writer has seen them
+            cache.delete_many([slot for slot in slots if found.get(slot, SKIPPED) != SKIPPED])
+        return total
+    finally:
+        cache.delete(FLUSH_RUNNING_KEY)
+
+
+def _write(cache, rows):
+    """Write the pending counts of (label, field, pk) rows; returns the total"""
+    keys = {_key(*row): tuple(row) for row in rows}
+    groups = defaultdict(list)
+    for key, amount in cache.get_many(keys).items():
+        if amount:
+            label, field, pk = keys[key]
+            groups[label, field, amount].append(key)
+    total = 0
+    for (label, field, amount), group in groups.items():
+        model = apps.get_model(label)
+        model.objects.filter(pk__in=[keys[key][2] for key in group]).update(**{field: F(field) + amount})
+        # decr() rather than delete() keeps increments that arrived after
+        # get_many() for the next flush.
+        for key in group:
+            try:
+                remaining = cache.decr(key, amount)
+            except ValueError:
+                # Evicted since get_many(), along with anything counted meanwhile
+                continue
+            if remaining:
+                # Those increments found the row pending and did not mark it
+                _mark_dirty(cache, keys[key])
+        total += amount * len(group)
+    return total
@@ -0,0 +1,202 @@
+"""
+File delivery for Resource.file and About.resume_file.
+
+`file_response()` answers a GET for a stored file with HTTP range support,
+so interrupted downloads resume and media players can seek: a single
+`Range: bytes=a-b` gets a 206 with just those bytes, `If-Range` falls back
+to the whole file when it has changed since, and unsatisfiable ranges get
+a 416. Open-ended ranges (`bytes=a-`, which is what resuming sends) pass
+the real file object, seeked to `a`, to FileResponse, so WSGI servers with
+a sendfile-capable `wsgi.file_wrapper` (gunicorn) send it without copying
+it through Python.
+
+With FILE_DELIVERY set, Django only checks the request and hands the
+transfer to the front proxy: 'x-accel-redirect' (nginx) redirects
+internally to FILE_DELIVERY_ACCEL_PREFIX + the storage name, 'x-sendfile'
+(Apache mod_xsendfile, lighttpd) names the file's path. The proxy then
+handles ranges itself.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.text import slugify
+
+
+def get_mode():
+    return getattr(settings, 'FILE_DELIVERY', None)
+
+
+def get_accel_prefix():
+    return getattr(settings, 'FILE_DELIVERY_ACCEL_PREFIX', '/protected-media/')
+
+
+COMPRESSED_TYPES = {
+    'bzip2': 'application/x-bzip',
+    'gzip': 'application/gzip',
+    'xz': 'application/x-xz',
+}
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """
+    (start, end) of a single-range `Range` header, end inclusive, or None
+    to send the whole file (no header, several ranges or a malformed one).
+    Raises RangeNotSatisfiable when the range starts past the end.
+    """
+    unit, _, spec = (header or '').partition('=')
+    if unit.strip().lower() != 'bytes' or ',' in spec:
+        return None
+    first, dash, last = spec.strip().partition('-')
+    if not dash:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else size - 1
+        elif last:
+            # The last n bytes
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if first and last and start > end:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+class BoundedFile:
+    """Reads at most `length` bytes of `file`, for ranges that end before its end"""
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def _modified(fieldfile):
+    try:
+        return fieldfile.storage.get_modified_time(fieldfile.name)
+    except (NotImplementedError, OSError):
+        return None
+
+
+def _etag(fieldfile, size, modified):
+    stamp = modified.timestamp() if modified else ''
+    return '"%s"' % hashlib.md5(f'{fieldfile.name}:{size}:{stamp}'.encode(), usedforsecurity=False).hexdigest()
+
+
+def _range_applies(request, etag, modified):
+    """False when If-Range names a version other than the current one"""
+    condition = request.headers.get('If-Range')
+    if not condition:
+        return True
+    if condition.startswith(('"', 'W/')):
+        return condition == etag
+    since = parse_http_date_safe(condition)
+    return since is not None and modified is not None and int(modified.timestamp()) <= since
+
+
+def file_response(request, fieldfile, filename=None):
+    """Attachment response for a FieldFile, honouring Range and FILE_DELIVERY"""
+    filename = filename or os.path.basename(fieldfile.name)
+    mode = get_mode()
+    if mode == 'x-accel-redirect':
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = quote(get_accel_prefix() + fieldfile.name)
+        return _attachment(response, filename)
+    if mode == 'x-sendfile':
+        try:
+            path = fieldfile.path
+        except NotImplementedError:
+            # Not on the local filesystem; stream it instead
+            path = None
+        if path is not None:
+            response = HttpResponse()
+            response['X-Sendfile'] = path
+            return _attachment(response, filename)
+
+    try:
+        size = fieldfile.size
+    except OSError:
+        raise Http404('File not found')
+    modified = _modified(fieldfile)
+    etag = _etag(fieldfile, size, modified)
+    try:
+        byte_range = parse_range(request.headers.get('Range'), size)
+    except RangeNotSatisfiable:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+    if byte_range is not None and not _range_applies(request, etag, modified):
+        byte_range = None
+
+    if request.method == 'HEAD':
+        # Headers only; no need to open the file
+        response = HttpResponse(status=200 if byte_range is None else 206)
+        start, end = byte_range or (0, size - 1)
+        response['Content-Length'] = end - start + 1
+    else:
+        file = fieldfile.storage.open(fieldfile.name, 'rb')
+        if byte_range is None:
+            response = FileResponse(file)
+        else:
+            start, end = byte_range
+            file.seek(start)
+            if end < size - 1:
+                file = BoundedFile(file, end - start + 1)
+            response = FileResponse(file, status=206)
+            response['Content-Length'] = end - start + 1
+    if byte_range is not None:
+        response['Content-Range'] = f'bytes {byte_range[0]}-{byte_range[1]}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified.timestamp())
+    return _attachment(response, filename)
+
+
+def download_name(label, name):
+    """`label` as a file name with the extension of the stored file; stored names are content hashes"""
+    return (slugify(label) or 'download') + posixpath.splitext(name)[1].lower()
+
+
+def _attachment(response, filename):
+    content_type, encoding = mimetypes.guess_type(filename)
+    # Served as is: a .tar.gz is a gzip file, not a tarball to decompress
+    content_type = COMPRESSED_TYPES.get(encoding, content_type)
+    response['Content-Type'] = content_type or 'application/octet-stream'
+    response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(filename)}"
+    return response
+
+
+def is_new_download(request):
+    """Whether a file request starts a download, rather than resuming or probing one"""
+    if request.method != 'GET':
+        return False
+    header = request.headers.get('Range')
+    if not header:
+        return True
+    unit, _, spec = header.partition('=')
+    return spec.strip().startswith('0-')
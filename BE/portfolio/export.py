@@ -0,0 +1,256 @@
+"""
+Static export of the public portfolio API for serving from a CDN.
+
+Every active portfolio's read endpoints are rendered through the regular
+views and written to `<output>/<path>/index.json`, so a static server that
+maps `/api/jane/projects/` to `api/jane/projects/index.json` answers the
+frontend without Django. Given the SPA's built index.html, each portfolio
+also gets `<output>/<username>/index.html` with its detail payload inlined
+as `<script id="portfolio-data" type="application/json">`.
+
+Paginated lists are exported page by page: page N of `/api/jane/blog/` goes
+to `api/jane/blog/page/N/index.json`, and the `next`/`previous` links are
+rewritten to those paths, since a static server ignores `?page=`.
+
+`manifest.json` in the output directory records each portfolio's content
+state (see conditional.py) and the files written for it. Later runs only
+re-export portfolios whose state changed, and delete files that are no
+longer produced, including those of deactivated or deleted portfolios.
+"""
+import json
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import django
+from django.conf import settings
+from django.db import connections
+from django.http.request import validate_host
+from django.test import RequestFactory
+from django.urls import resolve, reverse
+from django.utils.html import escape, json_script
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from .conditional import portfolio_content_states
+from .models import Portfolio, BlogPost
+from .serializers import BlogPostSerializer
+
+MANIFEST = 'manifest.json'
+
+# Endpoints exported for every portfolio, by URL name
+LIST_ENDPOINTS = (
+    'portfolio-detail',
+    'portfolio-projects', 'portfolio-projects-featured',
+    'portfolio-blog', 'portfolio-blog-featured',
+    'portfolio-resources', 'portfolio-facets', 'portfolio-bundle',
+)
+
+
+class ExportError(Exception):
+    pass
+
+
+def check_base_url(base_url):
+    """Normalized base URL; raises ExportError if the views could not build URLs for it"""
+    url = urlsplit(base_url)
+    if url.scheme not in ('http', 'https') or not url.hostname:
+        raise ExportError(f'Expected an http(s):// base URL, got {base_url!r}')
+    if not validate_host(url.hostname, settings.ALLOWED_HOSTS):
+        raise ExportError(f'{url.hostname} is not in ALLOWED_HOSTS')
+    return f'{url.scheme}://{url.netloc}/'
+
+
+def encode_state(state):
+    return [value.isoformat() if hasattr(value, 'isoformat') else value for value in state] if state else None
+
+
+def write(output, relative, content):
+    """Write a file atomically, so the static server never sees half of it"""
+    path = Path(output) / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix='.export-')
+    with os.fdopen(fd, 'wb') as file:
+        file.write(content)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+class Exporter:
+    """Renders one portfolio's files, as {relative path: bytes}"""
+
+    def __init__(self, base_url, html_template=None):
+        url = urlsplit(base_url)
+        self.base_url = base_url
+        self.factory = RequestFactory(HTTP_HOST=url.netloc, HTTP_ACCEPT='application/json')
+        self.secure = url.scheme == 'https'
+        self.html_template = html_template
+
+    def request(self, path):
+        return self.factory.get(path, secure=self.secure)
+
+    def get(self, path):
+        match = resolve(urlsplit(path).path, urlconf=settings.ROOT_URLCONF)
+        response = match.func(self.request(path), *match.args, **match.kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if response.status_code != 200:
+            raise ExportError(f'GET {path} returned {response.status_code}')
+        return response.content
+
+    def paths(self, portfolio):
+        username = portfolio.username
+        for name in LIST_ENDPOINTS:
+            yield reverse(name, kwargs={'username': username})
+        for pk in portfolio.projects.values_list('pk', flat=True):
+            yield reverse('portfolio-project-detail', kwargs={'username': username, 'pk': pk})
+        for pk in portfolio.resources.values_list('pk', flat=True):
+            yield reverse('portfolio-resource-detail', kwargs={'username': username, 'pk': pk})
+
+    def page_path(self, path, number):
+        """Where page `number` of a list is exported; page 1 is the list itself"""
+        return path if number == 1 else f'{path}page/{number}/'
+
+    def page_url(self, path, number):
+        return self.base_url + self.page_path(path, number).lstrip('/')
+
+    def pages(self, path):
+        """{relative path: bytes} for an endpoint, with every page of a paginated list"""
+        files = {}
+        number, url = 1, path
+        while url:
+            content = self.get(url)
+            data = json.loads(content)
+            url = None
+            if isinstance(data, dict) and (data.get('next') or data.get('previous')):
+                # Page-number links: next is always page + 1, previous page - 1
+                if data['next']:
+                    link = urlsplit(data['next'])
+                    url = f'{link.path}?{link.query}'
+                    data['next'] = self.page_url(path, number + 1)
+                if data['previous']:
+                    data['previous'] = self.page_url(path, number - 1)
+                content = JSONRenderer().render(data)
+            files[f'{self.page_path(path, number).strip("/")}/index.json'] = content
+            number += 1
+        return files
+
+    def render(self, portfolio):
+        files = {}
+        for path in self.paths(portfolio):
+            files.update(self.pages(path))
+        # The blog detail view counts a view, so posts go straight through the serializer
+        request = Request(self.request('/'))
+        for post in BlogPost.objects.filter(portfolio=portfolio, status='published'):
+            path = reverse('portfolio-blog-detail', kwargs={'username': portfolio.username, 'pk': post.pk})
+            data = BlogPostSerializer(post, context={'request': request}).data
+            files[f'{path.strip("/")}/index.json'] = JSONRenderer().render(data)
+        if self.html_template is not None:
+            detail = reverse('portfolio-detail', kwargs={'username': portfolio.username})
+            data = json.loads(files[f'{detail.strip("/")}/index.json'])
+            files[f'{portfolio.username}/index.html'] = self.render_html(data).encode()
+        return files
+
+    def render_html(self, data):
+        """The SPA shell with the page title, meta tags and the portfolio inlined"""
+        head = [
+            f'<meta name="description" content="{escape(data.get("tagline") or "")}" />',
+            f'<meta property="og:title" content="{escape(data.get("name") or data["username"])}" />',
+            json_script(data, 'portfolio-data'),
+        ]
+        if data.get('theme_color'):
+            head.insert(0, f'<meta name="theme-color" content="{escape(data["theme_color"])}" />')
+        title = f'<title>{escape(data["username"])}\'s Portfolio</title>'
+        html, found = re.subn(r'<title>.*?</title>', lambda match: title, self.html_template, count=1, flags=re.S)
+        if not found:
+            head.insert(0, title)
+        return html.replace('</head>', '\n'.join(head) + '\n</head>', 1)
+
+
+def export_portfolio(username, output, base_url, html_template=None):
+    """Write one portfolio's files; returns their relative paths"""
+    portfolio = Portfolio.objects.get(username=username)
+    files = Exporter(base_url, html_template).render(portfolio)
+    for relative, content in files.items():
+        write(output, relative, content)
+    return sorted(files)
+
+
+def _init_worker():
+    # Needed under the spawn start method; forked workers are set up already
+    django.setup()
+    connections.close_all()
+
+
+def load_manifest(output):
+    try:
+        return json.loads((Path(output) / MANIFEST).read_text())
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def export(output, base_url, html_template=None, force=False, workers=1, log=None):
+    """
+    Export every active portfolio whose content changed since the last run
+    (all of them with `force`). Returns (exported, removed) usernames.
+    """
+    base_url = check_base_url(base_url)
+    log = log or (lambda message: None)
+    manifest = load_manifest(output)
+    settings_changed = (manifest.get('base_url'), manifest.get('html')) != (base_url, html_template is not None)
+    previous = manifest.get('portfolios', {})
+    # Read the states first: a change made during the export is picked up next time
+    states = {
+        username: encode_state(state)
+        for username, state in portfolio_content_states(Portfolio.objects.filter(is_active=True)).items()
+    }
+    changed = [
+        username for username, state in sorted(states.items())
+        if force or settings_changed or previous.get(username, {}).get('state') != state
+    ]
+
+    if workers > 1 and len(changed) > 1:
+        # Forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            export_one = partial(export_portfolio, output=output, base_url=base_url, html_template=html_template)
+            results = list(pool.map(export_one, changed))
+    else:
+        results = [export_portfolio(username, output, base_url, html_template) for username in changed]
+
+    portfolios = {username: entry for username, entry in previous.items() if username in states}
+    stale = set()
+    for username, files in zip(changed, results):
+        stale.update(set(previous.get(username, {}).get('files', ())) - set(files))
+        portfolios[username] = {'state': states[username], 'files': files}
+        log(f'Exported {username} ({len(files)} files)')
+    removed = sorted(set(previous) - set(states))
+    for username in removed:
+        stale.update(previous[username].get('files', ()))
+        log(f'Removed {username}')
+    for relative in stale:
+        remove(output, relative)
+
+    content = json.dumps({'base_url': base_url, 'html': html_template is not None, 'portfolios': portfolios}, indent=2)
+    write(output, MANIFEST, content.encode())
+    return changed, removed
+
+
+def remove(output, relative):
+    """Delete an exported file and the directories it leaves empty"""
+    root = Path(output).resolve()
+    path = (root / relative).resolve()
+    if root not in path.parents:
+        return
+    path.unlink(missing_ok=True)
+    for parent in path.parents:
+        if parent == root:
+            break
+        try:
+            parent.rmdir()
+        except OSError:
+            break
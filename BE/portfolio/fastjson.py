@@ -0,0 +1,231 @@
+"""
+Fast serialization and JSON rendering for the public read API.
+
+DRF's Serializer.to_representation() handles every field of every object
+the generic way: it resolves the field's source through get_attribute()
+(a loop over the dotted source, a Mapping check, a callable check and a
+try/except), checks for SkipField and PKOnlyObject, and calls the field's
+to_representation(). `CompiledFieldsMixin` looks at the serializer's fields
+once per serializer instance (so once per request for a list, after
+`fields`/`expand` pruning) and builds one extractor per field, specialised
+by field type:
+
+- model columns rendered by CharField/IntegerField/BooleanField (or a
+  subclass that converts the same way) are read with getattr() and passed
+  through when they already have the type the field converts them to;
+- aware datetimes rendered as ISO 8601 are converted to the timezone
+  the field would use, looked up once rather than per value;
+- other model columns (dates, choices, files) are read with getattr() and
+  given to the field's own to_representation();
+- foreign keys rendered as primary keys read the `<name>_id` column;
+- SerializerMethodFields call the bound method;
+- anything else (dotted sources, nested serializers, SrcsetField) goes
+  through the field's get_attribute()/to_representation() unchanged.
+
+The output is the same dict as DRF's. `FastJSONRenderer` encodes it with
+orjson (a requirement, though its absence is tolerated) instead of
+json.dumps() with DRF's encoder class.
+orjson writes the same bytes as JSONRenderer's compact UTF-8 output, except
+for floats below 1e-4 or from 1e16 up (written without exponent padding)
+and NaN/infinity (null instead of an error), neither of which the API
+renders. Whatever orjson cannot encode (big integers, non-string keys)
+falls back to JSONRenderer.
+
+FAST_SERIALIZATION = False turns both off.
+"""
+import datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, serializers
+from rest_framework.fields import Field, SkipField
+from rest_framework.relations import PKOnlyObject
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Returned by an extractor for a field to leave out (SkipField)
+SKIP = object()
+
+# Fields that return values of this type unchanged from to_representation()
+PASSTHROUGH_TYPES = (
+    (serializers.CharField, str),
+    (serializers.IntegerField, int),
+    (serializers.BooleanField, bool),
+)
+
+
+def is_enabled():
+    return getattr(settings, 'FAST_SERIALIZATION', True)
+
+
+def _column(model, field):
+    """The concrete, non-relation model field a serializer field reads directly, or None"""
+    if model is None or len(field.source_attrs) != 1:
+        return None
+    try:
+        column = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return None
+    if not column.concrete or column.is_relation or column.attname != field.source:
+        return None
+    return column
+
+
+def _foreign_key(model, field):
+    """attname of the foreign key a PrimaryKeyRelatedField renders, or None"""
+    if model is None or type(field) is not serializers.PrimaryKeyRelatedField or field.pk_field is not None:
+        return None
+    if len(field.source_attrs) != 1:
+        return None
+    try:
+        column = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return None
+    if not column.concrete or not (column.many_to_one or column.one_to_one):
+        return None
+    return column.attname
+
+
+def _passthrough(attname, kind, to_representation):
+    def extract(instance):
+        value = getattr(instance, attname)
+        if value is None or type(value) is kind:
+            return value
+        return to_representation(value)
+    return extract
+
+
+def _converted(attname, to_representation):
+    def extract(instance):
+        value = getattr(instance, attname)
+        return None if value is None else to_representation(value)
+    return extract
+
+
+def _datetime(attname, field):
+    """DateTimeField.to_representation() for aware datetimes, in ISO 8601"""
+    to_representation = field.to_representation
+    # Resolved once; the current timezone does not change within a request
+    output_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_timezone is None:
+        return _converted(attname, to_representation)
+
+    def extract(instance):
+        value = getattr(instance, attname)
+        if type(value) is not datetime.datetime or value.tzinfo is None:
+            return None if value is None else to_representation(value)
+        value = value.astimezone(output_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+    return extract
+
+
+def _is_iso_datetime(field):
+    field_class = type(field)
+    return (
+        field_class.to_representation is serializers.DateTimeField.to_representation
+        and field_class.enforce_timezone is serializers.DateTimeField.enforce_timezone
+        and str(getattr(field, 'format', api_settings.DATETIME_FORMAT)).lower() == ISO_8601
+    )
+
+
+def _attribute(attname):
+    def extract(instance):
+        return getattr(instance, attname)
+    return extract
+
+
+def _generic(field):
+    """Serializer.to_representation() for a single field"""
+    get_attribute, to_representation = field.get_attribute, field.to_representation
+
+    def extract(instance):
+        try:
+            attribute = get_attribute(instance)
+        except SkipField:
+            return SKIP
+        check_for_none = attribute.pk if isinstance(attribute, PKOnlyObject) else attribute
+        return None if check_for_none is None else to_representation(attribute)
+    extract.can_skip = True
+    return extract
+
+
+def compile_field(serializer, field, model):
+    """Extractor for one field: instance -> representation, or SKIP"""
+    field_class = type(field)
+    if isinstance(field, serializers.SerializerMethodField):
+        return getattr(serializer, field.method_name)
+    attname = _foreign_key(model, field)
+    if attname is not None:
+        return _attribute(attname)
+    column = _column(model, field)
+    if column is not None and field_class.get_attribute is Field.get_attribute:
+        for base, kind in PASSTHROUGH_TYPES:
+            if field_class.to_representation is base.to_representation:
+                return _passthrough(column.attname, kind, field.to_representation)
+        if isinstance(field, serializers.DateTimeField) and _is_iso_datetime(field):
+            return _datetime(column.attname, field)
+        return _converted(column.attname, field.to_representation)
+    return _generic(field)
+
+
+class CompiledFieldsMixin:
+    """
+    Serializer.to_representation() with the fields compiled into
+    per-type extractors (see the module docstring). Put it before the
+    serializer class in the bases.
+    """
+
+    def compile_fields(self):
+        model = getattr(getattr(self, 'Meta', None), 'model', None)
+        plan = [(field.field_name, compile_field(self, field, model)) for field in self._readable_fields]
+        return plan, any(getattr(extract, 'can_skip', False) for _, extract in plan)
+
+    def to_representation(self, instance):
+        if not is_enabled():
+            return super().to_representation(instance)
+        try:
+            plan, can_skip = self._compiled_fields
+        except AttributeError:
+            plan, can_skip = self._compiled_fields = self.compile_fields()
+        if not can_skip:
+            return {name: extract(instance) for name, extract in plan}
+        ret = {}
+        for name, extract in plan:
+            value = extract(instance)
+            if value is not SKIP:
+                ret[name] = value
+        return ret
+
+
+_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Also gets dates and times (see OPT_PASSTHROUGH_DATETIME), to format them like DRF
+    return _encoder.default(obj)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer encoding with orjson when it would write the same bytes"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or not is_enabled() or data is None
+            or self.encoder_class is not JSONEncoder or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like JSONRenderer does, so the output is valid JavaScript
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
@@ -0,0 +1,159 @@
+"""
+Responsive derivatives for the image fields served by the public API.
+
+When a row is saved with a new image, a queued job (see portfolio.jobs)
+renders size-bounded copies in modern formats (AVIF and WebP, where the
+installed Pillow can encode them) and records them in the
+`<field>_variants` JSON column next to the image, which the serializers
+expose as srcset strings.
+Originals are left untouched. `Project.thumbnail` is generated from
+`Project.image` when it is left empty.
+"""
+import posixpath
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from . import jobs
+
+# (model label, image field) pairs that get derivatives
+IMAGE_FIELDS = (
+    ('portfolio.Portfolio', 'profile_image'),
+    ('portfolio.Project', 'image'),
+    ('portfolio.Project', 'thumbnail'),
+    ('portfolio.Testimonial', 'client_image'),
+    ('portfolio.Achievement', 'image'),
+    ('portfolio.BlogPost', 'featured_image'),
+    ('portfolio.Resource', 'thumbnail'),
+    ('company.CompanyProfile', 'logo'),
+)
+
+QUALITY = {'avif': 60, 'webp': 80}
+THUMBNAIL_WIDTH = 480
+
+
+def variants_field(field):
+    return f'{field}_variants'
+
+
+def get_widths():
+    return sorted(getattr(settings, 'IMAGE_DERIVATIVE_WIDTHS', [160, 320, 640, 1280]))
+
+
+def get_formats():
+    return [fmt for fmt in getattr(settings, 'IMAGE_DERIVATIVE_FORMATS', ['avif', 'webp']) if features.check(fmt)]
+
+
+def is_current(file, variants):
+    """Whether `variants` was generated from the file currently in the field"""
+    return (file.name or '') == (variants or {}).get('source', '')
+
+
+def _load(file):
+    image = ImageOps.exif_transpose(Image.open(file))
+    return image.convert('RGBA' if image.has_transparency_data else 'RGB')
+
+
+def _resize(image, width):
+    if width >= image.width:
+        return image
+    return image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+
+
+def _encode(image, fmt):
+    buffer = BytesIO()
+    image.save(buffer, fmt.upper(), quality=QUALITY.get(fmt, 80))
+    return buffer.getvalue()
+
+
+def render(file):
+    """
+    Encode `file` at every configured width up to its own (images are never
+    upscaled) in every supported format. Returns (width, height, [(format,
+    width, bytes)]).
+    """
+    image = _load(file)
+    widths = [width for width in get_widths() if width < image.width]
+    if image.width <= get_widths()[-1]:
+        widths.append(image.width)
+    outputs = []
+    for width in widths:
+        resized = _resize(image, width)
+        outputs += [(fmt, width, _encode(resized, fmt)) for fmt in get_formats()]
+    return image.width, image.height, outputs
+
+
+def derivative_name(source, width, fmt):
+    root, _ = posixpath.splitext(source)
+    return f'derivatives/{root}-{width}w.{fmt}'
+
+
+def generate(name, storage=default_storage):
+    """Render and store the derivatives of a stored image; returns its manifest"""
+    with storage.open(name) as file:
+        width, height, outputs = render(file)
+    formats = {}
+    for fmt, size, data in outputs:
+        target = derivative_name(name, size, fmt)
+        if storage.exists(target):
+            storage.delete(target)
+        formats.setdefault(fmt, {})[str(size)] = storage.save(target, ContentFile(data))
+    return {'source': name, 'width': width, 'height': height, 'formats': formats}
+
+
+def make_thumbnail(instance, source_field, thumbnail_field):
+    """Fill an empty thumbnail field from another image field (not saved)"""
+    with getattr(instance, source_field).open() as file:
+        image = _resize(_load(file).convert('RGB'), THUMBNAIL_WIDTH)
+    root, _ = posixpath.splitext(posixpath.basename(getattr(instance, source_field).name))
+    getattr(instance, thumbnail_field).save(f'{root}.jpg', ContentFile(_encode(image, 'jpeg')), save=False)
+
+
+def process(label, pk, field, force=False):
+    """
+    Bring one row's derivatives in line with its image. The variants are
+    written with save(update_fields=...), so the usual signals invalidate
+    the cached responses that embed them.
+    """
+    model = apps.get_model(label)
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    file = getattr(instance, field)
+    if is_current(file, getattr(instance, variants_field(field))) and not force:
+        return
+    setattr(instance, variants_field(field), generate(file.name) if file else {})
+    update_fields = [variants_field(field)]
+    if label == 'portfolio.Project' and field == 'image' and file and not instance.thumbnail:
+        make_thumbnail(instance, 'image', 'thumbnail')
+        update_fields.append('thumbnail')
+    if any(f.name == 'updated_at' for f in model._meta.fields):
+        update_fields.append('updated_at')
+    instance.save(update_fields=update_fields)
+
+
+def schedule(instance, field):
+    """
+    Queue the derivatives of a row's current image. The key only dedupes
+    against pending jobs, so an image changed back (A -> B -> A, or the
+    same bytes uploaded again under their content-addressed name) is
+    processed again.
+    """
+    name = getattr(instance, field).name or ''
+    jobs.enqueue(
+        process, label=instance._meta.label, pk=instance.pk, field=field,
+        key=f'image:{instance._meta.label}:{instance.pk}:{field}:{name}', while_pending=True,
+    )
+
+
+def schedule_changed(instance):
+    """Schedule every image field of `instance` whose variants are out of date"""
+    for label, field in IMAGE_FIELDS:
+        if label == instance._meta.label and not is_current(
+            getattr(instance, field), getattr(instance, variants_field(field))
+        ):
+            schedule(instance, field)
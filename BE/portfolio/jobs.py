@@ -0,0 +1,150 @@
+"""
+Database-backed job queue for work that should not run in the request.
+
+`enqueue()` stores a Job row in the caller's transaction, so a job only
+becomes visible to workers once the data it refers to is committed, and is
+dropped if the transaction rolls back. `manage.py runworker` claims due
+jobs with a conditional UPDATE (portable to SQLite, which has no
+SELECT ... FOR UPDATE SKIP LOCKED) and calls them. Failures are retried
+with exponential backoff until `max_attempts`. An idempotency key makes
+enqueueing the same work twice a no-op.
+"""
+import logging
+import os
+import random
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ('done', 'failed')
+
+# Seconds between the worker's purges of finished jobs
+PURGE_INTERVAL = 60 * 60
+
+
+def get_backoff():
+    return getattr(settings, 'JOB_RETRY_BACKOFF', 10)
+
+
+def get_timeout():
+    return getattr(settings, 'JOB_TIMEOUT', 10 * 60)
+
+
+def get_retention():
+    return getattr(settings, 'JOB_RETENTION_DAYS', 7)
+
+
+def is_eager():
+    return getattr(settings, 'JOBS_EAGER', False)
+
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def enqueue(func, key=None, delay=0, max_attempts=5, while_pending=False, **kwargs):
+    """
+    Queue `func(**kwargs)`. `func` must be a module-level function and the
+    kwargs JSON-serializable. Returns the Job, or the existing one when a
+    job with the same idempotency `key` was already queued. With
+    `while_pending`, the key only matches queued or running jobs: a
+    finished job gives it up and the work is queued again.
+    """
+    path = f'{func.__module__}.{func.__qualname__}'
+    if key is not None:
+        existing = Job.objects.filter(idempotency_key=key).first()
+        if existing is not None and not (while_pending and existing.status in FINISHED):
+            return existing
+        if existing is not None:
+            Job.objects.filter(pk=existing.pk, status=existing.status).update(idempotency_key=None)
+    try:
+        with transaction.atomic():
+            job = Job.objects.create(
+                func=path, kwargs=kwargs, idempotency_key=key, max_attempts=max_attempts,
+                run_at=timezone.now() + timedelta(seconds=delay),
+            )
+    except IntegrityError:
+        # Lost a race with another request using the same key
+        return Job.objects.get(idempotency_key=key)
+    if is_eager():
+        transaction.on_commit(lambda: run(job.pk))
+    return job
+
+
+def claim(worker=None):
+    """Lock the next due job for `worker`; returns its pk or None"""
+    worker = worker or worker_id()
+    now = timezone.now()
+    due = Job.objects.filter(status='queued', run_at__lte=now).order_by('run_at', 'id')
+    for pk in due.values_list('pk', flat=True)[:10]:
+        # Only one worker's UPDATE can match status='queued'
+        if Job.objects.filter(pk=pk, status='queued').update(
+            status='running', locked_at=now, locked_by=worker, updated_at=now
+        ):
+            return pk
+    return None
+
+
+def run(pk):
+    """Run a claimed (or, in eager mode, queued) job and record the outcome"""
+    job = Job.objects.get(pk=pk)
+    job.attempts += 1
+    try:
+        import_string(job.func)(**job.kwargs)
+    except Exception:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+            logger.exception('Job %s (%s) failed permanently', job.pk, job.func)
+        else:
+            job.status = 'queued'
+            delay = get_backoff() * 2 ** (job.attempts - 1)
+            job.run_at = timezone.now() + timedelta(seconds=delay * random.uniform(1, 1.1))
+            logger.warning('Job %s (%s) failed, retrying in %ds', job.pk, job.func, delay)
+    else:
+        job.status = 'done'
+    job.locked_at = None
+    job.locked_by = ''
+    job.save(update_fields=['attempts', 'status', 'run_at', 'last_error', 'locked_at', 'locked_by', 'updated_at'])
+    return job
+
+
+def requeue_stale():
+    """Return jobs whose worker died mid-run to the queue"""
+    cutoff = timezone.now() - timedelta(seconds=get_timeout())
+    return Job.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_at=None, locked_by=''
+    )
+
+
+def run_pending(worker=None, limit=None):
+    """Run due jobs until none are left (or `limit` ran); returns the count"""
+    count = 0
+    while limit is None or count < limit:
+        pk = claim(worker)
+        if pk is None:
+            break
+        run(pk)
+        count += 1
+    return count
+
+
+def purge(days=None):
+    """
+    Delete finished jobs (and so their idempotency keys) older than `days`,
+    JOB_RETENTION_DAYS by default; failed jobs are kept for inspection.
+    `runworker` calls this every PURGE_INTERVAL seconds.
+    """
+    days = get_retention() if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    return Job.objects.filter(status='done', updated_at__lt=cutoff).delete()[0]
@@ -0,0 +1,512 @@
+import random
+import statistics
+import time
+import tracemalloc
+import uuid
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
+
+from django.apps import apps
+from django.conf import settings
+from django.core.mail.backends.locmem import EmailBackend
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from company import carousel
+from company.models import FeaturedDeveloper
+from company.serializers import FeaturedDeveloperSerializer
+from company.views import FeaturedDeveloperViewSet
+from portfolio import cache, compression, images, jobs, search, subscribers
+from portfolio.models import (
+    Portfolio, About, Skill, Project, CaseStudy, Service, Testimonial, Achievement, Hobby, BlogPost,
+    Newsletter,
+)
+from portfolio.pagination import KeysetPagination
+from portfolio.bundle import BundleViewSet
+from portfolio.fastjson import FastJSONRenderer
+from portfolio.serializers import BlogPostListSerializer, PortfolioSerializer, ProjectSerializer
+from portfolio.views import (
+    PortfolioViewSet, ProjectViewSet, BlogPostViewSet, ContactMessageView, NewsletterSubscribeView,
+    blog_post_queryset, portfolio_detail_prefetches, project_queryset,
+)
+
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
+
+
+class SlowEmailBackend(EmailBackend):
+    """In-memory backend with the round trip of a remote SMTP server"""
+    latency = 0.05
+
+    def send_messages(self, messages):
+        time.sleep(self.latency)
+        return super().send_messages(messages)
+
+
+def percentiles(func, repeat):
+    """(p50, p99) wall time of `repeat` calls, in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def timed(func, repeat):
+    """Median wall time of `repeat` calls, in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    help = 'Runs a performance benchmark against throwaway data that is rolled back afterwards'
+
+    scenarios = ['pagination', 'search', 'sections', 'bundle', 'carousel', 'images', 'jobs', 'newsletter', 'compression', 'serializers']
+
+    def add_arguments(self, parser):
+        parser.add_argument('scenario', choices=self.scenarios)
+        parser.add_argument('--rows', type=int, default=10000, help='Rows to generate')
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per measurement')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            getattr(self, f'bench_{options["scenario"]}')(options['rows'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def create_portfolio(self):
+        username = f'bench-{uuid.uuid4().hex[:8]}'
+        user = User.objects.create(username=username)
+        return Portfolio.objects.create(user=user, username=username, name='Benchmark')
+
+    def create_posts(self, portfolio, rows):
+        now = timezone.now()
+        BlogPost.objects.bulk_create(
+            BlogPost(
+                portfolio=portfolio, title=f'Post {i}', slug=f'post-{i}',
+                excerpt='Excerpt', content='Content ' * 50, tags='python, django',
+                status='published', published_at=now - timezone.timedelta(minutes=i),
+            )
+            for i in range(rows)
+        )
+
+    def bench_pagination(self, rows, repeat):
+        """Deep-page latency: PageNumberPagination vs KeysetPagination"""
+        portfolio = self.create_portfolio()
+        self.create_posts(portfolio, rows)
+        queryset = BlogPost.objects.filter(portfolio=portfolio, status='published')
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        page_size = KeysetPagination.page_size
+        last_page = max(1, (rows + page_size - 1) // page_size)
+
+        # Cursor pointing just before the first row of each page
+        first = KeysetPagination()
+        first.paginate_queryset(queryset, Request(factory.get('/', {'cursor': ''})))
+
+        def cursor_for(page):
+            if page == 1:
+                return ''
+            row = queryset[(page - 1) * page_size - 1]
+            return parse_qs(urlparse(first.encode_cursor(row, reverse=False)).query)['cursor'][0]
+
+        self.stdout.write(f'{rows} published posts, {page_size} per page, median of {repeat} runs')
+        self.stdout.write(f'{"page":>8} {"page number (ms)":>18} {"keyset (ms)":>12}')
+        for page in sorted({1, 10, last_page // 2, last_page}):
+            numbered = Request(factory.get('/', {'page': page}))
+            keyset = Request(factory.get('/', {'cursor': cursor_for(page)}))
+            offset_ms = timed(lambda: PageNumberPagination().paginate_queryset(queryset, numbered), repeat)
+            keyset_ms = timed(lambda: KeysetPagination().paginate_queryset(queryset, keyset), repeat)
+            self.stdout.write(f'{page:>8} {offset_ms:>18.2f} {keyset_ms:>12.2f}')
+
+    def create_articles(self, portfolio, rows):
+        """Posts with a Zipf-like vocabulary, so terms range from common to rare"""
+        rng = random.Random(0)
+        vocabulary = [f'word{i}' for i in range(5000)]
+        weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+        now = timezone.now()
+        BlogPost.objects.bulk_create(
+            BlogPost(
+                portfolio=portfolio, title=' '.join(rng.choices(vocabulary, weights, k=6)),
+                slug=f'post-{i}', excerpt=' '.join(rng.choices(vocabulary, weights, k=20)),
+                content=' '.join(rng.choices(vocabulary, weights, k=300)),
+                status='published', published_at=now - timezone.timedelta(minutes=i),
+            )
+            for i in range(rows)
+        )
+
+    def bench_search(self, rows, repeat):
+        """BM25 query latency over the inverted index, from rare to very common terms"""
+        portfolio = self.create_portfolio()
+        self.create_articles(portfolio, rows)
+        # bulk_create skips the signals that maintain the index
+        search.rebuild([portfolio.pk])
+        search.document_count(portfolio.username, portfolio.pk)
+
+        queries = ['word4000', 'word500', 'word50', 'word1', 'word0', 'word0 word1 word50 word500']
+        self.stdout.write(f'{rows} published posts, median of {repeat} runs')
+        self.stdout.write(f'{"query":>28} {"matches":>8} {"ms":>8}')
+        for query in queries:
+            matches = portfolio.search_documents.filter(postings__term__in=query.split()).distinct().count()
+            elapsed = timed(lambda: search.search(portfolio.username, portfolio.pk, query), repeat)
+            self.stdout.write(f'{query:>28} {matches:>8} {elapsed:>8.2f}')
+
+    def create_sections(self, portfolio, rows):
+        """`rows` items in every section of the portfolio detail tree"""
+        About.objects.create(portfolio=portfolio, bio='Bio ' * 100)
+        Skill.objects.bulk_create(Skill(portfolio=portfolio, name=f'Skill {i}', order=i) for i in range(rows))
+        for i in range(rows):
+            project = Project.objects.create(
+                portfolio=portfolio, title=f'Project {i}', description='Description ' * 20,
+                detailed_description='Details ' * 100, technologies='Python, Django, Postgres', order=i,
+            )
+            CaseStudy.objects.create(
+                project=project, challenge='Challenge ' * 50, solution='Solution ' * 50, results='Results ' * 20,
+            )
+            Testimonial.objects.create(
+                portfolio=portfolio, project=project, client_name=f'Client {i}', content='Great work ' * 20,
+            )
+        Service.objects.bulk_create(
+            Service(portfolio=portfolio, title=f'Service {i}', description='Service ' * 20) for i in range(rows)
+        )
+        Achievement.objects.bulk_create(
+            Achievement(portfolio=portfolio, title=f'Award {i}', date_received=timezone.now().date())
+            for i in range(rows)
+        )
+        Hobby.objects.bulk_create(Hobby(portfolio=portfolio, title=f'Hobby {i}') for i in range(rows))
+
+    def bench_sections(self, rows, repeat):
+        """Payload size, queries and latency of ?fields=/?expand= section combinations"""
+        portfolio = self.create_portfolio()
+        self.create_sections(portfolio, min(rows, 200))
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        # Measure the database and serializer work, not the response cache
+        view = type('UncachedPortfolioViewSet', (PortfolioViewSet,), {
+            'cached_actions': (), 'conditional_actions': (),
+        }).as_view({'get': 'retrieve'})
+
+        combinations = [
+            {},
+            {'fields': 'username,name,tagline,about'},
+            {'fields': 'username,skills'},
+            {'fields': 'username,projects'},
+            {'fields': 'username,projects', 'expand': 'projects.case_study'},
+            {'fields': 'username,projects', 'expand': 'projects.case_study,projects.testimonials'},
+            {'fields': 'username,achievements,hobbies'},
+        ]
+        self.stdout.write(f'{min(rows, 200)} items per section, median of {repeat} runs')
+        self.stdout.write(f'{"parameters":<72} {"bytes":>9} {"queries":>8} {"ms":>8}')
+        for params in combinations:
+            request = factory.get('/', params, HTTP_ACCEPT='application/json')
+
+            def fetch():
+                response = view(request, username=portfolio.username)
+                response.render()
+                return response
+
+            with CaptureQueriesContext(connection) as queries:
+                size = len(fetch().content)
+            elapsed = timed(fetch, repeat)
+            label = '&'.join(f'{name}={value}' for name, value in params.items()) or '(full)'
+            self.stdout.write(f'{label:<72} {size:>9} {len(queries):>8} {elapsed:>8.2f}')
+
+    def bench_bundle(self, rows, repeat):
+        """
+        A portfolio page loaded as three requests (detail, featured projects,
+        featured posts) vs one bundle request
+        """
+        portfolio = self.create_portfolio()
+        items = min(rows, 200)
+        self.create_sections(portfolio, items)
+        Project.objects.filter(portfolio=portfolio, order__lt=items // 4).update(is_featured=True)
+        self.create_posts(portfolio, items)
+        BlogPost.objects.filter(portfolio=portfolio, slug__in=[f'post-{i}' for i in range(5)]).update(is_featured=True)
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+
+        def uncached(viewset, actions):
+            # Measure the database and serializer work, not the response cache
+            return type(f'Uncached{viewset.__name__}', (viewset,), {
+                'cached_actions': (), 'conditional_actions': (),
+            }).as_view(actions)
+
+        waterfall = [
+            uncached(PortfolioViewSet, {'get': 'retrieve'}),
+            uncached(ProjectViewSet, {'get': 'featured'}),
+            uncached(BlogPostViewSet, {'get': 'featured'}),
+        ]
+        bundle = [uncached(BundleViewSet, {'get': 'list'})]
+        request = factory.get('/', HTTP_ACCEPT='application/json')
+
+        self.stdout.write(f'{items} items per section, median of {repeat} runs')
+        self.stdout.write(f'{"page load":<12} {"requests":>9} {"bytes":>9} {"queries":>8} {"ms":>8}')
+        for label, views in (('waterfall', waterfall), ('bundle', bundle)):
+            def fetch():
+                size = 0
+                for view in views:
+                    response = view(request, username=portfolio.username)
+                    response.render()
+                    size += len(response.content)
+                return size
+
+            with CaptureQueriesContext(connection) as queries:
+                size = fetch()
+            elapsed = timed(fetch, repeat)
+            self.stdout.write(f'{label:<12} {len(views):>9} {size:>9} {len(queries):>8} {elapsed:>8.2f}')
+
+    def bench_carousel(self, rows, repeat):
+        """featured-developers/best/ serialized per request vs served from the snapshot"""
+        count = min(rows, 100)
+        developers = []
+        for i in range(count):
+            portfolio = self.create_portfolio()
+            About.objects.create(portfolio=portfolio, bio='Bio ' * 100)
+            Skill.objects.bulk_create(Skill(portfolio=portfolio, name=f'Skill {j}', order=j) for j in range(10))
+            developers.append(FeaturedDeveloper(portfolio=portfolio, display_order=i))
+        FeaturedDeveloper.objects.bulk_create(developers)
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        request = factory.get('/', HTTP_ACCEPT='application/json')
+
+        def serialized():
+            # What best() did before the snapshot
+            queryset = FeaturedDeveloper.objects.filter(
+                is_active=True, portfolio__is_active=True,
+            ).select_related('portfolio').prefetch_related('portfolio__about', 'portfolio__skills')
+            data = FeaturedDeveloperSerializer(
+                queryset[:carousel.SIZE], many=True, context={'request': Request(request)},
+            ).data
+            return JSONRenderer().render(data)
+
+        view = FeaturedDeveloperViewSet.as_view({'get': 'best'})
+
+        def snapshot():
+            response = view(request)
+            return response.content
+
+        snapshot()
+        self.stdout.write(f'{count} featured developers, {carousel.SIZE} shown, median of {repeat} runs')
+        self.stdout.write(f'{"path":<12} {"bytes":>9} {"queries":>8} {"ms":>8}')
+        for label, fetch in (('serialized', serialized), ('snapshot', snapshot)):
+            with CaptureQueriesContext(connection) as queries:
+                size = len(fetch())
+            elapsed = timed(fetch, repeat)
+            self.stdout.write(f'{label:<12} {size:>9} {len(queries):>8} {elapsed:>8.2f}')
+
+    def bench_images(self, rows, repeat):
+        """
+        Bytes a browser downloads for every stored image: the original vs
+        the smallest derivative that covers a 640px slot (or the largest one)
+        """
+        names = set()
+        for label, field in images.IMAGE_FIELDS:
+            names.update(apps.get_model(label).objects.exclude(**{field: ''}).exclude(
+                **{f'{field}__isnull': True}
+            ).values_list(field, flat=True))
+        if not names:
+            # No rows reference images yet: use the uploads in MEDIA_ROOT
+            root = Path(settings.MEDIA_ROOT)
+            names = {
+                path.relative_to(root).as_posix() for path in root.rglob('*')
+                if path.suffix.lower() in IMAGE_SUFFIXES and 'derivatives' not in path.parts
+            }
+        if not names:
+            self.stdout.write('No stored images')
+            return
+
+        slot = 640
+        self.stdout.write(f'{len(names)} images, {slot}px slot, formats: {", ".join(images.get_formats())}')
+        self.stdout.write(f'{"image":<48} {"original":>10} {"best":>10} {"format":>7} {"render ms":>10}')
+        before = after = 0
+        for name in sorted(names):
+            if not default_storage.exists(name):
+                continue
+            with default_storage.open(name) as file:
+                original = file.size
+                width, _, outputs = images.render(file)
+
+            def render():
+                with default_storage.open(name) as file:
+                    images.render(file)
+
+            elapsed = timed(render, max(1, repeat // 10))
+            needed = min(slot, width)
+            fitting = [item for item in outputs if item[1] >= needed] or outputs
+            fmt, _, data = min(fitting, key=lambda item: (item[1], len(item[2])))
+            before += original
+            after += min(original, len(data))
+            self.stdout.write(f'{name:<48} {original:>10} {len(data):>10} {fmt:>7} {elapsed:>10.1f}')
+        self.stdout.write(f'{"total":<48} {before:>10} {after:>10} ({100 * (1 - after / before):.0f}% smaller)')
+
+    def bench_jobs(self, rows, repeat):
+        """
+        POST latency with the side effects (notification and confirmation
+        emails over a slow SMTP link) run inline vs queued for the worker
+        """
+        portfolio = self.create_portfolio()
+        portfolio.user.email = 'owner@example.com'
+        portfolio.user.save()
+        factory = APIRequestFactory(SERVER_NAME='localhost')
+        endpoints = [
+            ('contact', ContactMessageView.as_view(), lambda i: {
+                'name': 'Reader', 'email': 'reader@example.com', 'subject': 'Hi', 'message': 'Hello ' * 50,
+            }),
+            ('newsletter', NewsletterSubscribeView.as_view(), lambda i: {'email': f'reader{i}@example.com'}),
+        ]
+        self.stdout.write(
+            f'{int(SlowEmailBackend.latency * 1000)}ms SMTP round trip, {repeat} requests per run'
+        )
+        self.stdout.write(f'{"endpoint":<12} {"mode":<8} {"p50 (ms)":>10} {"p99 (ms)":>10}')
+        backend = f'{__name__}.SlowEmailBackend'
+        with override_settings(EMAIL_BACKEND=backend):
+            for name, view, data in endpoints:
+                for mode in ('inline', 'queued'):
+                    counter = iter(range(10 ** 9))
+
+                    def post():
+                        i = next(counter)
+                        request = factory.post('/', data(f'{mode}{i}'), format='json')
+                        view(request, username=portfolio.username)
+                        if mode == 'inline':
+                            # What the request used to wait for
+                            jobs.run_pending()
+
+                    p50, p99 = percentiles(post, repeat)
+                    self.stdout.write(f'{name:<12} {mode:<8} {p50:>10.2f} {p99:>10.2f}')
+                    jobs.run_pending()
+
+    def bench_newsletter(self, rows, repeat):
+        """
+        Subscriber import throughput, one get_or_create() per row vs
+        bulk_create(), and export throughput and peak memory
+        """
+        records = [{'email': f'reader{i}@example.com', 'name': f'Reader {i}'} for i in range(rows)]
+        # Half of them again, as already subscribed
+        records += records[:rows // 2]
+        self.stdout.write(f'{rows} subscribers, {len(records) - rows} duplicates')
+        self.stdout.write(f'{"import":<14} {"seconds":>9} {"rows/s":>10}')
+        for label in ('get_or_create', 'bulk_create'):
+            portfolio = self.create_portfolio()
+            start = time.perf_counter()
+            if label == 'bulk_create':
+                subscribers.import_records(iter(records), portfolio=portfolio)
+            else:
+                for record in records:
+                    Newsletter.objects.get_or_create(
+                        portfolio=portfolio, email=record['email'], defaults={'name': record['name']},
+                    )
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{label:<14} {elapsed:>9.2f} {len(records) / elapsed:>10.0f}')
+
+        queryset = Newsletter.objects.filter(portfolio=portfolio)
+        self.stdout.write(f'{"export":<14} {"seconds":>9} {"rows/s":>10} {"peak KiB":>9}')
+        for label, export in (
+            # What a view building the whole file in memory would do
+            ('list', lambda fmt: ''.join(subscribers.STREAMS[fmt](
+                list(subscribers.rows(queryset, subscribers.FIELDS)), subscribers.FIELDS,
+            ))),
+            ('stream', lambda fmt: sum(len(chunk) for chunk in subscribers.batched(
+                subscribers.STREAMS[fmt](subscribers.rows(queryset, subscribers.FIELDS), subscribers.FIELDS),
+            ))),
+        ):
+            for fmt in subscribers.STREAMS:
+                tracemalloc.start()
+                start = time.perf_counter()
+                export(fmt)
+                elapsed = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                name = f'{label} {fmt}'
+                self.stdout.write(f'{name:<14} {elapsed:>9.2f} {rows / elapsed:>10.0f} {peak // 1024:>9}')
+
+    def bench_compression(self, rows, repeat):
+        """
+        Size and compression time of each coding for the seeded portfolio's
+        JSON, and the latency of cached responses served precompressed
+        """
+        username = f'bench-{uuid.uuid4().hex[:8]}'
+        call_command('seed_portfolio', username, stdout=StringIO())
+        self.create_posts(Portfolio.objects.get(username=username), min(rows, 50))
+        paths = [
+            f'/api/portfolios/{username}/',
+            f'/api/{username}/projects/',
+            f'/api/{username}/blog/',
+            f'/api/{username}/bundle/?include=featured_projects,featured_posts',
+        ]
+        codings = compression.get_codings()
+        client = Client(SERVER_NAME='localhost')
+        self.stdout.write(f'codings: {", ".join(codings)}; median of {repeat} runs')
+        self.stdout.write(f'{"endpoint":<28} {"coding":>8} {"bytes":>8} {"ratio":>7} {"compress ms":>12}')
+        for path in paths:
+            content = client.get(path).content
+            name = path.replace(username, '<user>')[:28]
+            self.stdout.write(f'{name:<28} {"identity":>8} {len(content):>8} {1:>7.2f} {0:>12.3f}')
+            for coding in codings:
+                body = compression.compress(coding, content)
+                elapsed = timed(lambda: compression.compress(coding, content), repeat)
+                self.stdout.write(f'{"":<28} {coding:>8} {len(body):>8} {len(body) / len(content):>7.2f} {elapsed:>12.3f}')
+
+        self.stdout.write(f'{"cache hit":<28} {"coding":>8} {"p50 ms":>8} {"p99 ms":>7}')
+        for coding in [None, *codings]:
+            headers = {'HTTP_ACCEPT_ENCODING': coding} if coding else {}
+            for label, precompress in (('precompressed', compression.precompress), ('per request', None)):
+                if coding is None and precompress is None:
+                    continue
+                cache.get_cache().clear()
+                with mock.patch.object(compression, 'precompress', precompress or (lambda content: None)):
+                    client.get(paths[0], **headers)
+                    p50, p99 = percentiles(lambda: client.get(paths[0], **headers), repeat * 10)
+                self.stdout.write(f'{label:<28} {coding or "identity":>8} {p50:>8.3f} {p99:>7.3f}')
+
+    def bench_serializers(self, rows, repeat):
+        """
+        Objects/s and peak memory of DRF's serializers and JSONRenderer vs
+        the compiled fields and orjson (FAST_SERIALIZATION)
+        """
+        items = min(rows, 500)
+        portfolio = self.create_portfolio()
+        self.create_sections(portfolio, items)
+        self.create_posts(portfolio, items)
+        context = {'request': Request(APIRequestFactory(SERVER_NAME='localhost').get('/'))}
+        # Loaded once, so that only serializing and rendering are measured
+        projects = list(project_queryset().filter(portfolio=portfolio))
+        posts = list(blog_post_queryset().filter(portfolio=portfolio))
+        detail = Portfolio.objects.select_related('about').prefetch_related(
+            *portfolio_detail_prefetches()
+        ).get(pk=portfolio.pk)
+        cases = [
+            ('ProjectSerializer', len(projects), lambda: ProjectSerializer(projects, many=True, context=context).data),
+            ('BlogPostListSerializer', len(posts), lambda: BlogPostListSerializer(posts, many=True, context=context).data),
+            ('PortfolioSerializer', 1, lambda: PortfolioSerializer(detail, context=context).data),
+        ]
+        self.stdout.write(f'{items} projects, posts and items per portfolio section, median of {repeat} runs')
+        self.stdout.write(f'{"serializer":<24} {"mode":>5} {"objects/s":>10} {"rendered/s":>11} {"peak KiB":>9}')
+        for name, count, serialize in cases:
+            for mode in ('drf', 'fast'):
+                with override_settings(FAST_SERIALIZATION=mode == 'fast'):
+                    renderer = FastJSONRenderer()
+                    serialized = timed(serialize, repeat)
+                    rendered = timed(lambda: renderer.render(serialize()), repeat)
+                    tracemalloc.start()
+                    renderer.render(serialize())
+                    peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                self.stdout.write(
+                    f'{name:<24} {mode:>5} {count / serialized * 1000:>10.0f} {count / rendered * 1000:>11.0f} '
+                    f'{peak // 1024:>9}'
+                )
+
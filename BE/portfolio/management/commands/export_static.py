@@ -0,0 +1,49 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from portfolio import export
+
+
+class Command(BaseCommand):
+    help = 'Exports the public API of every active portfolio (and optionally pre-rendered HTML) as static files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default=getattr(settings, 'STATIC_EXPORT_ROOT', None),
+            help='Directory to write to (default: STATIC_EXPORT_ROOT)',
+        )
+        parser.add_argument(
+            '--base-url', default='http://localhost:8000/',
+            help='Public URL of the API; media URLs and pagination links are built from it',
+        )
+        parser.add_argument(
+            '--html', metavar='INDEX_HTML',
+            help="The frontend's built index.html, to write <username>/index.html with the portfolio inlined",
+        )
+        parser.add_argument('--force', action='store_true', help='Re-export unchanged portfolios too')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1, help='Processes exporting portfolios in parallel',
+        )
+
+    def handle(self, *args, **options):
+        if not options['output']:
+            raise CommandError('Pass --output or set STATIC_EXPORT_ROOT')
+        html_template = None
+        if options['html']:
+            try:
+                with open(options['html'], encoding='utf-8') as file:
+                    html_template = file.read()
+            except OSError as exc:
+                raise CommandError(f'Cannot read {options["html"]}: {exc}')
+        try:
+            exported, removed = export.export(
+                options['output'], options['base_url'], html_template,
+                force=options['force'], workers=max(1, options['workers']),
+                log=self.stdout.write if options['verbosity'] > 1 else None,
+            )
+        except export.ExportError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {len(exported)} portfolios, removed {len(removed)} to {options["output"]}'
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from portfolio import counters
+
+
+class Command(BaseCommand):
+    help = 'Writes buffered view and download counts to the database'
+
+    def handle(self, *args, **options):
+        total = counters.flush()
+        self.stdout.write(self.style.SUCCESS(f'Flushed {total} pending increments'))
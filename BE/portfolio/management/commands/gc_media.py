@@ -0,0 +1,40 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from portfolio import orphans
+
+
+class Command(BaseCommand):
+    help = 'Deletes (or quarantines) media files that no row refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only list the orphaned files')
+        parser.add_argument(
+            '--quarantine', metavar='DIR',
+            help='Move orphans to DIR (outside MEDIA_ROOT, keeping their paths) instead of deleting them',
+        )
+        parser.add_argument(
+            '--min-age', type=float, default=24, metavar='HOURS',
+            help='Keep files modified more recently than this (default: 24)',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=min(32, (os.cpu_count() or 1) * 4),
+            help='Threads listing directories in parallel',
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            result = orphans.collect(
+                workers=max(1, options['workers']), min_age=options['min_age'] * 60 * 60,
+                dry_run=options['dry_run'], quarantine=options['quarantine'],
+                log=self.stdout.write if options['dry_run'] or options['verbosity'] > 1 else None,
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        verb = 'Would remove' if options['dry_run'] else ('Quarantined' if options['quarantine'] else 'Removed')
+        self.stdout.write(self.style.SUCCESS(
+            f'Scanned {result.scanned} files in {time.perf_counter() - start:.1f}s: '
+            f'{verb} {result.orphans} orphans ({result.bytes} bytes), kept {result.kept} recent or just reused'
+        ))
@@ -0,0 +1,20 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from portfolio import images
+
+
+class Command(BaseCommand):
+    help = 'Generates missing or outdated responsive image derivatives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate up-to-date derivatives too')
+
+    def handle(self, *args, **options):
+        total = 0
+        for label, field in images.IMAGE_FIELDS:
+            model = apps.get_model(label)
+            rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            for pk in rows.values_list('pk', flat=True):
+                images.process(label, pk, field, force=options['force'])
+                total += 1
+        self.stdout.write(self.style.SUCCESS(f'Checked {total} images'))
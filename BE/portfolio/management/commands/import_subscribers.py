@@ -0,0 +1,43 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from portfolio import subscribers
+from portfolio.models import Portfolio
+
+
+class Command(BaseCommand):
+    help = 'Bulk-imports newsletter subscribers from CSV or NDJSON; existing subscribers are skipped'
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help="CSV or NDJSON file shaped like an export, or '-' for stdin")
+        parser.add_argument(
+            '--portfolio', help='Username to import into; otherwise each record names its portfolio',
+        )
+        parser.add_argument('--format', choices=sorted(subscribers.STREAMS), help='Default: from the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT')
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or options['file'].rpartition('.')[2].lower()
+        if fmt not in subscribers.STREAMS:
+            raise CommandError('Cannot tell the format from the file name; pass --format')
+        portfolio = None
+        if options['portfolio']:
+            portfolio = Portfolio.objects.filter(username=options['portfolio']).first()
+            if portfolio is None:
+                raise CommandError(f'No portfolio {options["portfolio"]!r}')
+        try:
+            file = sys.stdin if options['file'] == '-' else open(options['file'], newline='', encoding='utf-8')
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["file"]}: {exc}')
+        start = time.perf_counter()
+        with file:
+            result = subscribers.import_records(
+                subscribers.read(file, fmt), portfolio=portfolio, batch_size=max(1, options['batch_size']),
+            )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Read {result.read} records in {elapsed:.1f}s ({result.read / max(elapsed, 1e-9):.0f}/s): '
+            f'{result.created} subscribed, {result.read - result.created - result.invalid} duplicates, '
+            f'{result.invalid} invalid'
+        ))
@@ -0,0 +1,226 @@
+import asyncio
+import itertools
+import json
+import time
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+def get_request(url, path):
+    return (
+        f'GET {url.path.rstrip("/")}{path} HTTP/1.1\r\n'
+        f'Host: {url.netloc}\r\nAccept: application/json\r\n\r\n'
+    ).encode()
+
+
+def post_request(url, path, data, address):
+    """A JSON POST from `address`, as a proxy would report it in X-Forwarded-For"""
+    body = json.dumps(data).encode()
+    return (
+        f'POST {url.path.rstrip("/")}{path} HTTP/1.1\r\n'
+        f'Host: {url.netloc}\r\nAccept: application/json\r\nContent-Type: application/json\r\n'
+        f'Content-Length: {len(body)}\r\nX-Forwarded-For: {address}\r\n\r\n'
+    ).encode() + body
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-tests the hot read endpoints (or, with --writes, the contact and newsletter POSTs) '
+        'of running servers, e.g. uvicorn (ASGI) against gunicorn (WSGI)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='+', help='Server base URLs, e.g. http://127.0.0.1:8000')
+        parser.add_argument('--username', default='demo', help='Portfolio to request')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request (repeatable); defaults to the hot read endpoints',
+        )
+        parser.add_argument('--concurrency', type=int, default=200, help='Concurrent keep-alive clients')
+        parser.add_argument('--duration', type=float, default=10, help='Seconds to measure per target')
+        parser.add_argument('--warmup', type=float, default=2, help='Seconds of unmeasured load first')
+        parser.add_argument(
+            '--bust', action='store_true',
+            help='Add a unique query parameter to every request, so none is served from the response cache',
+        )
+        parser.add_argument(
+            '--writes', action='store_true',
+            help='POST contact messages and subscriptions, each from a new client address, '
+                 'alone and then during a flood of POSTs from one address',
+        )
+        parser.add_argument('--flood', type=int, default=50, help='Flooding connections with --writes')
+        parser.add_argument(
+            '--flood-rate', type=float, default=500,
+            help='Flood requests per second, sent on schedule however slowly the server answers',
+        )
+
+    def handle(self, *args, **options):
+        username = options['username']
+        if options['writes']:
+            return self.handle_writes(username, options)
+        paths = options['paths'] or [
+            f'/api/portfolios/{username}/',
+            f'/api/{username}/projects/',
+            f'/api/{username}/blog/',
+            '/api/company/profile/',
+            '/api/company/featured-developers/best/',
+        ]
+        self.stdout.write(
+            f'{options["concurrency"]} clients, {options["duration"]}s per target, {len(paths)} endpoints'
+            + (', response cache bypassed' if options['bust'] else '')
+        )
+        self.stdout.write(
+            f'{"target":<28} {"requests":>9} {"req/s":>9} {"p50 (ms)":>9} {"p99 (ms)":>9} {"non-2xx":>8} {"errors":>7}'
+        )
+        for target in options['targets']:
+            url = self.parse_target(target)
+            counter = itertools.count()
+
+            def make_request(i):
+                path = paths[i % len(paths)]
+                if options['bust']:
+                    path += f'{"&" if "?" in path else "?"}_={next(counter)}'
+                return get_request(url, path)
+
+            clients = {'': (options['concurrency'], make_request, None)}
+            asyncio.run(self.run(url, clients, options['warmup']))
+            result = asyncio.run(self.run(url, clients, options['duration']))['']
+            self.stdout.write(f'{target:<28} {self.summary(target, result, options["duration"])}')
+
+    def handle_writes(self, username, options):
+        """Latency of legitimate POSTs, without and with a flood from one address"""
+        contact = f'/api/{username}/contact/'
+        newsletter = f'/api/{username}/newsletter/subscribe/'
+        counter = itertools.count()
+
+        def legitimate(i):
+            n = next(counter)
+            address = f'10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}'
+            if i % 2:
+                return post_request(url, newsletter, {'email': f'reader{n}@example.com'}, address)
+            return post_request(url, contact, {'name': 'Reader', 'email': 'reader@example.com', 'message': 'Hi'}, address)
+
+        def flood(i):
+            return post_request(url, contact, {'name': 'Spam', 'email': 'spam@example.com', 'message': 'Buy'}, '203.0.113.7')
+
+        self.stdout.write(
+            f'{options["concurrency"]} legitimate clients (a new address per request), '
+            f'{options["flood"]} connections flooding {options["flood_rate"]:.0f} req/s from one address, '
+            f'{options["duration"]}s per phase'
+        )
+        self.stdout.write(
+            f'{"target":<28} {"phase":<6} {"requests":>9} {"req/s":>9} {"p50 (ms)":>9} {"p99 (ms)":>9} '
+            f'{"non-2xx":>8} {"errors":>7} {"flood req/s":>12} {"flood 429":>10}'
+        )
+        legitimate_clients = (options['concurrency'], legitimate, None)
+        flood_clients = (options['flood'], flood, options['flood'] / options['flood_rate'])
+        for target in options['targets']:
+            url = self.parse_target(target)
+            for phase, clients in (
+                ('quiet', {'legitimate': legitimate_clients}),
+                ('flood', {'legitimate': legitimate_clients, 'flood': flood_clients}),
+            ):
+                asyncio.run(self.run(url, clients, options['warmup']))
+                results = asyncio.run(self.run(url, clients, options['duration']))
+                line = f'{target:<28} {phase:<6} {self.summary(target, results["legitimate"], options["duration"])}'
+                if 'flood' in results:
+                    spam = results['flood']
+                    line += f' {len(spam["latencies"]) / options["duration"]:>12.0f} {spam["statuses"].get(429, 0):>10}'
+                self.stdout.write(line)
+
+    def parse_target(self, target):
+        url = urlsplit(target)
+        if url.scheme != 'http' or not url.hostname:
+            raise CommandError(f'Expected an http:// base URL, got {target!r}')
+        return url
+
+    def summary(self, target, result, duration):
+        latencies = sorted(result['latencies'])
+        if not latencies:
+            raise CommandError(f'No successful requests against {target}')
+        return (
+            f'{len(latencies):>9} {len(latencies) / duration:>9.0f} '
+            f'{percentile(latencies, 0.5):>9.1f} {percentile(latencies, 0.99):>9.1f} '
+            f'{result["non_2xx"]:>8} {result["errors"]:>7}'
+        )
+
+    async def run(self, url, clients, duration):
+        """
+        Send requests for `duration` seconds; `clients` maps a group name to
+        (connections, make_request(i), seconds between a connection's
+        requests or None for back to back). Returns the results per group.
+        """
+        results = {name: {'latencies': [], 'non_2xx': 0, 'errors': 0, 'statuses': {}} for name in clients}
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(
+            self.client(url, make_request, i, deadline, results[name], interval)
+            for name, (connections, make_request, interval) in clients.items()
+            for i in range(connections)
+        ))
+        return results
+
+    async def client(self, url, make_request, offset, deadline, result, interval=None):
+        """One keep-alive connection sending requests back to back, or every `interval` seconds"""
+        host = url.hostname
+        port = url.port or 80
+        connection = None
+        scheduled = time.perf_counter()
+        for i in itertools.count(offset):
+            if interval is not None:
+                # Requests the server was too slow to take are dropped, like a
+                # flood's would be, rather than sent in a burst afterwards
+                scheduled = max(scheduled + interval, time.perf_counter())
+                await asyncio.sleep(scheduled - time.perf_counter())
+            if time.perf_counter() >= deadline:
+                break
+            request = make_request(i)
+            start = time.perf_counter()
+            try:
+                if connection is None:
+                    connection = await asyncio.open_connection(host, port)
+                reader, writer = connection
+                writer.write(request)
+                status, keep_alive = await read_response(reader)
+            except (OSError, ConnectionError, ValueError, IndexError, asyncio.IncompleteReadError):
+                result['errors'] += 1
+                connection = None
+                await asyncio.sleep(0.01)
+                continue
+            result['latencies'].append((time.perf_counter() - start) * 1000)
+            result['statuses'][status] = result['statuses'].get(status, 0) + 1
+            if not 200 <= status < 300:
+                result['non_2xx'] += 1
+            if not keep_alive:
+                connection[1].close()
+                connection = None
+        if connection is not None:
+            connection[1].close()
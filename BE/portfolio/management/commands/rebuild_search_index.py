@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from portfolio import cache, search
+from portfolio.models import Portfolio
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the blog post and project search index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('usernames', nargs='*', help='Only rebuild these portfolios')
+
+    def handle(self, *args, **options):
+        portfolios = Portfolio.objects.all()
+        portfolio_ids = None
+        if options['usernames']:
+            portfolios = portfolios.filter(username__in=options['usernames'])
+            portfolio_ids = list(portfolios.values_list('pk', flat=True))
+        total = search.rebuild(portfolio_ids)
+        # Cached search responses were built from the old index
+        for username in portfolios.values_list('username', flat=True):
+            cache.bump_version(username)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} documents'))
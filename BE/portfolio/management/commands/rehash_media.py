@@ -0,0 +1,37 @@
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from portfolio import storage
+
+
+class Command(BaseCommand):
+    help = 'Moves media stored under upload names to content-addressed names, deduplicating identical files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1, help='Threads hashing files in parallel',
+        )
+        parser.add_argument(
+            '--delete', action='store_true',
+            help='Delete the old files afterwards; keep them until cached responses and pages have expired',
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be done')
+
+    def handle(self, *args, **options):
+        if not hasattr(default_storage, 'adopt'):
+            raise CommandError('The default storage is not portfolio.storage.ContentAddressedStorage')
+        start = time.perf_counter()
+        result = storage.rehash(
+            workers=max(1, options['workers']), delete=options['delete'], dry_run=options['dry_run'],
+        )
+        for name in result.missing:
+            self.stderr.write(f'Missing: {name}')
+        summary = f'{result.files} files ({result.contents} distinct, {result.bytes_saved} bytes deduplicated)'
+        if options['dry_run']:
+            self.stdout.write(f'Would rehash {summary}')
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f'Rehashed {summary} and updated {result.rows} rows in {time.perf_counter() - start:.1f}s'
+        ))
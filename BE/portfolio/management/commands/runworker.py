@@ -0,0 +1,84 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from portfolio import jobs
+
+
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (emails, image derivatives, counter flushes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=1, help='Number of threads or processes')
+        parser.add_argument('--mode', choices=['thread', 'process'], default='thread')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit when no job is due')
+
+    def handle(self, *args, **options):
+        if options['mode'] == 'process' and options['concurrency'] > 1:
+            return self.run_processes(options)
+        stop = threading.Event()
+        if options['concurrency'] == 1:
+            self.stdout.write('Worker started')
+            try:
+                self.loop(stop, options)
+            except KeyboardInterrupt:
+                pass
+            return
+        threads = [
+            threading.Thread(target=self.thread, args=(stop, options), name=f'worker-{i}', daemon=True)
+            for i in range(options['concurrency'])
+        ]
+        self.stdout.write(f'Worker started with {len(threads)} thread(s)')
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            self.stdout.write('Finishing running jobs...')
+            stop.set()
+            for thread in threads:
+                thread.join()
+
+    def loop(self, stop, options):
+        next_purge = 0
+        while not stop.is_set():
+            if time.monotonic() >= next_purge:
+                # Finished jobs would otherwise pile up forever
+                jobs.purge()
+                next_purge = time.monotonic() + jobs.PURGE_INTERVAL
+            jobs.requeue_stale()
+            ran = jobs.run_pending(limit=10)
+            if not ran:
+                if options['once']:
+                    return
+                stop.wait(options['poll'])
+
+    def thread(self, stop, options):
+        try:
+            self.loop(stop, options)
+        finally:
+            # Each thread opened its own connections
+            connections.close_all()
+
+    def run_processes(self, options):
+        """One single-threaded worker per process; each claims jobs independently"""
+        command = [
+            sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'), 'runworker',
+            '--poll', str(options['poll']),
+        ] + (['--once'] if options['once'] else [])
+        processes = [subprocess.Popen(command) for _ in range(options['concurrency'])]
+        self.stdout.write(f'Worker started with {len(processes)} process(es)')
+        try:
+            while any(process.poll() is None for process in processes):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            for process in processes:
+                process.wait()
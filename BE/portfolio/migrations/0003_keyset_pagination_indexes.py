@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0002_portfolio_name'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blogpost',
+            index=models.Index(fields=['portfolio', 'status', '-published_at', '-created_at', 'id'], name='blogpost_portfolio_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='project',
+            index=models.Index(fields=['portfolio', '-is_featured', 'order', '-created_at', 'id'], name='project_portfolio_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='resource',
+            index=models.Index(fields=['portfolio', '-created_at', 'id'], name='resource_portfolio_order_idx'),
+        ),
+    ]
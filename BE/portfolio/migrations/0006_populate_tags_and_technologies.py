@@ -0,0 +1,50 @@
+from django.db import migrations
+from django.utils.text import slugify
+
+
+def split_names(value):
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def populate(apps, owner_model, source_field, name_model, link_model, owner_field, name_field):
+    Owner = apps.get_model('portfolio', owner_model)
+    Name = apps.get_model('portfolio', name_model)
+    Link = apps.get_model('portfolio', link_model)
+
+    sources = list(Owner.objects.values_list('pk', source_field))
+    names = {name for _, value in sources for name in split_names(value)}
+    Name.objects.bulk_create(
+        [Name(name=name, slug=slugify(name)) for name in sorted(names)], ignore_conflicts=True
+    )
+    ids = dict(Name.objects.values_list('name', 'pk'))
+    Link.objects.bulk_create(
+        [
+            Link(**{f'{owner_field}_id': pk, f'{name_field}_id': ids[name], 'position': i})
+            for pk, value in sources
+            for i, name in enumerate(split_names(value))
+        ],
+        batch_size=1000,
+    )
+
+
+def forwards(apps, schema_editor):
+    populate(apps, 'BlogPost', 'tags', 'Tag', 'BlogPostTag', 'post', 'tag')
+    populate(apps, 'Project', 'technologies', 'Technology', 'ProjectTechnology', 'project', 'technology')
+
+
+def backwards(apps, schema_editor):
+    apps.get_model('portfolio', 'BlogPostTag').objects.all().delete()
+    apps.get_model('portfolio', 'ProjectTechnology').objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0005_tags_and_technologies'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
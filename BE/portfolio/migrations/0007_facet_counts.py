@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def count_facets(apps, schema_editor):
+    TagFacet = apps.get_model('portfolio', 'TagFacet')
+    TechnologyFacet = apps.get_model('portfolio', 'TechnologyFacet')
+    BlogPostTag = apps.get_model('portfolio', 'BlogPostTag')
+    ProjectTechnology = apps.get_model('portfolio', 'ProjectTechnology')
+
+    tags = (
+        BlogPostTag.objects.filter(post__status='published')
+        .values('post__portfolio_id', 'tag_id')
+        .annotate(count=Count('post_id', distinct=True))
+    )
+    TagFacet.objects.bulk_create(
+        TagFacet(portfolio_id=row['post__portfolio_id'], tag_id=row['tag_id'], count=row['count'])
+        for row in tags
+    )
+    technologies = (
+        ProjectTechnology.objects.values('project__portfolio_id', 'technology_id')
+        .annotate(count=Count('project_id', distinct=True))
+    )
+    TechnologyFacet.objects.bulk_create(
+        TechnologyFacet(
+            portfolio_id=row['project__portfolio_id'],
+            technology_id=row['technology_id'],
+            count=row['count'],
+        )
+        for row in technologies
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0006_populate_tags_and_technologies'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tag_facets', to='portfolio.portfolio')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='portfolio.tag')),
+            ],
+            options={
+                'unique_together': {('portfolio', 'tag')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TechnologyFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='technology_facets', to='portfolio.portfolio')),
+                ('technology', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facets', to='portfolio.technology')),
+            ],
+            options={
+                'unique_together': {('portfolio', 'technology')},
+            },
+        ),
+        migrations.RunPython(count_facets, migrations.RunPython.noop),
+    ]
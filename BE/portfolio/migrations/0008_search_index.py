@@ -0,0 +1,150 @@
+# Generated by Django 5.2.18 on 2026-10-18 01:51
+
+import re
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copy of the portfolio.search indexing rules as of this migration,
+# so later changes to that module cannot break migrating from scratch
+
+K1 = 1.2
+B = 0.75
+
+MAX_TERM_LENGTH = 64
+
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has in is it its of on or that the this to was were will with'.split()
+)
+
+TOKEN_RE = re.compile(r'\w+')
+
+POST_FIELDS = (('title', 3), ('tags', 2), ('excerpt', 1), ('content', 1))
+PROJECT_FIELDS = (('title', 3), ('technologies', 2), ('description', 1), ('detailed_description', 1))
+CASE_STUDY_FIELDS = (
+    ('challenge', 1), ('solution', 1), ('process', 1), ('results', 1), ('lessons_learned', 1),
+)
+
+
+def tokenize(text):
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def weigh(*sources):
+    frequencies = Counter()
+    for instance, fields in sources:
+        if instance is None:
+            continue
+        for field, weight in fields:
+            for token in tokenize(getattr(instance, field)):
+                frequencies[token] += weight
+    return frequencies
+
+
+def impact(frequency, length, average_length):
+    norm = K1 * (1 - B + B * length / (average_length or length or 1))
+    return frequency * (K1 + 1) / (frequency + norm)
+
+
+def build_index(apps, schema_editor):
+    Portfolio = apps.get_model('portfolio', 'Portfolio')
+    BlogPost = apps.get_model('portfolio', 'BlogPost')
+    Project = apps.get_model('portfolio', 'Project')
+    CaseStudy = apps.get_model('portfolio', 'CaseStudy')
+    Document = apps.get_model('portfolio', 'SearchDocument')
+    Posting = apps.get_model('portfolio', 'SearchPosting')
+    Term = apps.get_model('portfolio', 'SearchTerm')
+
+    for portfolio_id in Portfolio.objects.values_list('pk', flat=True):
+        case_studies = {
+            case_study.project_id: case_study
+            for case_study in CaseStudy.objects.filter(project__portfolio_id=portfolio_id)
+        }
+        items = [
+            ({'post_id': post.pk, 'title': post.title, 'slug': post.slug}, weigh((post, POST_FIELDS)))
+            for post in BlogPost.objects.filter(portfolio_id=portfolio_id, status='published')
+        ] + [
+            (
+                {'project_id': project.pk, 'title': project.title, 'slug': project.slug},
+                weigh((project, PROJECT_FIELDS), (case_studies.get(project.pk), CASE_STUDY_FIELDS)),
+            )
+            for project in Project.objects.filter(portfolio_id=portfolio_id)
+        ]
+        if not items:
+            continue
+        documents = Document.objects.bulk_create(
+            Document(portfolio_id=portfolio_id, length=sum(frequencies.values()), **fields)
+            for fields, frequencies in items
+        )
+        average_length = sum(document.length for document in documents) / len(documents)
+        Posting.objects.bulk_create(
+            (
+                Posting(
+                    document=document, portfolio_id=portfolio_id, term=term, frequency=frequency,
+                    impact=impact(frequency, document.length, average_length),
+                )
+                for document, (_, frequencies) in zip(documents, items)
+                for term, frequency in frequencies.items()
+            ),
+            batch_size=5000,
+        )
+        counts = Counter(term for _, frequencies in items for term in frequencies)
+        Term.objects.bulk_create(
+            (Term(portfolio_id=portfolio_id, term=term, documents=n) for term, n in counts.items()),
+            batch_size=5000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0007_facet_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200)),
+                ('slug', models.SlugField(blank=True, max_length=200)),
+                ('length', models.PositiveIntegerField(default=0, help_text='Weighted token count')),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_documents', to='portfolio.portfolio')),
+                ('post', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='portfolio.blogpost')),
+                ('project', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='search_document', to='portfolio.project')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SearchPosting',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('frequency', models.PositiveIntegerField(default=1)),
+                ('impact', models.FloatField(default=0)),
+                ('document', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='postings', to='portfolio.searchdocument')),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='portfolio.portfolio')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['portfolio', 'term', '-impact', 'document'], name='searchposting_impact_idx')],
+                'unique_together': {('document', 'term')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('documents', models.PositiveIntegerField(default=0)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='portfolio.portfolio')),
+            ],
+            options={
+                'unique_together': {('portfolio', 'term')},
+            },
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
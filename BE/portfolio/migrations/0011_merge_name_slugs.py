@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:29
+
+from django.db import migrations
+from django.db.models import Count
+from django.utils.text import slugify
+
+# (name model, link model, name field, owner field, facet model, filter for counted owners)
+NAME_TABLES = (
+    ('Tag', 'BlogPostTag', 'tag', 'post', 'TagFacet', {'post__status': 'published'}),
+    ('Technology', 'ProjectTechnology', 'technology', 'project', 'TechnologyFacet', {}),
+)
+
+
+def name_slug(name):
+    # Frozen copy of portfolio.models.name_slug
+    return slugify(name.replace('+', 'p').replace('#', 'sharp'), allow_unicode=True) or name.lower()
+
+
+def merge_names(apps, schema_editor):
+    """
+    Give every name its canonical slug and fold names with the same slug
+    into the oldest row: links move over (once per owner) and the facet
+    counts of the merged rows are counted again.
+    """
+    for name_model, link_model, name_field, owner_field, facet_model, counted in NAME_TABLES:
+        Name = apps.get_model('portfolio', name_model)
+        Link = apps.get_model('portfolio', link_model)
+        Facet = apps.get_model('portfolio', facet_model)
+        kept, merged = {}, {}
+        for obj in Name.objects.order_by('pk'):
+            slug = name_slug(obj.name)
+            if slug in kept:
+                merged[obj.pk] = kept[slug]
+                continue
+            kept[slug] = obj.pk
+            if obj.slug != slug:
+                obj.slug = slug
+                obj.save(update_fields=['slug'])
+        if not merged:
+            continue
+        for old, new in merged.items():
+            Link.objects.filter(**{f'{name_field}_id': old}).update(**{f'{name_field}_id': new})
+        targets = set(merged.values())
+        seen = set()
+        links = Link.objects.filter(**{f'{name_field}_id__in': targets}).order_by(f'{owner_field}_id', 'position')
+        for link in links:
+            key = (getattr(link, f'{owner_field}_id'), getattr(link, f'{name_field}_id'))
+            if key in seen:
+                link.delete()
+            seen.add(key)
+        Facet.objects.filter(**{f'{name_field}_id__in': targets | set(merged)}).delete()
+        counts = (
+            Link.objects.filter(**{f'{name_field}_id__in': targets}, **counted)
+            .values(f'{owner_field}__portfolio_id', f'{name_field}_id')
+            .annotate(count=Count(f'{owner_field}_id', distinct=True))
+        )
+        Facet.objects.bulk_create(
+            Facet(
+                portfolio_id=row[f'{owner_field}__portfolio_id'],
+                **{f'{name_field}_id': row[f'{name_field}_id']},
+                count=row['count'],
+            )
+            for row in counts
+        )
+        Name.objects.filter(pk__in=merged).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0010_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_names, migrations.RunPython.noop),
+    ]
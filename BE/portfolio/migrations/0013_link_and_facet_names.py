@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 03:40
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+# (owner model, source field, name model, link model, owner field, name field, facet model, counted owners)
+NAME_TABLES = (
+    ('BlogPost', 'tags', 'Tag', 'BlogPostTag', 'post', 'tag', 'TagFacet', {'post__status': 'published'}),
+    ('Project', 'technologies', 'Technology', 'ProjectTechnology', 'project', 'technology', 'TechnologyFacet', {}),
+)
+
+
+def split_names(value):
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def name_slug(name):
+    # Frozen copy of portfolio.models.name_slug
+    return slugify(name.replace('+', 'p').replace('#', 'sharp'), allow_unicode=True) or name.lower()
+
+
+def relink(apps, schema_editor):
+    """
+    Rebuild every link from its source string with the spelling typed there
+    (0011 folded repeated spellings into one link), then name each facet
+    after the first spelling of it in its portfolio.
+    """
+    for owner_model, source, name_model, link_model, owner_field, name_field, facet_model, counted in NAME_TABLES:
+        Owner = apps.get_model('portfolio', owner_model)
+        Name = apps.get_model('portfolio', name_model)
+        Link = apps.get_model('portfolio', link_model)
+        Facet = apps.get_model('portfolio', facet_model)
+        ids = dict(Name.objects.values_list('slug', 'pk'))
+        Link.objects.all().delete()
+        links = []
+        for owner in Owner.objects.only('pk', source).iterator():
+            for position, name in enumerate(split_names(getattr(owner, source))):
+                slug = name_slug(name)
+                if slug not in ids:
+                    ids[slug] = Name.objects.create(name=name, slug=slug).pk
+                links.append(Link(**{
+                    f'{owner_field}_id': owner.pk, f'{name_field}_id': ids[slug], 'name': name, 'position': position,
+                }))
+        Link.objects.bulk_create(links, batch_size=1000)
+
+        spellings = {}
+        rows = Link.objects.filter(**counted).order_by(f'{owner_field}_id', 'position').values_list(
+            f'{owner_field}__portfolio_id', f'{name_field}_id', 'name',
+        )
+        for portfolio_id, name_id, name in rows:
+            spellings.setdefault((portfolio_id, name_id), name)
+        names = dict(Name.objects.values_list('pk', 'name'))
+        facets = list(Facet.objects.all())
+        for facet in facets:
+            name_id = getattr(facet, f'{name_field}_id')
+            facet.name = spellings.get((facet.portfolio_id, name_id), names[name_id])
+        Facet.objects.bulk_update(facets, ['name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio', '0012_unique_name_slugs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blogposttag',
+            name='name',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='projecttechnology',
+            name='name',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='tagfacet',
+            name='name',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='technologyfacet',
+            name='name',
+            field=models.CharField(default='', max_length=100),
+            preserve_default=False,
+        ),
+        migrations.RunPython(relink, migrations.RunPython.noop),
+    ]
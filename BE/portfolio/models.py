@@ -1,6 +1,23 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils.text import slugify
+from django.utils import timezone
+
+
+def split_names(value):
+    """Split a comma-separated field into stripped, non-empty names"""
+    if not value:
+        return []
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def name_slug(name):
+    """
+    Canonical slug of a tag/technology name. Case-insensitive, with `+` and
+    `#` spelled out so that "C", "C++" and "C#" stay apart.
+    """
+    return slugify(name.replace('+', 'p').replace('#', 'sharp'), allow_unicode=True) or name.lower()
 
 
 class Portfolio(models.Model):
@@ -10,6 +27,8 @@ class Portfolio(models.Model):
     name = models.CharField(max_length=200, blank=True, help_text="Display name (e.g., 'Azeem Amjad')")
     tagline = models.CharField(max_length=200, blank=True)
     profile_image = models.ImageField(upload_to='profiles/', blank=True, null=True)
+    # Responsive derivatives of the image above, maintained by portfolio.images
+    profile_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
     theme_color = models.CharField(max_length=7, default='#3B82F6')  # Primary color for the portfolio
     created_at = models.DateTimeField(auto_now_add=True)
@@ -81,6 +100,9 @@ class Skill(models.Model):
     
     class Meta:
         ordering = ['order', 'name']
+        indexes = [
+            models.Index(fields=['portfolio', 'order', 'name'], name='skill_portfolio_order_idx'),
+        ]
 
 
 class Project(models.Model):
@@ -91,8 +113,13 @@ class Project(models.Model):
     description = models.TextField()
     detailed_description = models.TextField(blank=True)
     image = models.ImageField(upload_to='projects/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     thumbnail = models.ImageField(upload_to='projects/thumbnails/', blank=True, null=True)
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
     technologies = models.CharField(max_length=500, help_text="Comma-separated technologies")
+    technology_set = models.ManyToManyField(
+        'Technology', through='ProjectTechnology', related_name='projects', blank=True
+    )
     live_url = models.URLField(blank=True)
     github_url = models.URLField(blank=True)
     demo_url = models.URLField(blank=True)
@@ -111,9 +138,19 @@ class Project(models.Model):
         if not self.slug:
             self.slug = slugify(self.title)
         super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or 'technologies' in update_fields:
+            ProjectTechnology.sync(self, self.technologies)
     
     class Meta:
         ordering = ['-is_featured', 'order', '-created_at']
+        indexes = [
+            # Keyset pagination over Meta.ordering within a portfolio
+            models.Index(
+                fields=['portfolio', '-is_featured', 'order', '-created_at', 'id'],
+                name='project_portfolio_order_idx',
+            ),
+        ]
 
 
 class CaseStudy(models.Model):
@@ -155,6 +192,7 @@ class Testimonial(models.Model):
     client_role = models.CharField(max_length=100, blank=True)
     client_company = models.CharField(max_length=100, blank=True)
     client_image = models.ImageField(upload_to='testimonials/', blank=True, null=True)
+    client_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     content = models.TextField()
     rating = models.IntegerField(default=5, help_text="1-5 stars")
     project = models.ForeignKey(Project, on_delete=models.SET_NULL, blank=True, null=True, related_name='testimonials')
@@ -167,6 +205,12 @@ class Testimonial(models.Model):
     
     class Meta:
         ordering = ['-is_featured', 'order', '-date']
+        indexes = [
+            models.Index(
+                fields=['portfolio', '-is_featured', 'order', '-date'],
+                name='testimonial_portfolio_idx',
+            ),
+        ]
 
 
 class Achievement(models.Model):
@@ -185,6 +229,7 @@ class Achievement(models.Model):
     issuer = models.CharField(max_length=200, blank=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='achievements/', blank=True, null=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     credential_url = models.URLField(blank=True)
     date_received = models.DateField()
     expiry_date = models.DateField(blank=True, null=True)
@@ -210,7 +255,9 @@ class BlogPost(models.Model):
     excerpt = models.TextField(blank=True)
     content = models.TextField()
     featured_image = models.ImageField(upload_to='blog/', blank=True, null=True)
+    featured_image_variants = models.JSONField(default=dict, blank=True, editable=False)
     tags = models.CharField(max_length=300, blank=True, help_text="Comma-separated tags")
+    tag_set = models.ManyToManyField('Tag', through='BlogPostTag', related_name='posts', blank=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft')
     is_featured = models.BooleanField(default=False)
     views = models.IntegerField(default=0)
@@ -224,11 +271,34 @@ class BlogPost(models.Model):
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
+        update_fields = kwargs.get('update_fields')
+        resync = update_fields is None or {'tags', 'status'} & set(update_fields)
+        # Only published posts count towards the tag facets
+        was_published = resync and self.pk is not None and BlogPost.objects.filter(
+            pk=self.pk, status='published'
+        ).exists()
         super().save(*args, **kwargs)
+        if resync:
+            BlogPostTag.sync(self, self.tags, was_counted=was_published, counted=self.status == 'published')
     
     class Meta:
         ordering = ['-published_at', '-created_at']
         verbose_name_plural = "Blog Posts"
+        indexes = [
+            # Keyset pagination over published posts of a portfolio; partial
+            # indexes are skipped on backends that lack them
+            models.Index(
+                fields=['portfolio', '-published_at', '-created_at', 'id'],
+                name='blogpost_portfolio_order_idx',
+                condition=models.Q(status='published'),
+            ),
+            # Featured published posts
+            models.Index(
+                fields=['portfolio', '-published_at', '-created_at'],
+                name='blogpost_featured_idx',
+                condition=models.Q(status='published', is_featured=True),
+            ),
+        ]
 
 
 class Resource(models.Model):
@@ -238,6 +308,7 @@ class Resource(models.Model):
     description = models.TextField()
     file = models.FileField(upload_to='resources/')
     thumbnail = models.ImageField(upload_to='resources/thumbnails/', blank=True, null=True)
+    thumbnail_variants = models.JSONField(default=dict, blank=True, editable=False)
     file_type = models.CharField(max_length=50, blank=True)
     file_size = models.CharField(max_length=50, blank=True)
     downloads = models.IntegerField(default=0)
@@ -248,6 +319,9 @@ class Resource(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['portfolio', '-created_at', 'id'], name='resource_portfolio_order_idx'),
+        ]
 
 
 class Newsletter(models.Model):
@@ -264,6 +338,13 @@ class Newsletter(models.Model):
     class Meta:
         ordering = ['-subscribed_at']
         unique_together = ['portfolio', 'email']
+        indexes = [
+            models.Index(
+                fields=['portfolio', '-subscribed_at'],
+                name='newsletter_active_idx',
+                condition=models.Q(is_active=True),
+            ),
+        ]
 
 
 class ContactMessage(models.Model):
@@ -282,6 +363,14 @@ class ContactMessage(models.Model):
     class Meta:
         ordering = ['-created_at']
         verbose_name_plural = "Contact Messages"
+        indexes = [
+            models.Index(fields=['portfolio', '-created_at'], name='contact_portfolio_idx'),
+            models.Index(
+                fields=['portfolio', '-created_at'],
+                name='contact_unread_idx',
+                condition=models.Q(is_read=False),
+            ),
+        ]
 
 
 class Hobby(models.Model):
@@ -298,3 +387,301 @@ class Hobby(models.Model):
     class Meta:
         ordering = ['order']
         verbose_name_plural = "Hobbies"
+
+
+class NormalizedName(models.Model):
+    """
+    Shared name/slug lookup table for comma-separated fields. Names with the
+    same slug (e.g. "Python" and "python") share one row, which filters and
+    facet counts group by; links and facets keep their own spelling.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    slug = models.SlugField(max_length=100, unique=True, allow_unicode=True)
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.slug = name_slug(self.name)
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def resolve(cls, names):
+        """Return {name: instance} for `names`, creating missing rows in bulk"""
+        slugs = {name: name_slug(name) for name in names}
+        found = {obj.slug: obj for obj in cls.objects.filter(slug__in=slugs.values())}
+        missing = {}
+        for name, slug in slugs.items():
+            if slug not in found:
+                missing.setdefault(slug, name)
+        if missing:
+            cls.objects.bulk_create(
+                [cls(name=name, slug=slug) for slug, name in missing.items()], ignore_conflicts=True
+            )
+            found.update((obj.slug, obj) for obj in cls.objects.filter(slug__in=missing))
+        return {name: found[slug] for name, slug in slugs.items()}
+
+    class Meta:
+        abstract = True
+        ordering = ['name']
+
+
+class Tag(NormalizedName):
+    """Blog post tag, normalized from BlogPost.tags"""
+
+
+class Technology(NormalizedName):
+    """Project technology, normalized from Project.technologies"""
+
+    class Meta(NormalizedName.Meta):
+        verbose_name_plural = "Technologies"
+
+
+class NameLink(models.Model):
+    """
+    Ordered through-table row. `position` keeps the order of the source
+    string and `name` the spelling the author typed, so the rendered list
+    matches the source; the shared name row only groups spellings for
+    filters and facets.
+    """
+    position = models.PositiveSmallIntegerField(default=0)
+    name = models.CharField(max_length=100)
+
+    # Set by subclasses: FK name of the owner and of the name table, and
+    # the per-portfolio facet counts kept in step with the links
+    owner_field = None
+    name_field = None
+    facet_model = None
+
+    @classmethod
+    def _current(cls, owner):
+        links = cls.objects.filter(**{cls.owner_field: owner}).order_by('position')
+        return links, list(links.values_list('name', f'{cls.name_field}_id'))
+
+    @classmethod
+    def sync(cls, owner, value, was_counted=True, counted=True):
+        """
+        Rebuild the owner's links from a comma-separated string and apply
+        the difference to the facet counts. `was_counted`/`counted` say
+        whether the owner contributed to the facets before and after the
+        save (e.g. only published posts are counted).
+        """
+        names = split_names(value)
+        links, current = cls._current(owner)
+        ids = dict(current)
+        if [name for name, _ in current] != names:
+            links.delete()
+            related = cls._meta.get_field(cls.name_field).related_model.resolve(names)
+            cls.objects.bulk_create(
+                cls(**{cls.owner_field: owner, cls.name_field: related[name], 'name': name, 'position': i})
+                for i, name in enumerate(names)
+            )
+            ids = {name: related[name].pk for name in names}
+        old = {pk for _, pk in current} if was_counted else set()
+        new = set(ids.values()) if counted else set()
+        # The owner's first spelling names a facet it creates
+        spellings = {}
+        for name, pk in ids.items():
+            spellings.setdefault(pk, name)
+        cls._facets().apply(
+            owner.portfolio_id, removed=old - new, added={pk: spellings[pk] for pk in new - old},
+        )
+
+    @classmethod
+    def release(cls, owner):
+        """Remove an owner's contribution to the facet counts (before deletion)"""
+        _, current = cls._current(owner)
+        cls._facets().apply(owner.portfolio_id, removed={pk for _, pk in current}, added={})
+
+    @classmethod
+    def _facets(cls):
+        return cls._meta.apps.get_model(cls._meta.app_label, cls.facet_model)
+
+    class Meta:
+        abstract = True
+        ordering = ['position']
+
+
+class BlogPostTag(NameLink):
+    post = models.ForeignKey(BlogPost, on_delete=models.CASCADE, related_name='tag_links')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='post_links')
+
+    owner_field = 'post'
+    name_field = 'tag'
+    facet_model = 'TagFacet'
+
+    class Meta(NameLink.Meta):
+        unique_together = ['post', 'position']
+
+
+class ProjectTechnology(NameLink):
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='technology_links')
+    technology = models.ForeignKey(Technology, on_delete=models.CASCADE, related_name='project_links')
+
+    owner_field = 'project'
+    name_field = 'technology'
+    facet_model = 'TechnologyFacet'
+
+    class Meta(NameLink.Meta):
+        unique_together = ['project', 'position']
+        verbose_name_plural = "Project Technologies"
+
+
+class FacetCount(models.Model):
+    """
+    Number of items per name within a portfolio, maintained incrementally
+    by NameLink.sync/release so facets never scan the posts or projects.
+    `name` is the spelling used in the portfolio when the row was created.
+    """
+    count = models.PositiveIntegerField(default=0)
+    name = models.CharField(max_length=100)
+
+    name_field = None
+
+    @classmethod
+    def apply(cls, portfolio_id, removed, added):
+        """Decrement `removed` and increment `added` ({id: spelling}) name ids atomically"""
+        rows = cls.objects.filter(portfolio_id=portfolio_id)
+        if added:
+            cls.objects.bulk_create(
+                [
+                    cls(portfolio_id=portfolio_id, name=name, **{f'{cls.name_field}_id': pk})
+                    for pk, name in added.items()
+                ],
+                ignore_conflicts=True,
+            )
+            rows.filter(**{f'{cls.name_field}_id__in': added}).update(count=F('count') + 1)
+        if removed:
+            rows.filter(**{f'{cls.name_field}_id__in': removed}, count__gt=0).update(count=F('count') - 1)
+
+    class Meta:
+        abstract = True
+
+
+class TagFacet(FacetCount):
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='tag_facets')
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, related_name='facets')
+
+    name_field = 'tag'
+
+    class Meta:
+        unique_together = ['portfolio', 'tag']
+
+
+class TechnologyFacet(FacetCount):
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='technology_facets')
+    technology = models.ForeignKey(Technology, on_delete=models.CASCADE, related_name='facets')
+
+    name_field = 'technology'
+
+    class Meta:
+        unique_together = ['portfolio', 'technology']
+
+
+class SearchDocument(models.Model):
+    """
+    Search index entry for a published blog post or a project (including
+    its case study), maintained by portfolio.search from the model signals.
+    """
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='search_documents')
+    post = models.OneToOneField(
+        BlogPost, on_delete=models.CASCADE, null=True, blank=True, related_name='search_document'
+    )
+    project = models.OneToOneField(
+        Project, on_delete=models.CASCADE, null=True, blank=True, related_name='search_document'
+    )
+    title = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=200, blank=True)
+    length = models.PositiveIntegerField(default=0, help_text="Weighted token count")
+
+    def __str__(self):
+        return self.title
+
+
+class SearchTerm(models.Model):
+    """
+    Number of search documents containing a term within a portfolio (the
+    BM25 document frequency), maintained incrementally like FacetCount.
+    """
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='search_terms')
+    term = models.CharField(max_length=64)
+    documents = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.term
+
+    @classmethod
+    def apply(cls, portfolio_id, removed, added):
+        """Decrement `removed` and increment `added` terms atomically"""
+        rows = cls.objects.filter(portfolio_id=portfolio_id)
+        if added:
+            cls.objects.bulk_create(
+                [cls(portfolio_id=portfolio_id, term=term) for term in added], ignore_conflicts=True
+            )
+            rows.filter(term__in=added).update(documents=F('documents') + 1)
+        if removed:
+            rows.filter(term__in=removed, documents__gt=0).update(documents=F('documents') - 1)
+
+    class Meta:
+        unique_together = ['portfolio', 'term']
+
+
+class SearchPosting(models.Model):
+    """
+    One term of one search document. `impact` is the BM25 term weight
+    without the IDF factor, so each term's postings can be read in rank
+    order straight from the index.
+    """
+    document = models.ForeignKey(SearchDocument, on_delete=models.CASCADE, related_name='postings')
+    # Copied from the document so ranking reads nothing but this index
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='+')
+    term = models.CharField(max_length=64)
+    frequency = models.PositiveIntegerField(default=1)
+    impact = models.FloatField(default=0)
+
+    def __str__(self):
+        return self.term
+
+    class Meta:
+        unique_together = ['document', 'term']
+        indexes = [
+            # Covering index for reading a term's best postings first
+            models.Index(
+                fields=['portfolio', 'term', '-impact', 'document'],
+                name='searchposting_impact_idx',
+            ),
+        ]
+
+
+class Job(models.Model):
+    """Deferred call run by `manage.py runworker` (see portfolio.jobs)"""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    func = models.CharField(max_length=200, help_text="Dotted path of the function to call")
+    kwargs = models.JSONField(default=dict, blank=True)
+    idempotency_key = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(blank=True, null=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.func} ({self.status})"
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            # Jobs due to run, in claim order
+            models.Index(fields=['run_at', 'id'], name='job_queued_idx', condition=models.Q(status='queued')),
+            models.Index(fields=['locked_at'], name='job_running_idx', condition=models.Q(status='running')),
+        ]
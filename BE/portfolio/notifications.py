@@ -0,0 +1,35 @@
+"""
+Emails sent on behalf of a portfolio. These run from the job queue (see
+portfolio.jobs), never in the request that triggered them.
+"""
+from django.conf import settings
+from django.core.mail import send_mail
+
+from .models import ContactMessage, Newsletter
+
+
+def notify_contact_message(message_id):
+    """Forward a contact form message to the portfolio owner"""
+    message = ContactMessage.objects.select_related('portfolio__user').filter(pk=message_id).first()
+    if message is None or not message.portfolio.user.email:
+        return
+    send_mail(
+        subject=f'[{message.portfolio.name or message.portfolio.username}] {message.subject or "New message"}',
+        message=f'{message.name} <{message.email}> wrote:\n\n{message.message}',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[message.portfolio.user.email],
+    )
+
+
+def send_newsletter_confirmation(subscriber_id):
+    """Confirm a (re)subscription to the subscriber"""
+    subscriber = Newsletter.objects.select_related('portfolio').filter(pk=subscriber_id, is_active=True).first()
+    if subscriber is None:
+        return
+    name = subscriber.portfolio.name or subscriber.portfolio.username
+    send_mail(
+        subject=f"You're subscribed to {name}",
+        message=f'Hi {subscriber.name or "there"},\n\nThanks for subscribing to updates from {name}.',
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        recipient_list=[subscriber.email],
+    )
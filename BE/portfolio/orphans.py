@@ -0,0 +1,192 @@
+"""
+Garbage collection of media files that no row refers to.
+
+Nothing deletes a file when its row is deleted or its field replaced
+(content-addressed files are shared between rows, see storage.py), so
+`manage.py gc_media` collects them in one pass:
+
+1. The names every FileField/ImageField and every derivative manifest
+   (`<field>_variants`) refer to are streamed from the database with
+   `.iterator()` and kept as 12-byte digests, about a fifth of the memory
+   of the names themselves. A digest collision can only keep an orphan.
+2. MEDIA_ROOT is walked by a thread pool, one `os.scandir()` per
+   directory, and files are yielded as directories finish, so the file
+   list is never held in memory.
+3. Unreferenced files are checked again against the database in batches
+   and skipped if modified within `min_age`: an upload whose row is not
+   committed yet, or an old file that a new upload of the same bytes has
+   just reused, is left alone. The rest are deleted, or moved to a
+   quarantine directory to be deleted later.
+"""
+import hashlib
+import os
+import queue
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import reduce
+from operator import or_
+from pathlib import Path
+
+from django.core.files.storage import default_storage
+from django.db.models import Q
+
+from .images import variants_field
+from .storage import file_fields, is_content_addressed
+
+BATCH_SIZE = 500
+
+# Names per query when looking them up in derivative manifests
+MANIFEST_CHUNK_SIZE = 100
+
+
+def _digest(name):
+    return hashlib.blake2b(name.encode(), digest_size=12).digest()
+
+
+def _manifest_names(variants):
+    if variants.get('source'):
+        yield variants['source']
+    for widths in (variants.get('formats') or {}).values():
+        yield from widths.values()
+
+
+def referenced_names():
+    """Digests of every stored name the database refers to"""
+    referenced = set()
+    for model, field in file_fields():
+        rows = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        referenced.update(map(_digest, rows.values_list(field, flat=True).iterator(chunk_size=2000)))
+        if any(f.name == variants_field(field) for f in model._meta.fields):
+            manifests = model.objects.exclude(**{variants_field(field): {}})
+            for variants in manifests.values_list(variants_field(field), flat=True).iterator(chunk_size=2000):
+                referenced.update(map(_digest, _manifest_names(variants or {})))
+    return referenced
+
+
+def walk(root, workers=8):
+    """Relative posix paths of the files under `root`, listed by `workers` threads"""
+    root = os.path.join(root, '')
+    results = queue.Queue()
+
+    def scan(directory):
+        files, directories = [], []
+        # Relative name of the directory, with a trailing separator
+        prefix = directory[len(root):].replace(os.sep, '/') + '/' if directory != root else ''
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        files.append(prefix + entry.name)
+        except OSError:
+            # Removed or unreadable meanwhile
+            pass
+        finally:
+            results.put((files, directories))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        pending = 1
+        pool.submit(scan, root)
+        while pending:
+            files, directories = results.get()
+            pending -= 1
+            for directory in directories:
+                pool.submit(scan, directory)
+                pending += 1
+            yield from files
+
+
+def is_referenced(names):
+    """The subset of `names` that rows or derivative manifests refer to now"""
+    found = set()
+    for model, field in file_fields():
+        found.update(model.objects.filter(**{f'{field}__in': names}).values_list(field, flat=True))
+        if not any(f.name == variants_field(field) for f in model._meta.fields):
+            continue
+        for start in range(0, len(names), MANIFEST_CHUNK_SIZE):
+            # Matched on the JSON text, then checked properly
+            chunk = names[start:start + MANIFEST_CHUNK_SIZE]
+            manifests = model.objects.filter(
+                reduce(or_, (Q(**{f'{variants_field(field)}__icontains': name}) for name in chunk))
+            )
+            for variants in manifests.values_list(variants_field(field), flat=True):
+                found.update(set(_manifest_names(variants or {})).intersection(chunk))
+    return found
+
+
+class CollectResult:
+    def __init__(self):
+        self.scanned = 0
+        self.orphans = 0
+        self.bytes = 0
+        self.kept = 0
+
+
+def collect(workers=8, min_age=24 * 60 * 60, dry_run=False, quarantine=None, storage=None, log=None):
+    """
+    Delete (or with `quarantine`, move there) every file under the storage
+    root that no row refers to and that is older than `min_age` seconds.
+    `log` is called with the name of every file removed (or with
+    `dry_run`, that would be). Returns a CollectResult.
+    """
+    storage = storage or default_storage
+    log = log or (lambda message: None)
+    root = Path(storage.location).resolve()
+    if quarantine is not None and root in (Path(quarantine).resolve(), *Path(quarantine).resolve().parents):
+        raise ValueError('The quarantine directory must be outside the media root')
+    referenced = referenced_names()
+    result = CollectResult()
+    cutoff = time.time() - min_age
+    batch = []
+
+    def flush():
+        still_used = is_referenced(batch)
+        for name in batch:
+            path = root / name
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            if name in still_used or stat.st_mtime > cutoff:
+                result.kept += 1
+                continue
+            result.orphans += 1
+            result.bytes += stat.st_size
+            log(name)
+            if not dry_run:
+                remove(root, name, quarantine)
+        batch.clear()
+
+    for name in walk(str(root), workers):
+        result.scanned += 1
+        if _digest(name) in referenced:
+            continue
+        batch.append(name)
+        if len(batch) >= BATCH_SIZE:
+            flush()
+    if batch:
+        flush()
+    return result
+
+
+def remove(root, name, quarantine=None):
+    """Delete or quarantine a file, and remove the directories it leaves empty"""
+    path = root / name
+    if quarantine is None:
+        path.unlink(missing_ok=True)
+    else:
+        target = Path(quarantine) / name
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(path, target)
+    if is_content_addressed(name):
+        # Uploads may be about to write into the hash directories
+        return
+    for parent in path.parents:
+        if parent == root:
+            break
+        try:
+            parent.rmdir()
+        except OSError:
+            break
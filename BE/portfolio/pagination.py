@@ -0,0 +1,239 @@
+"""
+Keyset (cursor) pagination over a model's Meta.ordering.
+
+Unlike PageNumberPagination there is no COUNT(*) and no OFFSET: each page
+is a `WHERE (ordering columns) > (last row)` range scan that the composite
+indexes on the paginated models can answer directly (plus one more range
+for NULLs when the leading ordering column is nullable). Clients opt in by
+sending `?cursor=` (empty for the first page) and then follow the
+`next`/`previous` links.
+"""
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db import connections
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset, ordering, position = self.start(queryset, request)
+        if position is None:
+            rows = list(queryset[:self.page_size + 1])
+        else:
+            rows = []
+            for segment in self.segments(ordering, position, queryset.db):
+                rows += queryset.filter(segment)[:self.page_size + 1 - len(rows)]
+                if len(rows) > self.page_size:
+                    break
+        return self.finish(rows, position)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() through the async ORM"""
+        queryset, ordering, position = self.start(queryset, request)
+        if position is None:
+            rows = [row async for row in queryset[:self.page_size + 1]]
+        else:
+            rows = []
+            for segment in self.segments(ordering, position, queryset.db):
+                rows += [row async for row in queryset.filter(segment)[:self.page_size + 1 - len(rows)]]
+                if len(rows) > self.page_size:
+                    break
+        return self.finish(rows, position)
+
+    def start(self, queryset, request):
+        """Decode the cursor; returns the queryset in scan order, the ordering and the position"""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.ordering = self.get_ordering(queryset)
+        position, self.reverse = self.decode_cursor(request)
+
+        ordering = [(name, not desc) for name, desc in self.ordering] if self.reverse else self.ordering
+        queryset = queryset.order_by(*[f'-{name}' if desc else name for name, desc in ordering])
+        return queryset, ordering, position
+
+    def finish(self, rows, position):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        self.page = rows
+        # Moving backwards always has a next page (the one we came from)
+        self.has_next = has_more if not self.reverse else position is not None
+        self.has_previous = has_more if self.reverse else position is not None
+        return rows
+
+    def get_ordering(self, queryset):
+        """(field, descending) pairs, with the primary key as a tie-breaker"""
+        names = list(queryset.query.order_by or self.model._meta.ordering)
+        ordering = [(name.lstrip('-'), name.startswith('-')) for name in names]
+        if not any(name in ('pk', self.model._meta.pk.name) for name, _ in ordering):
+            ordering.append(('pk', False))
+        return ordering
+
+    def _field(self, name):
+        return self.model._meta.pk if name == 'pk' else self.model._meta.get_field(name)
+
+    def _nulls_last(self, name, descending, using):
+        if not self._field(name).null:
+            return None
+        nulls_largest = connections[using].features.nulls_order_largest
+        return nulls_largest != descending
+
+    def segments(self, ordering, position, using):
+        """
+        Filters selecting the rows after `position`, in scan order.
+
+        Each filter is a single index range: the leading column gets an
+        explicit bound (`a <= x AND (a < x OR (a = x AND ...))`) and, when
+        it is nullable, its NULLs are a separate range before or after the
+        non-null values depending on how the backend sorts them.
+        """
+        (name, descending), value = ordering[0], position[0]
+        rest = self.after(ordering[1:], position[1:], using)
+        nulls_last = self._nulls_last(name, descending, using)
+        if value is None:
+            segments = [Q(**{f'{name}__isnull': True}) & rest]
+            if nulls_last is False:
+                segments.append(Q(**{f'{name}__isnull': False}))
+            return segments
+        bound = 'lte' if descending else 'gte'
+        beyond = 'lt' if descending else 'gt'
+        segments = [
+            Q(**{f'{name}__{bound}': value})
+            & (Q(**{f'{name}__{beyond}': value}) | (Q(**{name: value}) & rest))
+        ]
+        if nulls_last:
+            segments.append(Q(**{f'{name}__isnull': True}))
+        return segments
+
+    def after(self, ordering, position, using):
+        """
+        Rows strictly after `position` in `ordering`, expanded to
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q(pk__in=[])
+        equal = Q()
+        for (name, descending), value in zip(ordering, position):
+            nulls_last = self._nulls_last(name, descending, using)
+            if value is None:
+                beyond = Q(pk__in=[]) if nulls_last else Q(**{f'{name}__isnull': False})
+                same = Q(**{f'{name}__isnull': True})
+            else:
+                beyond = Q(**{f'{name}__{"lt" if descending else "gt"}': value})
+                if nulls_last:
+                    beyond |= Q(**{f'{name}__isnull': True})
+                same = Q(**{name: value})
+            condition |= equal & beyond
+            equal &= same
+        return condition
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            token = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+            values = token['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                None if value is None else self._field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(token.get('r'))
+
+    def encode_cursor(self, row, reverse):
+        values = [
+            None if getattr(row, name) is None else self._field(name).value_to_string(row)
+            for name, _ in self.ordering
+        ]
+        token = json.dumps({'p': values, 'r': int(reverse)}, separators=(',', ':'))
+        encoded = urlsafe_b64encode(token.encode()).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return replace_query_param(self.base_url, self.cursor_query_param, '')
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class OptionalKeysetPaginationMixin:
+    """
+    Keep the default page-number pagination, but switch to keyset
+    pagination when the request carries a `cursor` parameter.
+    """
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator') and KeysetPagination.cursor_query_param in self.request.query_params:
+            self._paginator = KeysetPagination()
+        return super().paginator
+
+
+async def apaginate_queryset(pagination, queryset, request, view=None):
+    """
+    Async paginate_queryset() for the view's paginator. PageNumberPagination
+    is DRF's, so its steps are repeated here with the count and the page
+    awaited; the pages themselves are DRF objects as usual.
+    """
+    if hasattr(pagination, 'apaginate_queryset'):
+        return await pagination.apaginate_queryset(queryset, request, view=view)
+    if not isinstance(pagination, PageNumberPagination):
+        raise TypeError(f'{type(pagination).__name__} has no async support')
+    pagination.request = request
+    page_size = pagination.get_page_size(request)
+    if not page_size:
+        return None
+    paginator = pagination.django_paginator_class(queryset, page_size)
+    # Paginator.count is a cached_property; fill it in ahead of page()
+    paginator.count = await queryset.acount()
+    page_number = pagination.get_page_number(request, paginator)
+    try:
+        pagination.page = paginator.page(page_number)
+    except InvalidPage as exc:
+        raise NotFound(pagination.invalid_page_message.format(page_number=page_number, message=str(exc)))
+    pagination.page.object_list = [obj async for obj in pagination.page.object_list]
+    if paginator.num_pages > 1 and pagination.template is not None:
+        pagination.display_page_controls = True
+    return list(pagination.page)
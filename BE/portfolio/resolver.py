@@ -0,0 +1,82 @@
+"""
+username -> portfolio id resolution for the per-user endpoints.
+
+Every endpoint under /api/<username>/ needs the portfolio's primary key
+before it can query the portfolio's rows. Resolutions, including unknown
+usernames, are kept in the cache backend for PORTFOLIO_RESOLVER_TIMEOUT
+seconds, subject to the backend's own eviction. Saving or deleting a
+Portfolio forgets its old and new usernames (see signals.py).
+"""
+from django.conf import settings
+from django.http import Http404
+
+from .cache import acall, get_cache
+from .models import Portfolio
+
+# Cached for usernames without a portfolio
+UNKNOWN = (None, False)
+
+
+def get_timeout():
+    return getattr(settings, 'PORTFOLIO_RESOLVER_TIMEOUT', 5 * 60)
+
+
+def _key(username):
+    return f'portfolio:resolve:{username}'
+
+
+def _lookup(username):
+    return Portfolio.objects.filter(username=username).values_list('pk', 'is_active')
+
+
+def resolve(username):
+    """Return (portfolio id, is_active) for a username; UNKNOWN if there is none"""
+    resolution = get_cache().get(_key(username))
+    if resolution is None:
+        resolution = _lookup(username).first() or UNKNOWN
+        get_cache().set(_key(username), resolution, get_timeout())
+    return resolution
+
+
+async def aresolve(username):
+    """Async resolve()"""
+    resolution = await acall('get', _key(username))
+    if resolution is None:
+        resolution = await _lookup(username).afirst() or UNKNOWN
+        await acall('set', _key(username), resolution, get_timeout())
+    return resolution
+
+
+def _active_id(resolution):
+    portfolio_id, is_active = resolution
+    if not is_active:
+        raise Http404('No Portfolio matches the given query.')
+    return portfolio_id
+
+
+def get_portfolio_id(username):
+    """Primary key of the active portfolio with this username, or Http404"""
+    return _active_id(resolve(username))
+
+
+async def aget_portfolio_id(username):
+    """Async get_portfolio_id()"""
+    return _active_id(await aresolve(username))
+
+
+def forget(*usernames):
+    get_cache().delete_many([_key(username) for username in usernames if username])
+
+
+class PortfolioLookupMixin:
+    """Resolve the view's `username` URL argument at most once per request"""
+
+    def get_portfolio_id(self):
+        if not hasattr(self, '_portfolio_id'):
+            self._portfolio_id = get_portfolio_id(self.kwargs.get('username'))
+        return self._portfolio_id
+
+    async def aget_portfolio_id(self):
+        if not hasattr(self, '_portfolio_id'):
+            self._portfolio_id = await aget_portfolio_id(self.kwargs.get('username'))
+        return self._portfolio_id
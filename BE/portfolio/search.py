@@ -0,0 +1,258 @@
+"""
+Full-text search over published blog posts and projects.
+
+A small inverted index lives in three tables: one SearchDocument per post
+or project (a project's document includes its case study), one
+SearchPosting per (document, term) and one SearchTerm per (portfolio,
+term) holding the document frequency. The model signals re-index a
+single document on save and adjust the frequencies incrementally.
+
+Postings store their BM25 weight (`impact`, computed against the average
+document length when the document was indexed), and the index keeps each
+term's postings in impact order. A query reads at most
+CANDIDATES_PER_TERM postings per term, so its cost does not grow with the
+number of matching documents; the best candidates are then re-scored
+exactly from their full postings. Terms rarer than the cut-off are
+ranked exactly.
+"""
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Avg
+
+from . import cache
+from .models import BlogPost, CaseStudy, Portfolio, Project, SearchDocument, SearchPosting, SearchTerm
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+MAX_TERM_LENGTH = 64
+MAX_QUERY_TERMS = 10
+CANDIDATES_PER_TERM = 100
+
+STOP_WORDS = frozenset(
+    'a an and are as at be by for from has in is it its of on or that the this to was were will with'.split()
+)
+
+TOKEN_RE = re.compile(r'\w+')
+
+# Field weights: a match in the title counts as much as three in the body
+POST_FIELDS = (('title', 3), ('tags', 2), ('excerpt', 1), ('content', 1))
+PROJECT_FIELDS = (('title', 3), ('technologies', 2), ('description', 1), ('detailed_description', 1))
+CASE_STUDY_FIELDS = (
+    ('challenge', 1), ('solution', 1), ('process', 1), ('results', 1), ('lessons_learned', 1),
+)
+
+
+def tokenize(text):
+    """Lowercased word tokens without stop words"""
+    return [
+        token[:MAX_TERM_LENGTH]
+        for token in TOKEN_RE.findall((text or '').lower())
+        if len(token) > 1 and token not in STOP_WORDS
+    ]
+
+
+def weigh(*sources):
+    """Weighted term frequencies for (instance, fields) pairs"""
+    frequencies = Counter()
+    for instance, fields in sources:
+        if instance is None:
+            continue
+        for field, weight in fields:
+            for token in tokenize(getattr(instance, field)):
+                frequencies[token] += weight
+    return frequencies
+
+
+def impact(frequency, length, average_length):
+    """BM25 term weight without the IDF factor"""
+    norm = K1 * (1 - B + B * length / (average_length or length or 1))
+    return frequency * (K1 + 1) / (frequency + norm)
+
+
+def _post_document(post):
+    return {'post_id': post.pk, 'title': post.title, 'slug': post.slug}, weigh((post, POST_FIELDS))
+
+
+def _project_document(project, case_study):
+    document = {'project_id': project.pk, 'title': project.title, 'slug': project.slug}
+    return document, weigh((project, PROJECT_FIELDS), (case_study, CASE_STUDY_FIELDS))
+
+
+def _postings(document, frequencies, average_length):
+    return [
+        SearchPosting(
+            document=document, portfolio_id=document.portfolio_id, term=term, frequency=frequency,
+            impact=impact(frequency, document.length, average_length),
+        )
+        for term, frequency in frequencies.items()
+    ]
+
+
+def _write(portfolio_id, lookup, fields, frequencies):
+    with transaction.atomic():
+        document, _ = SearchDocument.objects.update_or_create(
+            **lookup,
+            defaults={**fields, 'portfolio_id': portfolio_id, 'length': sum(frequencies.values())},
+        )
+        average_length = SearchDocument.objects.filter(portfolio_id=portfolio_id).aggregate(
+            length=Avg('length')
+        )['length']
+        old = set(document.postings.values_list('term', flat=True))
+        document.postings.all().delete()
+        SearchPosting.objects.bulk_create(_postings(document, frequencies, average_length))
+        SearchTerm.apply(portfolio_id, removed=old - frequencies.keys(), added=frequencies.keys() - old)
+
+
+def _remove(**lookup):
+    document = SearchDocument.objects.filter(**lookup).first()
+    if document is not None:
+        terms = set(document.postings.values_list('term', flat=True))
+        SearchTerm.apply(document.portfolio_id, removed=terms, added=set())
+        document.delete()
+
+
+def index_post(post):
+    """(Re-)index a blog post; drafts are removed from the index"""
+    if post.status != 'published':
+        remove_post(post)
+        return
+    fields, frequencies = _post_document(post)
+    _write(post.portfolio_id, {'post_id': fields.pop('post_id')}, fields, frequencies)
+
+
+def index_project(project):
+    """(Re-)index a project together with its case study"""
+    case_study = CaseStudy.objects.filter(project_id=project.pk).first()
+    fields, frequencies = _project_document(project, case_study)
+    _write(project.portfolio_id, {'project_id': fields.pop('project_id')}, fields, frequencies)
+
+
+def remove_post(post):
+    _remove(post_id=post.pk)
+
+
+def remove_project(project):
+    _remove(project_id=project.pk)
+
+
+def rebuild(portfolio_ids=None):
+    """
+    Rebuild the index from scratch, for every portfolio or only the given
+    ones, and refresh the stored impacts against the current average
+    document length. Used by `rebuild_search_index` and after bulk loads
+    that bypass the model signals. Returns the number of documents.
+    """
+
+    portfolios = Portfolio.objects.all()
+    if portfolio_ids is not None:
+        portfolios = portfolios.filter(pk__in=portfolio_ids)
+
+    total = 0
+    with transaction.atomic(using=SearchDocument.objects.db):
+        SearchDocument.objects.filter(portfolio__in=portfolios).delete()
+        SearchTerm.objects.filter(portfolio__in=portfolios).delete()
+        for portfolio_id in portfolios.values_list('pk', flat=True):
+            case_studies = {
+                case_study.project_id: case_study
+                for case_study in CaseStudy.objects.filter(project__portfolio_id=portfolio_id)
+            }
+            items = [
+                _post_document(post)
+                for post in BlogPost.objects.filter(portfolio_id=portfolio_id, status='published')
+            ] + [
+                _project_document(project, case_studies.get(project.pk))
+                for project in Project.objects.filter(portfolio_id=portfolio_id)
+            ]
+            if not items:
+                continue
+            documents = SearchDocument.objects.bulk_create(
+                SearchDocument(portfolio_id=portfolio_id, length=sum(frequencies.values()), **fields)
+                for fields, frequencies in items
+            )
+            average_length = sum(document.length for document in documents) / len(documents)
+            SearchPosting.objects.bulk_create(
+                (
+                    posting
+                    for document, (_, frequencies) in zip(documents, items)
+                    for posting in _postings(document, frequencies, average_length)
+                ),
+                batch_size=5000,
+            )
+            counts = Counter(term for _, frequencies in items for term in frequencies)
+            SearchTerm.objects.bulk_create(
+                (SearchTerm(portfolio_id=portfolio_id, term=term, documents=n) for term, n in counts.items()),
+                batch_size=5000,
+            )
+            total += len(documents)
+    return total
+
+
+def document_count(username, portfolio_id):
+    """Number of indexed documents, cached per content version"""
+    return cache.memoize(
+        username, 'search-documents',
+        lambda: SearchDocument.objects.filter(portfolio_id=portfolio_id).count(),
+    )
+
+
+def search(username, portfolio_id, query, limit=20):
+    """
+    Rank the documents of the portfolio (`username` keys its cached counts)
+    against `query` with BM25.
+    Returns [{'type', 'id', 'title', 'slug', 'score'}], best first.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+    count = document_count(username, portfolio_id) if terms else 0
+    if not count:
+        return []
+
+    idf = {
+        term: math.log(1 + (count - df + 0.5) / (df + 0.5))
+        for term, df in SearchTerm.objects.filter(portfolio_id=portfolio_id, term__in=terms, documents__gt=0)
+        .values_list('term', 'documents')
+    }
+    if not idf:
+        return []
+    postings = SearchPosting.objects.filter(portfolio_id=portfolio_id)
+    scores = defaultdict(float)
+    for term, weight in idf.items():
+        best = (
+            postings.filter(term=term).order_by('-impact', 'document')
+            .values_list('document', 'impact')[:CANDIDATES_PER_TERM]
+        )
+        for document, value in best:
+            scores[document] += weight * value
+
+    if len(idf) > 1:
+        # Candidates may be missing from a common term's cut-off list; add
+        # their remaining postings before the final ranking
+        candidates = heapq.nlargest(limit * 3, scores, key=lambda document: (scores[document], -document))
+        scores = defaultdict(float)
+        # (no portfolio filter, so the (document, term) index is used)
+        exact = SearchPosting.objects.filter(document__in=candidates, term__in=idf)
+        for document, term, weight in exact.values_list('document', 'term', 'impact'):
+            scores[document] += idf[term] * weight
+
+    ranked = heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], -item[0]))
+    documents = {
+        row['pk']: row
+        for row in SearchDocument.objects.filter(pk__in=[pk for pk, _ in ranked]).values(
+            'pk', 'post_id', 'project_id', 'title', 'slug'
+        )
+    }
+    return [
+        {
+            'type': 'blog_post' if documents[pk]['post_id'] else 'project',
+            'id': documents[pk]['post_id'] or documents[pk]['project_id'],
+            'title': documents[pk]['title'],
+            'slug': documents[pk]['slug'],
+            'score': round(score, 4),
+        }
+        for pk, score in ranked
+    ]
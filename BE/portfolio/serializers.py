@@ -1,4 +1,7 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from .fastjson import CompiledFieldsMixin
+from .images import is_current, variants_field
 from .models import (
     Portfolio, About, Skill, Project, CaseStudy, Service,
     Testimonial, Achievement, BlogPost, Resource, Newsletter,
@@ -6,94 +9,129 @@ from .models import (
 )
 
 
-class AboutSerializer(serializers.ModelSerializer):
+class SrcsetField(serializers.Field):
+    """
+    {format: srcset} for an image field's derivatives, e.g.
+    {"webp": "/media/derivatives/a-320w.webp 320w, ..."}. Empty until the
+    derivatives for the current image have been generated.
+    """
+    def __init__(self, image_field, **kwargs):
+        self.image_field = image_field
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+    
+    def to_representation(self, instance):
+        variants = getattr(instance, variants_field(self.image_field))
+        if not variants or not is_current(getattr(instance, self.image_field), variants):
+            return {}
+        request = self.context.get('request')
+        
+        def url(name):
+            url = default_storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        
+        return {
+            fmt: ', '.join(f'{url(name)} {width}w' for width, name in sorted(
+                sizes.items(), key=lambda item: int(item[0])
+            ))
+            for fmt, sizes in variants['formats'].items()
+        }
+
+
+class AboutSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = About
         exclude = ['portfolio', 'id']
 
 
-class SkillSerializer(serializers.ModelSerializer):
+class SkillSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Skill
         exclude = ['portfolio', 'id']
 
 
-class CaseStudySerializer(serializers.ModelSerializer):
+class CaseStudySerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = CaseStudy
         exclude = ['project', 'id']
 
 
-class TestimonialSerializer(serializers.ModelSerializer):
+class TestimonialSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     project_title = serializers.CharField(source='project.title', read_only=True)
+    client_image_srcset = SrcsetField('client_image')
     
     class Meta:
         model = Testimonial
-        exclude = ['portfolio']
+        exclude = ['portfolio', 'client_image_variants']
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class ProjectSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     technologies_list = serializers.SerializerMethodField()
     case_study = CaseStudySerializer(read_only=True)
     testimonials = TestimonialSerializer(many=True, read_only=True)
+    image_srcset = SrcsetField('image')
+    thumbnail_srcset = SrcsetField('thumbnail')
     
     class Meta:
         model = Project
-        exclude = ['portfolio']
+        exclude = ['portfolio', 'technology_set', 'image_variants', 'thumbnail_variants']
     
     def get_technologies_list(self, obj):
-        if obj.technologies:
-            return [tech.strip() for tech in obj.technologies.split(',')]
-        return []
+        # Reads the prefetched technology_links when available
+        return [link.name for link in obj.technology_links.all()]
 
 
-class ServiceSerializer(serializers.ModelSerializer):
+class ServiceSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Service
         exclude = ['portfolio']
 
 
-class AchievementSerializer(serializers.ModelSerializer):
+class AchievementSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
+    image_srcset = SrcsetField('image')
+    
     class Meta:
         model = Achievement
-        exclude = ['portfolio']
+        exclude = ['portfolio', 'image_variants']
 
 
-class BlogPostSerializer(serializers.ModelSerializer):
+class BlogPostSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     tags_list = serializers.SerializerMethodField()
+    featured_image_srcset = SrcsetField('featured_image')
     
     class Meta:
         model = BlogPost
-        exclude = ['portfolio']
+        exclude = ['portfolio', 'tag_set', 'featured_image_variants']
     
     def get_tags_list(self, obj):
-        if obj.tags:
-            return [tag.strip() for tag in obj.tags.split(',')]
-        return []
+        # Reads the prefetched tag_links when available
+        return [link.name for link in obj.tag_links.all()]
 
 
-class BlogPostListSerializer(serializers.ModelSerializer):
+class BlogPostListSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     """Lighter serializer for blog post lists"""
     tags_list = serializers.SerializerMethodField()
+    featured_image_srcset = SrcsetField('featured_image')
     
     class Meta:
         model = BlogPost
-        fields = ['id', 'title', 'slug', 'excerpt', 'featured_image', 
+        fields = ['id', 'title', 'slug', 'excerpt', 'featured_image', 'featured_image_srcset',
                   'tags_list', 'is_featured', 'views', 'published_at', 'created_at']
     
     def get_tags_list(self, obj):
-        if obj.tags:
-            return [tag.strip() for tag in obj.tags.split(',')]
-        return []
+        return [link.name for link in obj.tag_links.all()]
 
 
-class ResourceSerializer(serializers.ModelSerializer):
+class ResourceSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
+    thumbnail_srcset = SrcsetField('thumbnail')
+    
     class Meta:
         model = Resource
-        exclude = ['portfolio']
+        exclude = ['portfolio', 'thumbnail_variants']
 
 
-class HobbySerializer(serializers.ModelSerializer):
+class HobbySerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Hobby
         exclude = ['portfolio']
@@ -111,7 +149,7 @@ class ContactMessageSerializer(serializers.ModelSerializer):
         fields = ['name', 'email', 'subject', 'message']
 
 
-class PortfolioSerializer(serializers.ModelSerializer):
+class PortfolioSerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     about = AboutSerializer(read_only=True)
     skills = SkillSerializer(many=True, read_only=True)
     projects = ProjectSerializer(many=True, read_only=True)
@@ -119,18 +157,41 @@ class PortfolioSerializer(serializers.ModelSerializer):
     testimonials = TestimonialSerializer(many=True, read_only=True)
     achievements = AchievementSerializer(many=True, read_only=True)
     hobbies = HobbySerializer(many=True, read_only=True)
+    profile_image_srcset = SrcsetField('profile_image')
+    
+    # Nested relations of a section that ?expand= can ask for
+    expandable = {'projects': ('case_study', 'testimonials')}
     
     class Meta:
         model = Portfolio
         fields = [
-            'id', 'username', 'name', 'tagline', 'profile_image', 'theme_color',
+            'id', 'username', 'name', 'tagline', 'profile_image', 'profile_image_srcset', 'theme_color',
             'about', 'skills', 'projects', 'services', 'testimonials',
             'achievements', 'hobbies', 'created_at', 'updated_at'
         ]
-
-
-class PortfolioSummarySerializer(serializers.ModelSerializer):
+    
+    def __init__(self, *args, fields=None, expand=None, **kwargs):
+        """
+        `fields` keeps only the named top-level fields and `expand` maps a
+        section to the nested relations to keep (see `expandable`); None
+        keeps everything.
+        """
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+        if expand is not None:
+            for section, nested in self.expandable.items():
+                if section in self.fields:
+                    child = self.fields[section].child
+                    for name in set(nested) - set(expand.get(section, ())):
+                        child.fields.pop(name)
+
+
+class PortfolioSummarySerializer(CompiledFieldsMixin, serializers.ModelSerializer):
     """Lighter version for portfolio listings"""
+    profile_image_srcset = SrcsetField('profile_image')
+    
     class Meta:
         model = Portfolio
-        fields = ['id', 'username', 'name', 'tagline', 'profile_image', 'theme_color']
+        fields = ['id', 'username', 'name', 'tagline', 'profile_image', 'profile_image_srcset', 'theme_color']
@@ -0,0 +1,152 @@
+import posixpath
+
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+from django.template.defaultfilters import filesizeformat
+from django.utils import timezone
+
+from . import cache, images, resolver, search
+from .models import (
+    Portfolio, About, Skill, Project, CaseStudy, Service,
+    Testimonial, Achievement, BlogPost, Resource, Hobby,
+    BlogPostTag, ProjectTechnology
+)
+
+# Models whose rows appear in the public read API
+CONTENT_MODELS = (
+    Portfolio, About, Skill, Project, CaseStudy, Service,
+    Testimonial, Achievement, BlogPost, Resource, Hobby,
+)
+
+# Models with image fields that get responsive derivatives
+IMAGE_MODELS = {label for label, _ in images.IMAGE_FIELDS}
+
+# Saves that only touch these fields are counters, not content edits
+COUNTER_FIELDS = {'views', 'downloads'}
+
+
+def get_portfolio_queryset(instance):
+    """Queryset matching the portfolio a content row belongs to"""
+    if isinstance(instance, Portfolio):
+        return Portfolio.objects.filter(pk=instance.pk)
+    if isinstance(instance, CaseStudy):
+        return Portfolio.objects.filter(projects__id=instance.project_id)
+    return Portfolio.objects.filter(pk=instance.portfolio_id)
+
+
+def get_portfolio_username(instance):
+    """Resolve the username of the portfolio a content row belongs to"""
+    if isinstance(instance, Portfolio):
+        return instance.username
+    return get_portfolio_queryset(instance).values_list('username', flat=True).first()
+
+
+def _is_counter_save(kwargs):
+    update_fields = kwargs.get('update_fields')
+    return bool(update_fields) and set(update_fields) <= COUNTER_FIELDS
+
+
+@receiver([post_save, post_delete])
+def invalidate_portfolio_cache(sender, instance, **kwargs):
+    if sender not in CONTENT_MODELS:
+        return
+    if _is_counter_save(kwargs):
+        return
+    namespaces = [get_portfolio_username(instance)]
+    if sender is Portfolio:
+        # A rename leaves responses and validators cached under the old username
+        namespaces += [getattr(instance, '_saved_username', None), cache.GLOBAL_NAMESPACE]
+    for namespace in set(filter(None, namespaces)):
+        # Bump now and again on commit: a read that lands between the two
+        # (e.g. before tags are synced, or before an admin transaction
+        # commits) would otherwise cache old rows under the new version.
+        cache.bump_version(namespace)
+        transaction.on_commit(lambda namespace=namespace: cache.bump_version(namespace))
+
+
+@receiver(pre_save, sender=Portfolio)
+def remember_username(sender, instance, raw=False, **kwargs):
+    # A rename must also forget the old username's resolution and responses
+    instance._saved_username = None
+    if instance.pk and not raw:
+        instance._saved_username = (
+            Portfolio.objects.filter(pk=instance.pk).values_list('username', flat=True).first()
+        )
+
+
+@receiver([post_save, post_delete], sender=Portfolio)
+def forget_resolution(sender, instance, **kwargs):
+    usernames = [instance.username, getattr(instance, '_saved_username', None)]
+    resolver.forget(*usernames)
+    transaction.on_commit(lambda: resolver.forget(*usernames))
+
+
+@receiver(pre_save, sender=Resource)
+def describe_resource_file(sender, instance, raw=False, **kwargs):
+    """Fill file_size and file_type from the file when it is new or they are blank"""
+    file = instance.file
+    if raw or not file:
+        return
+    uploaded = not file._committed
+    if uploaded or not instance.file_type:
+        instance.file_type = posixpath.splitext(file.name)[1].lstrip('.').upper()
+    if uploaded or not instance.file_size:
+        try:
+            instance.file_size = filesizeformat(file.size).replace('\xa0', ' ')
+        except OSError:
+            # Stored file missing
+            pass
+
+
+@receiver([post_save, post_delete])
+def touch_portfolio(sender, instance, **kwargs):
+    """
+    Bump Portfolio.updated_at when a child row changes, so conditional GET
+    validators cover sections that have no timestamp of their own.
+    """
+    if sender not in CONTENT_MODELS or sender is Portfolio:
+        return
+    if _is_counter_save(kwargs):
+        return
+    get_portfolio_queryset(instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=BlogPost)
+def release_post_tags(sender, instance, **kwargs):
+    # Links are cascade-deleted with the post, so read them first
+    if instance.status == 'published':
+        BlogPostTag.release(instance)
+    search.remove_post(instance)
+
+
+@receiver(pre_delete, sender=Project)
+def release_project_technologies(sender, instance, **kwargs):
+    ProjectTechnology.release(instance)
+    search.remove_project(instance)
+
+
+@receiver(post_save, sender=BlogPost)
+def index_post(sender, instance, **kwargs):
+    if not _is_counter_save(kwargs):
+        search.index_post(instance)
+
+
+@receiver(post_save, sender=Project)
+def index_project(sender, instance, **kwargs):
+    search.index_project(instance)
+
+
+@receiver([post_save, post_delete], sender=CaseStudy)
+def index_case_study(sender, instance, **kwargs):
+    # A case study deleted along with its project has nothing to re-index
+    origin = kwargs.get('origin')
+    if origin is not None and getattr(origin, 'model', type(origin)) is not CaseStudy:
+        return
+    search.index_project(instance.project)
+
+
+@receiver(post_save)
+def schedule_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw and sender._meta.label in IMAGE_MODELS:
+        images.schedule_changed(instance)
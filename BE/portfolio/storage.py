@@ -0,0 +1,214 @@
+"""
+Content-addressed media storage.
+
+`ContentAddressedStorage` names every saved file after the SHA-256 of its
+bytes, `cas/ab/cd/abcd...ef.pdf`, whatever field or upload_to it comes
+from. Uploading bytes that are already stored writes nothing and returns
+the existing name, so a logo or stock image used in ten places is stored
+once. Files are hashed while they are written to a temporary file, which
+is then renamed into place, so concurrent saves of the same content are
+harmless and readers never see half a file.
+
+A content-addressed URL never changes what it serves, so `serve()` (the
+development media view) and the front proxy can send it with
+`Cache-Control: immutable`. Names outside `cas/` (uploads made before this
+backend, see the `rehash_media` command) are served as before. Rows share
+files, so deleting a row must never delete its file; orphans are left to
+a garbage collection pass.
+"""
+import hashlib
+import os
+import posixpath
+import tempfile
+import threading
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import models, transaction
+from django.views.static import serve as static_serve
+
+from .images import variants_field
+
+PREFIX = 'cas/'
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def is_content_addressed(name):
+    return (name or '').startswith(PREFIX)
+
+
+def content_name(name, digest):
+    """Storage name for content with `digest`, keeping the extension of `name`"""
+    extension = posixpath.splitext(name or '')[1].lower()
+    return f'{PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def hash_file(file):
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that stores each distinct content once, by hash"""
+
+    def get_available_name(self, name, max_length=None):
+        # _save() picks the name from the content, and an existing file
+        # with that name is the same file
+        return name
+
+    def _save(self, name, content):
+        staging = self.path(f'{PREFIX}tmp')
+        os.makedirs(staging, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=staging)
+        digest = hashlib.sha256()
+        try:
+            with os.fdopen(fd, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            name = content_name(name, digest.hexdigest())
+            if self.exists(name):
+                # Fresh again, so a garbage collection pass running now
+                # does not delete the file this upload is about to use
+                os.utime(self.path(name))
+                return name
+            self._place(tmp, name)
+            tmp = None
+        finally:
+            if tmp is not None:
+                os.unlink(tmp)
+        return name
+
+    def _place(self, tmp, name):
+        """Atomically move a finished temporary file to `name`"""
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(tmp, self.file_permissions_mode)
+        else:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+
+    def adopt(self, name):
+        """
+        Give a file stored under its upload name a content address as well;
+        returns the new name. The original is left in place.
+        """
+        if is_content_addressed(name):
+            return name
+        new = content_name(name, _hash(self, name))
+        if self.exists(new):
+            return new
+        staging = self.path(f'{PREFIX}tmp')
+        os.makedirs(staging, exist_ok=True)
+        tmp = os.path.join(staging, f'{os.getpid()}-{threading.get_ident()}-{posixpath.basename(new)}')
+        try:
+            # A hard link costs no copy; fall back to copying where they are not supported
+            os.link(self.path(name), tmp)
+        except OSError:
+            with self.open(name, 'rb') as source, open(tmp, 'wb') as target:
+                for chunk in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    target.write(chunk)
+        self._place(tmp, new)
+        return new
+
+
+def file_fields(app_labels=('portfolio', 'company')):
+    """(model, field name) for every FileField and ImageField of the apps"""
+    for label in app_labels:
+        for model in apps.get_app_config(label).get_models():
+            for field in model._meta.get_fields():
+                if isinstance(field, models.FileField):
+                    yield model, field.name
+
+
+class RehashResult:
+    def __init__(self):
+        self.files = 0
+        self.contents = 0
+        self.bytes_saved = 0
+        self.rows = 0
+        self.missing = []
+
+
+def rehash(workers=1, delete=False, dry_run=False, storage=None):
+    """
+    Move every stored file that is still named after its upload to its
+    content address and point the rows at it. Files are hashed by
+    `workers` threads (hashlib releases the GIL); rows are saved one by one
+    so the usual signals invalidate cached responses and bump updated_at.
+    With `delete`, the old files are removed once no row refers to them.
+    """
+    storage = storage or default_storage
+    result = RehashResult()
+    references = defaultdict(list)
+    for model, field in file_fields():
+        names = model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+        for name in names.values_list(field, flat=True).distinct():
+            if not is_content_addressed(name):
+                references[name].append((model, field))
+
+    def adopt(name):
+        try:
+            size = storage.size(name)
+            return name, (content_name(name, _hash(storage, name)) if dry_run else storage.adopt(name)), size
+        except FileNotFoundError:
+            return name, None, 0
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        renamed = {}
+        sizes = defaultdict(list)
+        for name, new, size in pool.map(adopt, sorted(references)):
+            if new is None:
+                result.missing.append(name)
+                continue
+            renamed[name] = new
+            sizes[new].append(size)
+    result.files = len(renamed)
+    result.contents = len(sizes)
+    result.bytes_saved = sum(sum(group[1:]) for group in sizes.values())
+    if dry_run:
+        return result
+
+    for name, new in renamed.items():
+        for model, field in references[name]:
+            variants = variants_field(field)
+            has_variants = any(f.name == variants for f in model._meta.fields)
+            with transaction.atomic():
+                for instance in model.objects.filter(**{field: name}):
+                    setattr(instance, field, new)
+                    update_fields = [field]
+                    if has_variants and getattr(instance, variants).get('source') == name:
+                        # Same bytes, so the derivatives stay valid
+                        getattr(instance, variants)['source'] = new
+                        update_fields.append(variants)
+                    if any(f.name == 'updated_at' for f in model._meta.fields):
+                        update_fields.append('updated_at')
+                    instance.save(update_fields=update_fields)
+                    result.rows += 1
+    if delete:
+        for name in renamed:
+            if not any(model.objects.filter(**{field: name}).exists() for model, field in file_fields()):
+                storage.delete(name)
+    return result
+
+
+def _hash(storage, name):
+    with storage.open(name, 'rb') as file:
+        return hash_file(file)
+
+
+def serve(request, path, document_root=None, show_indexes=False):
+    """django.views.static.serve, marking content-addressed files immutable"""
+    response = static_serve(request, path, document_root, show_indexes)
+    if is_content_addressed(path) and response.status_code == 200:
+        response['Cache-Control'] = IMMUTABLE
+    return response
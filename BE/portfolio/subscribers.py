@@ -0,0 +1,214 @@
+"""
+Streaming export and bulk import of newsletter subscribers.
+
+Exports walk the table with `.iterator(chunk_size=...)` over a values_list
+and yield one encoded line at a time into a StreamingHttpResponse, so memory
+stays flat however many rows there are. Imports parse the file lazily and
+insert in batches with `bulk_create(ignore_conflicts=True)`, letting the
+(portfolio, email) unique constraint drop subscribers that already exist.
+Under ASGI the lines are pulled in batches through sync_to_async, since
+Django would otherwise buffer a sync iterator whole. Neither path sends
+confirmation emails.
+"""
+import csv
+import io
+import itertools
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.core.validators import validate_email
+from django.http import StreamingHttpResponse
+
+from .models import Newsletter, Portfolio
+
+# Columns of an export, in order; exports spanning portfolios lead with
+# the portfolio's username
+FIELDS = ('email', 'name', 'is_active', 'subscribed_at')
+ALL_PORTFOLIO_FIELDS = ('portfolio',) + FIELDS
+
+LOOKUPS = {'portfolio': 'portfolio__username'}
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+CHUNK_SIZE = 2000
+
+# Lines per chunk written to the client
+LINES_PER_WRITE = 500
+
+# Spreadsheets run cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def rows(queryset, fields, chunk_size=CHUNK_SIZE):
+    """Dicts of `fields`, read in primary key order without caching the queryset"""
+    lookups = [LOOKUPS.get(field, field) for field in fields]
+    for values in queryset.order_by('pk').values_list(*lookups).iterator(chunk_size=chunk_size):
+        yield dict(zip(fields, values))
+
+
+def _csv_cell(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(records, fields):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def line(values):
+        writer.writerow(values)
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    yield line(fields)
+    for record in records:
+        yield line([_csv_cell(record[field]) for field in fields])
+
+
+def stream_ndjson(records, fields):
+    for record in records:
+        yield json.dumps(record, default=str) + '\n'
+
+
+STREAMS = {'csv': stream_csv, 'ndjson': stream_ndjson}
+
+
+def batched(lines):
+    while True:
+        chunk = ''.join(itertools.islice(lines, LINES_PER_WRITE))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def abatched(lines):
+    """batched() as an async iterator, reading the database off the event loop"""
+    chunks = batched(lines)
+    next_chunk = sync_to_async(lambda: next(chunks, None), thread_sensitive=True)
+    while (chunk := await next_chunk()) is not None:
+        yield chunk
+
+
+def export_response(request, queryset, fmt, filename, fields=FIELDS):
+    """StreamingHttpResponse with the subscribers in `queryset` as CSV or NDJSON"""
+    lines = STREAMS[fmt](rows(queryset, fields), fields)
+    is_asgi = isinstance(getattr(request, '_request', request), ASGIRequest)
+    response = StreamingHttpResponse(abatched(lines) if is_asgi else batched(lines), content_type=CONTENT_TYPES[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+
+def _unquote(value):
+    if isinstance(value, str) and value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def read(file, fmt):
+    """
+    Records from an export-shaped CSV or NDJSON text stream. A line that is
+    not valid JSON is yielded as None, for import_records() to reject.
+    """
+    if fmt == 'csv':
+        for record in csv.DictReader(file):
+            yield {field: _unquote(value) for field, value in record.items()}
+        return
+    for line in file:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def _text(record, field):
+    """A record's string field, '' when left out, None when it is not a string"""
+    value = record.get(field)
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else None
+
+
+def _is_true(value):
+    if isinstance(value, str):
+        # Empty means the column was left out
+        return value.strip().lower() not in ('0', 'false', 'no')
+    return value is None or bool(value)
+
+
+class ImportResult:
+    def __init__(self):
+        self.read = 0
+        self.invalid = 0
+        self.created = 0
+
+
+def import_records(records, portfolio=None, batch_size=1000):
+    """
+    Insert subscribers from `records` (dicts with an email and optionally
+    name, is_active and, when no `portfolio` is given, a portfolio
+    username). Records that are not dicts or have non-string fields count
+    as invalid, like invalid emails. Returns an ImportResult.
+    """
+    result = ImportResult()
+    portfolio_ids = {}
+    batch = []
+
+    def portfolio_id(username):
+        if portfolio is not None:
+            return portfolio.pk
+        username = username.strip()
+        if username not in portfolio_ids:
+            portfolio_ids[username] = Portfolio.objects.filter(username=username).values_list('pk', flat=True).first()
+        return portfolio_ids[username]
+
+    def flush():
+        Newsletter.objects.bulk_create(batch, batch_size=batch_size, ignore_conflicts=True)
+        batch.clear()
+
+    before = _count(portfolio)
+    for record in records:
+        result.read += 1
+        if isinstance(record, dict):
+            email, name, username = (_text(record, field) for field in ('email', 'name', 'portfolio'))
+        else:
+            email = name = username = None
+        if None in (email, name, username):
+            result.invalid += 1
+            continue
+        email = email.strip()
+        owner = portfolio_id(username)
+        try:
+            validate_email(email)
+        except ValidationError:
+            owner = None
+        if owner is None:
+            result.invalid += 1
+            continue
+        batch.append(Newsletter(
+            portfolio_id=owner, email=email, name=name[:100],
+            is_active=_is_true(record.get('is_active')),
+        ))
+        if len(batch) >= batch_size:
+            flush()
+    flush()
+    # ignore_conflicts leaves no trace of skipped rows, so count them instead
+    result.created = _count(portfolio) - before
+    return result
+
+
+def _count(portfolio):
+    queryset = Newsletter.objects.all()
+    if portfolio is not None:
+        queryset = queryset.filter(portfolio=portfolio)
+    return queryset.count()
@@ -1,3 +1,1835 @@
-from django.test import TestCase
+import base64
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+from io import BytesIO, StringIO
+import threading
+import uuid
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+from urllib.parse import parse_qs, urlsplit
+from datetime import date, datetime, timedelta, timezone
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+
+from company.models import CompanyProfile
+from . import cache, coalescing, compression, counters, delivery, export, fastjson, images, jobs, orphans, resolver, search, storage
+from .models import (
+    Portfolio, About, Skill, Project, CaseStudy, Service,
+    Testimonial, Achievement, BlogPost, Resource, Newsletter,
+    ContactMessage, Hobby, Tag, Technology, SearchTerm, Job
+)
+from .serializers import BlogPostListSerializer, PortfolioSerializer, ProjectSerializer
+
+
+def create_portfolio(username='jane', **kwargs):
+    user = User.objects.create(username=username)
+    return Portfolio.objects.create(user=user, username=username, **kwargs)
+
+
+def populate_portfolio(portfolio, count):
+    """Add `count` rows to every section of the portfolio tree"""
+    About.objects.get_or_create(portfolio=portfolio, defaults={'bio': 'Bio'})
+    for i in range(count):
+        Skill.objects.create(portfolio=portfolio, name=f'Skill {i}', order=i)
+        project = Project.objects.create(
+            portfolio=portfolio, title=f'Project {i}', description='Description',
+            technologies='Python, Django', order=i
+        )
+        CaseStudy.objects.create(project=project, challenge='Challenge', solution='Solution')
+        Testimonial.objects.create(
+            portfolio=portfolio, client_name=f'Client {i}', content='Great', project=project
+        )
+        Service.objects.create(portfolio=portfolio, title=f'Service {i}', description='Service')
+        Achievement.objects.create(portfolio=portfolio, title=f'Award {i}', date_received=date(2024, 1, 1))
+        Hobby.objects.create(portfolio=portfolio, title=f'Hobby {i}')
+
+
+class PortfolioDetailQueryTests(TestCase):
+    # Conditional GET validators, portfolio + about, then one query per
+    # prefetched relation (skills, projects + case studies, project
+    # testimonials, project technologies, services, testimonials + project,
+    # achievements, hobbies)
+    DETAIL_QUERIES = 10
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        self.url = reverse('portfolio-detail', kwargs={'username': self.portfolio.username})
+
+    def test_detail_query_count_is_constant(self):
+        populate_portfolio(self.portfolio, 1)
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+
+        populate_portfolio(self.portfolio, 10)
+        with self.assertNumQueries(self.DETAIL_QUERIES):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['projects']), 11)
+        self.assertEqual(response.data['testimonials'][0]['project_title'][:8], 'Project ')
+        self.assertEqual(response.data['projects'][0]['case_study']['challenge'], 'Challenge')
+
+
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        populate_portfolio(self.portfolio, 3)
+        self.url = reverse('portfolio-detail', kwargs={'username': self.portfolio.username})
+
+    def get(self, **params):
+        return self.client.get(self.url, params)
+
+    def test_fields_prune_the_response_and_the_prefetches(self):
+        # Validators, portfolio, skills
+        with self.assertNumQueries(3):
+            response = self.get(fields='username,skills')
+        self.assertEqual(set(response.data), {'username', 'skills'})
+        self.assertEqual(len(response.data['skills']), 3)
+
+    def test_nested_relations_need_expand(self):
+        # Validators, portfolio, projects, project technologies
+        with self.assertNumQueries(4):
+            response = self.get(fields='projects')
+        self.assertNotIn('case_study', response.data['projects'][0])
+        self.assertNotIn('testimonials', response.data['projects'][0])
+        self.assertEqual(response.data['projects'][0]['technologies_list'], ['Python', 'Django'])
+
+        # case_study is joined, so it costs no extra query
+        cache.get_cache().clear()
+        with self.assertNumQueries(4):
+            response = self.get(fields='projects', expand='projects.case_study')
+        self.assertEqual(response.data['projects'][0]['case_study']['challenge'], 'Challenge')
+        self.assertNotIn('testimonials', response.data['projects'][0])
+
+    def test_expand_alone_keeps_every_section(self):
+        response = self.get(expand='projects.testimonials')
+        self.assertIn('hobbies', response.data)
+        self.assertIn('testimonials', response.data['projects'][0])
+        self.assertNotIn('case_study', response.data['projects'][0])
+
+    def test_unknown_names_are_rejected(self):
+        self.assertEqual(self.get(fields='username,secrets').status_code, 400)
+        self.assertEqual(self.get(expand='skills.owner').status_code, 400)
+
+    def test_representations_have_distinct_etags(self):
+        self.assertNotEqual(self.get()['ETag'], self.get(fields='skills')['ETag'])
+
+
+class BundleTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        populate_portfolio(self.portfolio, 3)
+        Project.objects.filter(portfolio=self.portfolio, order__lt=2).update(is_featured=True)
+        BlogPost.objects.create(
+            portfolio=self.portfolio, title='Featured', slug='featured', content='Post',
+            status='published', is_featured=True
+        )
+        self.url = reverse('portfolio-bundle', kwargs={'username': 'jane'})
+
+    def test_bundle_matches_the_individual_endpoints(self):
+        bundle = self.client.get(self.url).data
+        self.assertEqual(list(bundle), ['portfolio', 'featured_projects', 'featured_posts'])
+        for name, url_name in (
+            ('portfolio', 'portfolio-detail'),
+            ('featured_projects', 'portfolio-projects-featured'),
+            ('featured_posts', 'portfolio-blog-featured'),
+        ):
+            response = self.client.get(reverse(url_name, kwargs={'username': 'jane'}))
+            self.assertEqual(bundle[name], response.data, name)
+        self.assertEqual(len(bundle['featured_projects']), 2)
+
+    def test_featured_projects_reuse_the_portfolio_prefetch(self):
+        # The portfolio detail plus the featured posts and their tags
+        with self.assertNumQueries(PortfolioDetailQueryTests.DETAIL_QUERIES + 2):
+            self.client.get(self.url)
+        cache.get_cache().clear()
+        # Validators, portfolio, projects + case studies, technologies, testimonials
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url, {'include': 'featured_projects'})
+        self.assertEqual(list(response.data), ['featured_projects'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, {'include': 'featured_projects'})['X-Cache'], 'HIT')
+
+    def test_unknown_part_is_rejected(self):
+        response = self.client.get(self.url, {'include': 'portfolio,secrets'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['include'], ['Unknown part: secrets'])
+
+    def test_missing_portfolio(self):
+        url = reverse('portfolio-bundle', kwargs={'username': 'nobody'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_validators_follow_the_portfolio(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get(self.url, {'include': 'portfolio'})['ETag'], etag)
+        Hobby.objects.filter(portfolio=self.portfolio).first().delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        populate_portfolio(self.portfolio, 12)
+        for i in range(3):
+            BlogPost.objects.create(
+                portfolio=self.portfolio, title=f'Post {i}', slug=f'post-{i}', content='Body',
+                tags='python, asgi', status='published', published_at=datetime(2024, 1, i + 1, tzinfo=timezone.utc),
+            )
+        BlogPost.objects.create(portfolio=self.portfolio, title='Draft', slug='draft', content='Body')
+
+    def aget(self, path, **headers):
+        return async_to_sync(self.async_client.get)(path, headers=headers)
+
+    def test_hot_paths_resolve_to_coroutines_under_asgi(self):
+        for path in ['/api/portfolios/jane/', '/api/jane/projects/', '/api/jane/blog/']:
+            self.assertTrue(iscoroutinefunction(resolve(path, 'BE.asgi_urls').func), path)
+            self.assertFalse(iscoroutinefunction(resolve(path).func), path)
+            self.assertTrue(self.aget(path).resolver_match.func.cls.__name__.startswith('Async'), path)
+
+    def test_async_views_render_the_sync_representation(self):
+        paths = [
+            '/api/portfolios/jane/',
+            '/api/portfolios/jane/?fields=name,projects&expand=projects.case_study',
+            '/api/portfolios/jane/?fields=secrets',
+            '/api/portfolios/nobody/',
+            '/api/jane/projects/',
+            '/api/jane/projects/?page=2',
+            '/api/jane/projects/?page=9',
+            '/api/jane/projects/?cursor=',
+            '/api/jane/projects/?tech=django',
+            '/api/jane/blog/',
+            '/api/jane/blog/?tag=ASGI',
+            '/api/nobody/blog/',
+        ]
+        for path in paths:
+            cache.get_cache().clear()
+            expected = self.client.get(path)
+            cache.get_cache().clear()
+            response = self.aget(path)
+            self.assertEqual(response.status_code, expected.status_code, path)
+            self.assertEqual(response.content, expected.content, path)
+            self.assertEqual(response.get('ETag'), expected.get('ETag'), path)
+
+        # Following a cursor link gives the same page either way
+        next_page = self.client.get('/api/jane/projects/?cursor=').data['next']
+        self.assertEqual(self.aget(next_page).content, self.client.get(next_page).content)
+
+    def test_validators_and_response_cache(self):
+        first = self.aget('/api/portfolios/jane/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.aget('/api/portfolios/jane/')
+            self.assertEqual(second['X-Cache'], 'HIT')
+            self.assertEqual(second.content, first.content)
+            self.assertEqual(self.aget('/api/portfolios/jane/', if_none_match=first['ETag']).status_code, 304)
+
+        Skill.objects.create(portfolio=self.portfolio, name='New skill')
+        self.assertEqual(self.aget('/api/portfolios/jane/', if_none_match=first['ETag']).status_code, 200)
+
+    def test_session_users_are_loaded(self):
+        self.async_client.force_login(self.portfolio.user)
+        response = self.aget('/api/jane/projects/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['count'], 12)
+
+    def test_modified_sessions_are_saved_under_asgi(self):
+        User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        response = async_to_sync(self.async_client.post)(
+            '/admin/login/', {'username': 'admin', 'password': 'secret', 'next': '/admin/'}
+        )
+        self.assertEqual(response.status_code, 302)
+        session_key = response.cookies['sessionid'].value
+        self.assertTrue(Session.objects.filter(session_key=session_key).exists())
+
+
+class ResponseCacheTestsMixin:
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        self.other = create_portfolio('john')
+        populate_portfolio(self.portfolio, 2)
+        populate_portfolio(self.other, 2)
+        self.url = reverse('portfolio-detail', kwargs={'username': 'jane'})
+        self.other_url = reverse('portfolio-detail', kwargs={'username': 'john'})
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(first.content, second.content)
+        self.assertEqual(cache.get_stats(), {cache.HIT: 1, cache.MISS: 1})
+
+    def test_query_params_are_part_of_the_key(self):
+        projects = reverse('portfolio-projects', kwargs={'username': 'jane'})
+        self.client.get(projects, {'page': 1})
+        self.assertEqual(self.client.get(projects, {'page': 2}).status_code, 404)
+        self.assertEqual(self.client.get(projects, {'page': 1})['X-Cache'], 'HIT')
+
+    def test_child_change_invalidates_only_its_portfolio(self):
+        self.client.get(self.url)
+        self.client.get(self.other_url)
+
+        case_study = CaseStudy.objects.filter(project__portfolio=self.portfolio).first()
+        case_study.challenge = 'Updated challenge'
+        case_study.save()
+
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertIn(b'Updated challenge', response.content)
+        self.assertEqual(self.client.get(self.other_url)['X-Cache'], 'HIT')
+
+    def test_delete_invalidates(self):
+        self.client.get(self.url)
+        Skill.objects.filter(portfolio=self.portfolio).first().delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['skills']), 1)
+
+    def test_portfolio_change_invalidates_list(self):
+        list_url = reverse('portfolio-list')
+        self.client.get(list_url)
+        self.assertEqual(self.client.get(list_url)['X-Cache'], 'HIT')
+        self.other.is_active = False
+        self.other.save()
+        response = self.client.get(list_url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 1)
+
+    def test_rename_invalidates_old_username(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url)['X-Cache'], 'HIT')
+        self.portfolio.username = 'jane2'
+        self.portfolio.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+        renamed = self.client.get(reverse('portfolio-detail', kwargs={'username': 'jane2'}))
+        self.assertEqual(renamed.json()['username'], 'jane2')
+
+    def test_browsable_api_is_not_cached(self):
+        self.client.get(self.url, HTTP_ACCEPT='text/html')
+        self.assertEqual(cache.get_stats(), {cache.HIT: 0, cache.MISS: 0})
+
+
+class LocMemResponseCacheTests(ResponseCacheTestsMixin, TestCase):
+    pass
+
+
+@override_settings(CACHES={
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': tempfile.mkdtemp(prefix='portfolio-cache-'),
+    }
+})
+class FileBasedResponseCacheTests(ResponseCacheTestsMixin, TestCase):
+    pass
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        populate_portfolio(self.portfolio, 2)
+        self.url = reverse('portfolio-detail', kwargs={'username': 'jane'})
+
+    def test_matching_etag_returns_304_without_queries(self):
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_child_change_changes_etag(self):
+        etag = self.client.get(self.url)['ETag']
+        Hobby.objects.filter(portfolio=self.portfolio).first().delete()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_project_list_validators(self):
+        url = reverse('portfolio-projects', kwargs={'username': 'jane'})
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Project.objects.filter(portfolio=self.portfolio).update(title='Renamed')
+        Project.objects.filter(portfolio=self.portfolio).first().save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_portfolio_is_not_a_304(self):
+        url = reverse('portfolio-detail', kwargs={'username': 'nobody'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='*')
+        self.assertEqual(response.status_code, 404)
+
+
+class ResponseCompressionTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        populate_portfolio(self.portfolio, 5)
+        self.url = reverse('portfolio-detail', kwargs={'username': 'jane'})
+
+    def test_negotiation(self):
+        codings = ['br', 'gzip']
+        self.assertEqual(compression.negotiate('gzip, deflate, br', codings), 'br')
+        self.assertEqual(compression.negotiate('br;q=0.5, gzip', codings), 'gzip')
+        self.assertEqual(compression.negotiate('br;q=0, gzip;q=0.1', codings), 'gzip')
+        self.assertEqual(compression.negotiate('*', codings), 'br')
+        self.assertEqual(compression.negotiate('*;q=0, identity', codings), None)
+        self.assertEqual(compression.negotiate('', codings), None)
+        self.assertEqual(compression.negotiate('deflate', codings), None)
+
+    def test_gzip_response(self):
+        plain = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        cache.get_cache().clear()
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertLess(len(response.content), len(plain.content))
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['ETag'], f'W/{plain["ETag"]}')
+        # Either validator matches the other representation
+        for etag in (response['ETag'], plain['ETag']):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag, HTTP_ACCEPT_ENCODING='gzip').status_code, 304)
+
+    def test_cached_responses_are_compressed_once(self):
+        first = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        with mock.patch('portfolio.compression.compress') as compress, self.assertNumQueries(0):
+            second = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+            plain = self.client.get(self.url)
+        compress.assert_not_called()
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second['Content-Encoding'], 'gzip')
+        self.assertEqual(second.content, first.content)
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(gzip.decompress(second.content), plain.content)
+
+    def test_uncached_and_small_responses(self):
+        # The browsable API is not cached, and HTML is not compressed
+        html = self.client.get(self.url, HTTP_ACCEPT='text/html', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', html)
+        # Without the response cache, compressed per request
+        with mock.patch.object(cache.CachedResponseMixin, 'is_cacheable', return_value=False):
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), self.client.get(self.url).content)
+        with override_settings(RESPONSE_COMPRESSION_MIN_SIZE=10 ** 6):
+            cache.get_cache().clear()
+            response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_asgi_responses(self):
+        plain = self.client.get(self.url)
+        cache.get_cache().clear()
+        for expected_cache in ('MISS', 'HIT'):
+            response = async_to_sync(self.async_client.get)(self.url, headers={'accept-encoding': 'gzip'})
+            self.assertEqual(response['X-Cache'], expected_cache)
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(response.content), plain.content)
+
+
+class FastSerializationTests(TestCase):
+    """The compiled serializers and orjson must render exactly what DRF does"""
+    text = 'Tabs\tquotes " backslashes \\ \x00\x1f\x7f caf\u00e9 \u2028\u2029 \U0001f600 <b>&</b>'
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio(name=self.text, tagline='')
+        populate_portfolio(self.portfolio, 4)
+        About.objects.filter(portfolio=self.portfolio).update(bio=self.text)
+        project = Project.objects.filter(portfolio=self.portfolio).first()
+        project.technologies = 'Python, Django, ASGI'
+        project.is_featured = True
+        project.save()
+        Project.objects.filter(pk=project.pk).update(
+            image='cas/ab/cd/abcd.png', image_variants={
+                'source': 'cas/ab/cd/abcd.png', 'formats': {'webp': {'320': 'cas/ef/01/ef01.webp'}},
+            },
+        )
+        # No case study, and a testimonial about no project
+        Project.objects.create(portfolio=self.portfolio, title='Bare', description=self.text, order=9)
+        Testimonial.objects.create(portfolio=self.portfolio, client_name='Anonymous', content=self.text)
+        for i in range(3):
+            BlogPost.objects.create(
+                portfolio=self.portfolio, title=f'Post {i} {self.text}', slug=f'post-{i}', excerpt=self.text,
+                content='Body', tags='python, asgi', status='published', is_featured=i == 0,
+                published_at=datetime(2024, 1, i + 1, 12, 30, 15, 123456, tzinfo=timezone.utc),
+            )
+        Resource.objects.create(portfolio=self.portfolio, title='Guide', description='Guide', file='cas/12/34/1234.pdf')
+        create_portfolio('john')
+        CompanyProfile.objects.create(description=self.text, services='Web, AI')
+
+    def render(self, path):
+        cache.get_cache().clear()
+        return self.client.get(path)
+
+    def test_endpoints_render_the_same_bytes(self):
+        project = Project.objects.filter(portfolio=self.portfolio).first()
+        paths = [
+            '/api/portfolios/',
+            '/api/portfolios/jane/',
+            '/api/portfolios/john/',
+            '/api/portfolios/jane/?fields=name,projects&expand=projects.case_study',
+            '/api/portfolios/jane/?fields=about,testimonials',
+            '/api/jane/projects/',
+            '/api/jane/projects/?cursor=',
+            '/api/jane/projects/featured/',
+            f'/api/jane/projects/{project.pk}/',
+            '/api/jane/blog/',
+            '/api/jane/blog/featured/',
+            '/api/jane/resources/',
+            '/api/jane/facets/',
+            '/api/jane/search/?q=post',
+            '/api/jane/bundle/?include=featured_projects,featured_posts',
+            '/api/company/profile/',
+        ]
+        for path in paths:
+            with override_settings(FAST_SERIALIZATION=False):
+                expected = self.render(path)
+            response = self.render(path)
+            self.assertEqual(response.status_code, expected.status_code, path)
+            self.assertEqual(response.content, expected.content, path)
+            self.assertEqual(response.status_code, 200, path)
+        self.assertIn(b'\\u2028', self.render('/api/portfolios/jane/').content)
+        # Datetimes are rendered in the current timezone
+        with override_settings(TIME_ZONE='Asia/Karachi'):
+            with override_settings(FAST_SERIALIZATION=False):
+                expected = self.render('/api/jane/blog/')
+            self.assertEqual(self.render('/api/jane/blog/').content, expected.content)
+            self.assertIn(b'+05:00', expected.content)
+
+    def test_serializers_return_the_same_data(self):
+        request = Request(APIRequestFactory().get('/', SERVER_NAME='localhost'))
+        context = {'request': request}
+        portfolio = Portfolio.objects.prefetch_related(
+            'skills', 'projects__technology_links__technology', 'projects__testimonials', 'testimonials__project',
+            'services', 'achievements', 'hobbies',
+        ).select_related('about').get(pk=self.portfolio.pk)
+        projects = list(Project.objects.filter(portfolio=self.portfolio))
+        posts = list(BlogPost.objects.filter(portfolio=self.portfolio))
+        cases = [
+            lambda: PortfolioSerializer(portfolio, context=context).data,
+            lambda: PortfolioSerializer(portfolio, context=context, fields=['projects'], expand={}).data,
+            lambda: ProjectSerializer(projects, many=True, context=context).data,
+            lambda: BlogPostListSerializer(posts, many=True, context=context).data,
+        ]
+        for case in cases:
+            with override_settings(FAST_SERIALIZATION=False):
+                expected = case()
+            data = case()
+            self.assertEqual(data, expected)
+            self.assertEqual(fastjson.FastJSONRenderer().render(data), JSONRenderer().render(expected))
+
+    def test_fields_are_compiled(self):
+        plan = dict(ProjectSerializer(context={}).compile_fields()[0])
+        self.assertEqual(plan['title'].__qualname__.split('.')[0], '_passthrough')
+        self.assertEqual(plan['order'].__qualname__.split('.')[0], '_passthrough')
+        self.assertEqual(plan['created_at'].__qualname__.split('.')[0], '_datetime')
+        self.assertEqual(plan['case_study'].__qualname__.split('.')[0], '_generic')
+        plan = dict(fastjson.CompiledFieldsMixin.compile_fields(
+            PortfolioSerializer(context={}).fields['testimonials'].child
+        )[0])
+        self.assertEqual(plan['project'].__qualname__.split('.')[0], '_attribute')
+
+    @mock.patch.object(fastjson, 'orjson', None)
+    def test_renderer_without_orjson(self):
+        data = {'name': self.text}
+        self.assertEqual(fastjson.FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_renderer_matches_json_renderer(self):
+        data = {
+            'text': ''.join(map(chr, range(128))) + self.text,
+            'numbers': [0, -1, 2 ** 63 - 1, 1.5, 0.0001, True, False, None],
+            'datetimes': [
+                datetime(2024, 5, 6, 7, 8, 9, 123456, tzinfo=timezone.utc),
+                datetime(2024, 5, 6, 7, 8, 9),
+                date(2024, 5, 6),
+            ],
+            'others': [Decimal('1.10'), uuid.UUID(int=1), (1, 2), {'nested': {}}],
+        }
+        renderer, reference = fastjson.FastJSONRenderer(), JSONRenderer()
+        self.assertEqual(renderer.render(data), reference.render(data))
+        # What orjson cannot encode falls back to the json module
+        for fallback in ({'big': 2 ** 70}, {1: 'integer key'}):
+            self.assertEqual(renderer.render(fallback), reference.render(fallback))
+        indented = 'application/json; indent=2'
+        self.assertEqual(renderer.render(data, indented), reference.render(data, indented))
+        self.assertEqual(renderer.render(None), b'')
+
+
+class ResolverTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        populate_portfolio(self.portfolio, 2)
+        Project.objects.filter(portfolio=self.portfolio).update(is_featured=True)
+
+    def test_resolution_is_cached(self):
+        url = reverse('portfolio-projects-featured', kwargs={'username': 'jane'})
+        with CaptureQueriesContext(connection) as first:
+            self.client.get(url)
+        cache.bump_version('jane')
+        with CaptureQueriesContext(connection) as second:
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(second), len(first) - 1)
+        # Projects are filtered by the portfolio id, without a join
+        self.assertNotIn('portfolio_portfolio', second[1]['sql'])
+
+    def test_writes_resolve_without_querying_the_portfolio(self):
+        resolver.resolve('jane')
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.get_portfolio_id('jane'), self.portfolio.pk)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                reverse('portfolio-contact', kwargs={'username': 'jane'}),
+                {'name': 'Reader', 'email': 'reader@example.com', 'message': 'Hello'}, format='json',
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse([query for query in queries if 'FROM "portfolio_portfolio"' in query['sql']])
+
+    def test_saving_the_portfolio_forgets_its_usernames(self):
+        url = reverse('portfolio-projects', kwargs={'username': 'jane'})
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.portfolio.is_active = False
+        self.portfolio.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+        self.portfolio.is_active = True
+        self.portfolio.username = 'janet'
+        self.portfolio.save()
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(
+            self.client.get(reverse('portfolio-projects', kwargs={'username': 'janet'})).status_code, 200
+        )
+
+    def test_unknown_usernames_are_cached_until_created(self):
+        url = reverse('portfolio-resources', kwargs={'username': 'john'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve('john'), resolver.UNKNOWN)
+        create_portfolio('john')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_deleted_portfolio_is_forgotten(self):
+        resolver.resolve('jane')
+        self.portfolio.delete()
+        self.assertEqual(resolver.resolve('jane'), resolver.UNKNOWN)
+
+
+class StaticExportTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio(tagline='Builder of <things>')
+        populate_portfolio(self.portfolio, 2)
+        self.post = BlogPost.objects.create(
+            portfolio=self.portfolio, title='Post', slug='post', content='Post', status='published'
+        )
+        other = create_portfolio('john')
+        populate_portfolio(other, 1)
+        output = tempfile.TemporaryDirectory()
+        self.addCleanup(output.cleanup)
+        self.output = Path(output.name)
+
+    def export(self, **kwargs):
+        return export.export(self.output, 'http://testserver', **kwargs)
+
+    def read(self, path):
+        return (self.output / path.strip('/') / 'index.json').read_bytes()
+
+    def test_files_match_the_api(self):
+        self.assertEqual(self.export(), (['jane', 'john'], []))
+        for url_name in ('portfolio-detail', 'portfolio-projects', 'portfolio-blog-featured', 'portfolio-bundle'):
+            url = reverse(url_name, kwargs={'username': 'jane'})
+            self.assertEqual(self.read(url), self.client.get(url).content, url_name)
+        project = Project.objects.filter(portfolio=self.portfolio).first()
+        url = reverse('portfolio-project-detail', kwargs={'username': 'jane', 'pk': project.pk})
+        self.assertEqual(self.read(url), self.client.get(url).content)
+
+    def test_blog_details_are_exported_without_counting_views(self):
+        self.export()
+        url = reverse('portfolio-blog-detail', kwargs={'username': 'jane', 'pk': self.post.pk})
+        self.assertEqual(json.loads(self.read(url))['title'], 'Post')
+        self.assertEqual(counters.pending(BlogPost, 'views', self.post.pk), 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+
+    def test_only_changed_portfolios_are_exported_again(self):
+        self.export()
+        self.assertEqual(self.export(), ([], []))
+        project = Project.objects.filter(portfolio=self.portfolio).first()
+        project.title = 'Renamed'
+        project.save()
+        self.assertEqual(self.export(), (['jane'], []))
+        self.assertIn(b'Renamed', self.read(reverse('portfolio-projects', kwargs={'username': 'jane'})))
+        self.assertEqual(self.export(force=True), (['jane', 'john'], []))
+
+    def test_files_no_longer_produced_are_removed(self):
+        self.export()
+        project = Project.objects.filter(portfolio=self.portfolio).first()
+        detail = reverse('portfolio-project-detail', kwargs={'username': 'jane', 'pk': project.pk})
+        project.delete()
+        self.export()
+        self.assertFalse((self.output / detail.strip('/')).exists())
+
+        Portfolio.objects.filter(username='john').update(is_active=False)
+        self.assertEqual(self.export(), ([], ['john']))
+        self.assertFalse((self.output / 'api' / 'john').exists())
+        self.assertTrue((self.output / 'api' / 'jane').exists())
+
+    def test_every_page_of_a_list_is_exported(self):
+        BlogPost.objects.bulk_create(
+            BlogPost(portfolio=self.portfolio, title=f'Bulk {i}', slug=f'bulk-{i}', content='Bulk', status='published')
+            for i in range(20)
+        )
+        self.export()
+        blog = reverse('portfolio-blog', kwargs={'username': 'jane'})
+        url, titles = blog, []
+        while url:
+            page = json.loads(self.read(url))
+            titles += [post['title'] for post in page['results']]
+            url = page['next'] and urlsplit(page['next']).path
+        expected = [
+            post['title'] for number in (1, 2, 3) for post in self.client.get(blog, {'page': number}).json()['results']
+        ]
+        self.assertEqual(titles, expected)
+        self.assertEqual(len(set(titles)), 21)
+
+        last = json.loads(self.read(f'{blog}page/3/'))
+        self.assertIsNone(last['next'])
+        self.assertEqual(last['previous'], f'http://testserver{blog}page/2/')
+        self.assertEqual(json.loads(self.read(f'{blog}page/2/'))['previous'], f'http://testserver{blog}')
+        self.assertEqual(last['results'], self.client.get(blog, {'page': 3}).json()['results'])
+
+    def test_html_inlines_the_portfolio(self):
+        self.export(html_template='<html><head><title>fe</title></head><body></body></html>')
+        html = (self.output / 'jane' / 'index.html').read_text()
+        self.assertIn("<title>jane's Portfolio</title>", html)
+        self.assertIn('content="Builder of &lt;things&gt;"', html)
+        data = html.split('<script id="portfolio-data" type="application/json">')[1].split('</script>')[0]
+        self.assertNotIn('<things>', data)
+        self.assertEqual(json.loads(data), json.loads(self.read(reverse('portfolio-detail', kwargs={'username': 'jane'}))))
+
+    def test_base_url_must_be_an_allowed_host(self):
+        with self.assertRaises(export.ExportError):
+            export.export(self.output, 'https://elsewhere.example.com')
+
+
+class SubscriberExportImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        Newsletter.objects.create(portfolio=self.portfolio, email='a@example.com', name='Ann')
+        Newsletter.objects.create(portfolio=self.portfolio, email='b@example.com', name='=HYPERLINK("x")')
+        Newsletter.objects.create(portfolio=self.portfolio, email='c@example.com', is_active=False)
+        self.url = reverse('portfolio-newsletter-export', kwargs={'username': 'jane', 'fmt': 'csv'})
+
+    def get(self, url=None, **params):
+        self.client.force_authenticate(self.portfolio.user)
+        return self.client.get(url or self.url, params)
+
+    def test_csv_export_streams_the_subscribers(self):
+        response = self.get()
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="jane-subscribers.csv"')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'email,name,is_active,subscribed_at')
+        self.assertEqual(len(lines), 4)
+        # Cells a spreadsheet would run as formulas are quoted
+        self.assertIn('b@example.com,"\'=HYPERLINK(""x"")",True', lines[2])
+        self.assertEqual(len(b''.join(self.get(active='1').streaming_content).decode().splitlines()), 3)
+
+    def test_ndjson_export(self):
+        url = reverse('portfolio-newsletter-export', kwargs={'username': 'jane', 'fmt': 'ndjson'})
+        response = self.get(url)
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual([record['email'] for record in records], ['a@example.com', 'b@example.com', 'c@example.com'])
+        self.assertEqual(records[2]['is_active'], False)
+        self.assertEqual(self.get(url.replace('.ndjson', '.xml')).status_code, 404)
+
+    def test_export_is_for_the_owner_and_staff(self):
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        other = User.objects.create(username='john')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        other.is_staff = True
+        other.save()
+        self.assertEqual(self.client.get(self.url).status_code, 200)
+
+    def test_export_streams_under_asgi(self):
+        self.client.force_login(self.portfolio.user)
+        self.async_client.force_login(self.portfolio.user)
+        response = async_to_sync(self.async_client.get)(self.url)
+        content = async_to_sync(self._consume)(response)
+        self.assertEqual(content, b''.join(self.client.get(self.url).streaming_content))
+
+    async def _consume(self, response):
+        return b''.join([chunk async for chunk in response])
+
+    def test_admin_actions_export_across_portfolios(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(admin)
+        response = self.client.post(reverse('admin:portfolio_newsletter_changelist'), {
+            'action': 'export_ndjson', '_selected_action': list(Newsletter.objects.values_list('pk', flat=True)),
+        })
+        records = [json.loads(line) for line in b''.join(response.streaming_content).splitlines()]
+        self.assertEqual({record['portfolio'] for record in records}, {'jane'})
+        self.assertEqual(len(records), 3)
+
+    def test_import_skips_existing_and_invalid_subscribers(self):
+        create_portfolio('john')
+        export = b''.join(self.get().streaming_content).decode()
+        lines = export.splitlines() + ['not-an-email,Bad,True,', 'd@example.com,Dee,,']
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as file:
+            file.write('\n'.join(lines))
+        self.addCleanup(Path(file.name).unlink)
+
+        out = StringIO()
+        call_command('import_subscribers', file.name, portfolio='john', stdout=out)
+        self.assertIn('4 subscribed, 0 duplicates, 1 invalid', out.getvalue())
+        imported = Newsletter.objects.filter(portfolio__username='john')
+        self.assertEqual(imported.filter(is_active=False).get().email, 'c@example.com')
+        self.assertEqual(imported.get(email='b@example.com').name, '=HYPERLINK("x")')
+
+        out = StringIO()
+        call_command('import_subscribers', file.name, portfolio='jane', stdout=out)
+        self.assertIn('1 subscribed, 3 duplicates, 1 invalid', out.getvalue())
+
+    def test_import_rejects_malformed_ndjson_lines(self):
+        create_portfolio('john')
+        lines = [
+            '{"email": "a@example.com", "name": "Ann"}',
+            '{"email": "b@example.com"',
+            '["c@example.com"]',
+            '{"email": "d@example.com", "name": 42}',
+            '{"email": ["e@example.com"]}',
+            '{"email": "f@example.com", "is_active": false}',
+        ]
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False) as file:
+            file.write('\n'.join(lines))
+        self.addCleanup(Path(file.name).unlink)
+
+        out = StringIO()
+        call_command('import_subscribers', file.name, portfolio='john', stdout=out)
+        self.assertIn('2 subscribed, 0 duplicates, 4 invalid', out.getvalue())
+        self.assertEqual(
+            sorted(Newsletter.objects.filter(portfolio__username='john').values_list('email', flat=True)),
+            ['a@example.com', 'f@example.com'],
+        )
+
+
+class FileDeliveryTests(TestCase):
+    def setUp(self):
+        counters.get_cache().clear()
+        counters.get_cache().set(counters.FLUSH_LOCK_KEY, 1, None)
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        self.data = bytes(range(256)) * 40
+        self.resource = Resource.objects.create(
+            portfolio=self.portfolio, title='Guide', description='Guide',
+            file=SimpleUploadedFile('guide.pdf', self.data),
+        )
+        self.url = reverse('portfolio-resource-download', kwargs={'username': 'jane', 'pk': self.resource.pk})
+
+    def get(self, url=None, **headers):
+        response = self.client.get(url or self.url, HTTP_ACCEPT='application/pdf', **headers)
+        if response.streaming:
+            response.content_bytes = b''.join(response.streaming_content)
+            response.close()
+        return response
+
+    def downloads(self):
+        return counters.pending(Resource, 'downloads', self.resource.pk)
+
+    def test_get_streams_the_file_and_counts_the_download(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_bytes, self.data)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Disposition'], "attachment; filename*=UTF-8''guide.pdf")
+        self.assertEqual(self.downloads(), 1)
+
+    def test_ranges(self):
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content_bytes, self.data[10:20])
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.data)}')
+        self.assertEqual(response['Content-Length'], '10')
+
+        # Resuming sends an open-ended range
+        response = self.get(HTTP_RANGE='bytes=5000-')
+        self.assertEqual(response.content_bytes, self.data[5000:])
+        self.assertEqual(self.get(HTTP_RANGE='bytes=-5').content_bytes, self.data[-5:])
+        # Several ranges are answered with the whole file
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-1,5-6').status_code, 200)
+
+        response = self.get(HTTP_RANGE=f'bytes={len(self.data)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.data)}')
+        # Only the requests starting at the first byte were downloads
+        self.assertEqual(self.downloads(), 1)
+
+    def test_if_range_falls_back_to_the_whole_file_once_it_changed(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_RANGE='bytes=10-', HTTP_IF_RANGE=etag).status_code, 206)
+        response = self.get(HTTP_RANGE='bytes=10-', HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_bytes, self.data)
+
+    def test_head_is_not_counted(self):
+        response = self.client.head(self.url, HTTP_RANGE='bytes=0-99')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], '100')
+        self.assertEqual(self.downloads(), 0)
+
+    @override_settings(FILE_DELIVERY='x-accel-redirect')
+    def test_transfer_is_handed_to_the_proxy(self):
+        response = self.get()
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.resource.file.name}')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(self.downloads(), 1)
+
+    def test_resume(self):
+        url = reverse('portfolio-resume', kwargs={'username': 'jane'})
+        self.assertEqual(self.get(url).status_code, 404)
+        About.objects.create(portfolio=self.portfolio, resume_file=SimpleUploadedFile('cv.pdf', b'%PDF-1.4'))
+        response = self.get(url, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response.content_bytes, b'%PDF')
+
+    def test_parse_range(self):
+        self.assertEqual(delivery.parse_range('bytes=0-', 10), (0, 9))
+        self.assertEqual(delivery.parse_range('bytes=5-100', 10), (5, 9))
+        self.assertEqual(delivery.parse_range('bytes=-20', 10), (0, 9))
+        for header in (None, 'items=0-1', 'bytes=5-1', 'bytes=x-', 'bytes=-'):
+            self.assertIsNone(delivery.parse_range(header, 10))
+        with self.assertRaises(delivery.RangeNotSatisfiable):
+            delivery.parse_range('bytes=10-', 10)
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = Path(media.name)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.portfolio = create_portfolio()
+
+    def stored_files(self):
+        names = (path.relative_to(self.media).as_posix() for path in self.media.rglob('*') if path.is_file())
+        return sorted(name for name in names if not name.startswith('cas/tmp/'))
+
+    def test_identical_uploads_are_stored_once(self):
+        About.objects.create(portfolio=self.portfolio, resume_file=SimpleUploadedFile('cv.PDF', b'%PDF resume'))
+        resource = Resource.objects.create(
+            portfolio=self.portfolio, title='Resume', description='Resume',
+            file=SimpleUploadedFile('copy.pdf', b'%PDF resume'),
+        )
+        other = Resource.objects.create(
+            portfolio=self.portfolio, title='Guide', description='Guide', file=SimpleUploadedFile('g.pdf', b'%PDF guide'),
+        )
+        digest = hashlib.sha256(b'%PDF resume').hexdigest()
+        self.assertEqual(resource.file.name, f'cas/{digest[:2]}/{digest[2:4]}/{digest}.pdf')
+        self.assertEqual(self.portfolio.about.resume_file.name, resource.file.name)
+        self.assertEqual(self.stored_files(), sorted([resource.file.name, other.file.name]))
+
+    def test_resource_size_and_type_are_filled_in(self):
+        resource = Resource.objects.create(
+            portfolio=self.portfolio, title='Guide', description='Guide',
+            file=SimpleUploadedFile('guide.zip', b'x' * 2048),
+        )
+        self.assertEqual((resource.file_type, resource.file_size), ('ZIP', '2.0 KB'))
+        resource.file_type = 'Archive'
+        resource.save()
+        resource.refresh_from_db()
+        self.assertEqual(resource.file_type, 'Archive')
+
+    def test_content_addressed_media_is_immutable(self):
+        name = default_storage.save('resources/a.txt', ContentFile(b'a'))
+        legacy = FileSystemStorage().save('resources/b.txt', ContentFile(b'b'))
+        request = APIRequestFactory().get('/')
+        response = storage.serve(request, name, document_root=str(self.media))
+        self.assertEqual(response['Cache-Control'], storage.IMMUTABLE)
+        response = storage.serve(request, legacy, document_root=str(self.media))
+        self.assertNotIn('Cache-Control', response)
+
+    def test_rehash_moves_existing_files_to_their_content_address(self):
+        legacy = FileSystemStorage()
+        first = legacy.save('resources/first.pdf', ContentFile(b'same'))
+        second = legacy.save('resumes/second.pdf', ContentFile(b'same'))
+        resource = Resource.objects.create(
+            portfolio=self.portfolio, title='Guide', description='Guide', file=first
+        )
+        About.objects.create(portfolio=self.portfolio, resume_file=second)
+        Resource.objects.create(portfolio=self.portfolio, title='Lost', description='Lost', file='resources/lost.pdf')
+
+        out, err = StringIO(), StringIO()
+        call_command('rehash_media', '--delete', '--workers', '2', stdout=out, stderr=err)
+        self.assertIn('Rehashed 2 files (1 distinct, 4 bytes deduplicated) and updated 2 rows', out.getvalue())
+        self.assertIn('Missing: resources/lost.pdf', err.getvalue())
+        resource.refresh_from_db()
+        self.portfolio.about.refresh_from_db()
+        self.assertTrue(storage.is_content_addressed(resource.file.name))
+        self.assertEqual(self.portfolio.about.resume_file.name, resource.file.name)
+        self.assertEqual(self.stored_files(), [resource.file.name])
+        self.assertEqual(resource.file.read(), b'same')
+
+
+class MediaGarbageCollectionTests(TestCase):
+    def setUp(self):
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        self.media = Path(media.name)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        portfolio = create_portfolio()
+        self.resource = Resource.objects.create(
+            portfolio=portfolio, title='Guide', description='Guide', file=SimpleUploadedFile('guide.pdf', b'guide'),
+        )
+        self.derivative = default_storage.save('derivatives/photo-320w.webp', ContentFile(b'webp'))
+        self.project = Project.objects.create(
+            portfolio=portfolio, title='Project', description='Project', image=SimpleUploadedFile('old.png', b'old'),
+        )
+        self.replaced = self.project.image.name
+        self.project.image = SimpleUploadedFile('new.png', b'new')
+        self.project.save()
+        Project.objects.filter(pk=self.project.pk).update(image_variants={
+            'source': self.project.image.name, 'formats': {'webp': {'320': self.derivative}},
+        })
+        self.legacy = FileSystemStorage().save('blog/deleted-post.png', ContentFile(b'legacy'))
+        self.age_files()
+
+    def age_files(self, hours=48):
+        past = time.time() - hours * 60 * 60
+        for path in self.media.rglob('*'):
+            if path.is_file():
+                os.utime(path, (past, past))
+
+    def gc(self, *args):
+        out = StringIO()
+        call_command('gc_media', '--workers', '4', *args, stdout=out)
+        return out.getvalue()
+
+    def test_orphans_are_deleted(self):
+        output = self.gc()
+        self.assertIn('Scanned 5 files', output)
+        self.assertIn('Removed 2 orphans (9 bytes)', output)
+        for name in (self.replaced, self.legacy):
+            self.assertFalse(default_storage.exists(name))
+        for name in (self.resource.file.name, self.project.image.name, self.derivative):
+            self.assertTrue(default_storage.exists(name))
+        # Emptied upload directories go too
+        self.assertFalse((self.media / 'blog').exists())
+
+    def test_dry_run_only_lists_orphans(self):
+        output = self.gc('--dry-run')
+        self.assertIn(self.legacy, output)
+        self.assertIn('Would remove 2 orphans', output)
+        self.assertTrue(default_storage.exists(self.legacy))
+
+    def test_quarantine(self):
+        quarantine = tempfile.TemporaryDirectory()
+        self.addCleanup(quarantine.cleanup)
+        self.gc('--quarantine', quarantine.name)
+        self.assertEqual((Path(quarantine.name) / self.legacy).read_bytes(), b'legacy')
+        self.assertFalse(default_storage.exists(self.legacy))
+        with self.assertRaises(CommandError):
+            self.gc('--quarantine', str(self.media / 'quarantine'))
+
+    def test_recent_and_just_referenced_files_are_kept(self):
+        self.age_files(hours=1)
+        self.assertIn('Removed 0 orphans', self.gc())
+        self.age_files()
+        # A row that refers to the file after the reference scan started
+        with mock.patch('portfolio.orphans.referenced_names', return_value=set()):
+            output = self.gc()
+        self.assertIn('Removed 2 orphans', output)
+        for name in (self.resource.file.name, self.project.image.name, self.derivative):
+            self.assertTrue(default_storage.exists(name))
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        counters.get_cache().clear()
+        # Hold off the request-path flush so tests control when it happens
+        counters.get_cache().set(counters.FLUSH_LOCK_KEY, 1, None)
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        self.post = BlogPost.objects.create(
+            portfolio=self.portfolio, title='Post', content='Body', status='published'
+        )
+        self.resource = Resource.objects.create(
+            portfolio=self.portfolio, title='Guide', description='Guide', file='resources/guide.pdf'
+        )
+
+    def test_concurrent_increments_are_not_lost(self):
+        def worker():
+            for _ in range(100):
+                counters.increment(BlogPost, 'views', self.post.pk)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(counters.pending(BlogPost, 'views', self.post.pk), 800)
+        with self.assertNumQueries(1):
+            # One batched UPDATE, no scan of the counted tables
+            self.assertEqual(counters.flush(), 800)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 800)
+        self.assertEqual(counters.pending(BlogPost, 'views', self.post.pk), 0)
+
+    def test_views_and_downloads_are_buffered(self):
+        url = reverse('portfolio-blog-detail', kwargs={'username': 'jane', 'pk': self.post.pk})
+        self.assertEqual(self.client.get(url).data['views'], 1)
+        self.assertEqual(self.client.get(url).data['views'], 2)
+        download = reverse('portfolio-resource-download', kwargs={'username': 'jane', 'pk': self.resource.pk})
+        self.client.post(download)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 0)
+
+        call_command('flush_counters', stdout=StringIO())
+        self.post.refresh_from_db()
+        self.resource.refresh_from_db()
+        self.assertEqual(self.post.views, 2)
+        self.assertEqual(self.resource.downloads, 1)
+        self.assertEqual(self.client.get(url).data['views'], 3)
+
+    @override_settings(COUNTER_BUFFERING=False)
+    def test_unbuffered_increment_writes_immediately(self):
+        counters.increment(BlogPost, 'views', self.post.pk)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+
+    def test_process_local_counts_are_flushed_after_the_request(self):
+        counters.get_cache().delete(counters.FLUSH_LOCK_KEY)
+        url = reverse('portfolio-blog-detail', kwargs={'username': 'jane', 'pk': self.post.pk})
+        self.assertEqual(self.client.get(url).data['views'], 1)
+
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+        self.assertEqual(counters.pending(BlogPost, 'views', self.post.pk), 0)
+        # Once per flush interval
+        self.client.get(url)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+        self.assertEqual(counters.pending(BlogPost, 'views', self.post.pk), 1)
+
+    @override_settings(CACHES={
+        **settings.CACHES, 'counters': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+    })
+    def test_dummy_cache_writes_immediately(self):
+        self.assertEqual(counters.increment(BlogPost, 'views', self.post.pk), 1)
+        self.assertEqual(counters.pending(BlogPost, 'views', self.post.pk), 0)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+
+    def test_flush_only_writes_rows_counted_since_the_last_flush(self):
+        counters.increment(BlogPost, 'views', self.post.pk)
+        counters.increment(Resource, 'downloads', self.resource.pk)
+        self.assertEqual(counters.flush(), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.flush(), 0)
+
+        counters.increment(BlogPost, 'views', self.post.pk, amount=3)
+        with self.assertNumQueries(1):
+            self.assertEqual(counters.flush(), 3)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 4)
+
+    def test_increments_during_a_flush_are_flushed_next_time(self):
+        counters.increment(BlogPost, 'views', self.post.pk)
+        get_many = counters.get_cache().get_many
+
+        def get_many_then_increment(keys):
+            found = get_many(keys)
+            if any(key.startswith('counters:portfolio.') for key in keys):
+                counters.increment(BlogPost, 'views', self.post.pk)
+            return found
+
+        with mock.patch.object(counters.get_cache(), 'get_many', side_effect=get_many_then_increment):
+            self.assertEqual(counters.flush(), 1)
+        self.assertEqual(counters.pending(BlogPost, 'views', self.post.pk), 1)
+        self.assertEqual(counters.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 2)
+
+    def test_counter_evicted_during_a_flush(self):
+        counters.increment(BlogPost, 'views', self.post.pk)
+        with mock.patch.object(counters.get_cache(), 'decr', side_effect=ValueError):
+            self.assertEqual(counters.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.views, 1)
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        posts = []
+        for i in range(25):
+            # Shared timestamps and unpublished (NULL) dates exercise the tie-breakers
+            published = None if i % 5 == 0 else datetime(2024, 1, 1 + i // 3, tzinfo=timezone.utc)
+            posts.append(BlogPost(
+                portfolio=self.portfolio, title=f'Post {i}', content='Body',
+                status='published', published_at=published,
+            ))
+        BlogPost.objects.bulk_create(posts)
+        self.url = reverse('portfolio-blog', kwargs={'username': 'jane'})
+
+    def walk(self, url, direction):
+        ids = []
+        while url:
+            data = self.client.get(url).json()
+            page = [post['id'] for post in data['results']]
+            ids = page + ids if direction == 'previous' else ids + page
+            url = data[direction]
+        return ids
+
+    def test_walks_every_post_once_in_meta_order(self):
+        expected = list(BlogPost.objects.filter(portfolio=self.portfolio).values_list('id', flat=True))
+        self.assertEqual(self.walk(self.url + '?cursor=', 'next'), expected)
+
+    def test_previous_links_walk_back(self):
+        data = self.client.get(self.url + '?cursor=').json()
+        self.assertIsNone(data['previous'])
+        while data['next']:
+            last = data
+            data = self.client.get(data['next']).json()
+        expected = list(BlogPost.objects.filter(portfolio=self.portfolio).values_list('id', flat=True))
+        self.assertEqual(self.walk(last['next'], 'previous')[:len(expected)], expected)
+
+    def test_page_number_pagination_is_still_the_default(self):
+        data = self.client.get(self.url).json()
+        self.assertEqual(data['count'], 25)
+
+    def test_keyset_page_does_not_count(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url + '?cursor=')
+        self.assertFalse([q for q in queries if 'COUNT(' in q['sql']])
+        page = [q['sql'] for q in queries if q['sql'].startswith('SELECT "portfolio_blogpost"."id"')]
+        self.assertIn('LIMIT 11', page[0])
+        self.assertNotIn('OFFSET', page[0])
+
+    def test_invalid_cursor_is_404(self):
+        self.assertEqual(self.client.get(self.url + '?cursor=bogus').status_code, 404)
+
+    def test_tampered_cursor_values_are_404(self):
+        next_page = urlsplit(self.client.get(self.url + '?cursor=').json()['next'])
+        token = json.loads(base64.urlsafe_b64decode(parse_qs(next_page.query)['cursor'][0]))
+        for i in range(len(token['p'])):
+            values = list(token['p'])
+            values[i] = 'not-a-value'
+            cursor = base64.urlsafe_b64encode(json.dumps({'p': values, 'r': 0}).encode()).decode()
+            self.assertEqual(self.client.get(self.url, {'cursor': cursor}).status_code, 404, values)
+
+
+class IndexUsageTests(TestCase):
+    """EXPLAIN the hot API/admin queries and check they hit the composite indexes"""
+
+    def setUp(self):
+        self.portfolio = create_portfolio()
+        populate_portfolio(self.portfolio, 3)
+
+    def assertUsesIndex(self, queryset, index):
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN output is checked against SQLite plans')
+        plan = queryset.explain()
+        self.assertIn(f'USING INDEX {index}', plan)
+        # The index order matches the ORDER BY, so no sort step is needed
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_blog_queries(self):
+        published = BlogPost.objects.filter(portfolio=self.portfolio, status='published')
+        self.assertUsesIndex(published, 'blogpost_portfolio_order_idx')
+        self.assertUsesIndex(published.filter(is_featured=True), 'blogpost_featured_idx')
+
+    def test_project_queries(self):
+        projects = Project.objects.filter(portfolio=self.portfolio)
+        self.assertUsesIndex(projects, 'project_portfolio_order_idx')
+        self.assertUsesIndex(projects.filter(is_featured=True), 'project_portfolio_order_idx')
+
+    def test_resource_queries(self):
+        self.assertUsesIndex(Resource.objects.filter(portfolio=self.portfolio), 'resource_portfolio_order_idx')
+
+    def test_section_prefetch_queries(self):
+        ids = [self.portfolio.pk]
+        self.assertUsesIndex(Skill.objects.filter(portfolio__in=ids), 'skill_portfolio_order_idx')
+        self.assertUsesIndex(Testimonial.objects.filter(portfolio__in=ids), 'testimonial_portfolio_idx')
+        self.assertUsesIndex(
+            Testimonial.objects.filter(portfolio=self.portfolio, is_featured=True),
+            'testimonial_portfolio_idx',
+        )
+
+    def test_inbox_queries(self):
+        self.assertUsesIndex(
+            Newsletter.objects.filter(portfolio=self.portfolio, is_active=True), 'newsletter_active_idx'
+        )
+        messages = ContactMessage.objects.filter(portfolio=self.portfolio)
+        self.assertUsesIndex(messages, 'contact_portfolio_idx')
+        self.assertUsesIndex(messages.filter(is_read=False), 'contact_unread_idx')
+
+
+class NormalizedNameTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+
+    def test_tags_follow_the_source_string(self):
+        post = BlogPost.objects.create(
+            portfolio=self.portfolio, title='Post', content='Body', status='published',
+            tags='Django, REST , Python,',
+        )
+        self.assertEqual([link.name for link in post.tag_links.all()], ['Django', 'REST', 'Python'])
+
+        post.tags = 'Python, Django'
+        post.save()
+        self.assertEqual([link.name for link in post.tag_links.all()], ['Python', 'Django'])
+        self.assertEqual(Tag.objects.count(), 3)
+        self.assertEqual(Tag.objects.get(name='REST').slug, 'rest')
+
+    def test_counter_saves_skip_the_sync(self):
+        post = BlogPost.objects.create(portfolio=self.portfolio, title='Post', content='Body', tags='a')
+        with self.assertNumQueries(1):
+            post.save(update_fields=['views'])
+
+    def test_lists_are_rendered_from_prefetched_links(self):
+        for i in range(5):
+            Project.objects.create(
+                portfolio=self.portfolio, title=f'Project {i}', description='Description',
+                technologies='Python, Django, React',
+            )
+        url = reverse('portfolio-projects', kwargs={'username': 'jane'})
+        response = self.client.get(url)
+        self.assertEqual(response.data['results'][0]['technologies_list'], ['Python', 'Django', 'React'])
+        self.assertNotIn('technology_set', response.data['results'][0])
+        self.assertEqual(Technology.objects.count(), 3)
+
+
+class FacetTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        self.django = BlogPost.objects.create(
+            portfolio=self.portfolio, title='Django tips', content='Body', status='published',
+            tags='Django, Python',
+        )
+        self.draft = BlogPost.objects.create(
+            portfolio=self.portfolio, title='Draft', content='Body', tags='Python, Rust',
+        )
+        self.project = Project.objects.create(
+            portfolio=self.portfolio, title='API', description='API', technologies='Django, Postgres',
+        )
+        self.url = reverse('portfolio-facets', kwargs={'username': 'jane'})
+
+    def facets(self):
+        return self.client.get(self.url).json()
+
+    def test_counts_only_published_posts(self):
+        self.assertEqual(self.facets(), {
+            'tags': {'Django': 1, 'Python': 1},
+            'technologies': {'Django': 1, 'Postgres': 1},
+        })
+
+    def test_counts_follow_saves_and_deletes(self):
+        self.draft.status = 'published'
+        self.draft.save()
+        self.assertEqual(self.facets()['tags'], {'Python': 2, 'Django': 1, 'Rust': 1})
+
+        self.django.tags = 'Python'
+        self.django.save()
+        self.assertEqual(self.facets()['tags'], {'Python': 2, 'Rust': 1})
+
+        self.draft.delete()
+        self.project.delete()
+        self.assertEqual(self.facets(), {'tags': {'Python': 1}, 'technologies': {}})
+
+    def test_facets_read_only_the_count_tables(self):
+        # Validators, portfolio lookup, tag counts, technology counts
+        with self.assertNumQueries(4):
+            self.facets()
+
+    def test_tag_and_tech_filters(self):
+        blog = reverse('portfolio-blog', kwargs={'username': 'jane'})
+        self.assertEqual([p['title'] for p in self.client.get(blog, {'tag': 'python'}).json()['results']], ['Django tips'])
+        self.assertEqual(self.client.get(blog, {'tag': 'Rust'}).json()['count'], 0)
+
+        projects = reverse('portfolio-projects', kwargs={'username': 'jane'})
+        self.assertEqual(self.client.get(projects, {'tech': 'Postgres'}).json()['count'], 1)
+        self.assertEqual(self.client.get(projects, {'tech': 'react'}).json()['count'], 0)
+
+    def test_similar_names_do_not_collide(self):
+        for technologies in ('C', 'C++', 'C#'):
+            Project.objects.create(
+                portfolio=self.portfolio, title=technologies, description='Lang', technologies=technologies,
+            )
+        projects = reverse('portfolio-projects', kwargs={'username': 'jane'})
+        for value, title in (('C', 'C'), ('C++', 'C++'), ('cpp', 'C++'), ('c#', 'C#'), ('csharp', 'C#')):
+            response = self.client.get(projects, {'tech': value}).json()
+            self.assertEqual([p['title'] for p in response['results']], [title], value)
+
+    def test_spellings_share_one_tag(self):
+        BlogPost.objects.create(
+            portfolio=self.portfolio, title='Typing', content='Body', status='published', tags='python, PYTHON',
+        )
+        self.assertEqual(Tag.objects.filter(slug='python').count(), 1)
+        self.assertEqual(self.facets()['tags'], {'Python': 2, 'Django': 1})
+        blog = reverse('portfolio-blog', kwargs={'username': 'jane'})
+        self.assertEqual(self.client.get(blog, {'tag': 'PyThOn'}).json()['count'], 2)
+        post = BlogPost.objects.get(title='Typing')
+        self.assertEqual([link.name for link in post.tag_links.all()], ['python', 'PYTHON'])
+
+    def test_spellings_do_not_leak_between_portfolios(self):
+        other = create_portfolio('john')
+        BlogPost.objects.create(
+            portfolio=other, title='JS', content='Body', status='published', tags='javascript, Node.js',
+        )
+        post = BlogPost.objects.create(
+            portfolio=self.portfolio, title='Node', content='Body', status='published', tags='JavaScript, Node.js',
+        )
+        self.assertEqual(Tag.objects.filter(slug='javascript').count(), 1)
+        detail = reverse('portfolio-blog-detail', kwargs={'username': 'jane', 'pk': post.pk})
+        self.assertEqual(self.client.get(detail).json()['tags_list'], ['JavaScript', 'Node.js'])
+        self.assertEqual(self.facets()['tags'], {'Django': 1, 'JavaScript': 1, 'Node.js': 1, 'Python': 1})
+        john = reverse('portfolio-facets', kwargs={'username': 'john'})
+        self.assertEqual(self.client.get(john).json()['tags'], {'Node.js': 1, 'javascript': 1})
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        self.post = BlogPost.objects.create(
+            portfolio=self.portfolio, title='Caching with Redis', excerpt='Fast reads',
+            content='Notes on Django caching and invalidation', tags='Django', status='published',
+        )
+        self.body_only = BlogPost.objects.create(
+            portfolio=self.portfolio, title='Weekly notes', content='Redis came up again',
+            status='published',
+        )
+        self.draft = BlogPost.objects.create(
+            portfolio=self.portfolio, title='Redis internals', content='Unfinished',
+        )
+        self.project = Project.objects.create(
+            portfolio=self.portfolio, title='Shop', description='Storefront',
+            technologies='Django, Postgres',
+        )
+        self.url = reverse('portfolio-search', kwargs={'username': 'jane'})
+
+    def search(self, query):
+        return [(r['type'], r['id']) for r in search.search(self.portfolio.username, self.portfolio.pk, query)]
+
+    def term_counts(self):
+        return dict(SearchTerm.objects.filter(documents__gt=0).values_list('term', 'documents'))
+
+    def test_ranks_title_matches_first_and_skips_drafts(self):
+        self.assertEqual(
+            self.search('redis'), [('blog_post', self.post.pk), ('blog_post', self.body_only.pk)]
+        )
+        self.assertEqual(self.search('unfinished'), [])
+
+    def test_case_study_text_finds_the_project(self):
+        self.assertEqual(self.search('checkout'), [])
+        case_study = CaseStudy.objects.create(project=self.project, challenge='Slow checkout', solution='Caching')
+        self.assertEqual(self.search('checkout'), [('project', self.project.pk)])
+        case_study.delete()
+        self.assertEqual(self.search('checkout'), [])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.post.content = 'Memcached instead'
+        self.post.save()
+        self.assertEqual(self.search('memcached'), [('blog_post', self.post.pk)])
+        self.assertEqual(self.search('invalidation'), [])
+
+        self.draft.status = 'published'
+        self.draft.save()
+        self.assertIn(('blog_post', self.draft.pk), self.search('unfinished'))
+
+        self.body_only.delete()
+        self.project.delete()
+        self.assertEqual(self.search('weekly storefront'), [])
+
+        # Incremental document frequencies match a rebuild from scratch
+        counts = self.term_counts()
+        search.rebuild()
+        self.assertEqual(counts, self.term_counts())
+
+    def test_counter_saves_do_not_reindex(self):
+        post = BlogPost.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(1):
+            post.save(update_fields=['views'])
+
+    def test_common_terms_are_cut_off_but_still_ranked(self):
+        for i in range(5):
+            BlogPost.objects.create(
+                portfolio=self.portfolio, title=f'Django {i}', content='Django', status='published',
+            )
+        exact = self.search('django caching')
+        with mock.patch.object(search, 'CANDIDATES_PER_TERM', 2):
+            self.assertEqual(self.search('django caching')[:2], exact[:2])
+
+    def test_endpoint(self):
+        response = self.client.get(self.url, {'q': 'Redis'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['query'], 'Redis')
+        self.assertEqual(
+            [(r['type'], r['id'], r['slug']) for r in response.json()['results']],
+            [('blog_post', self.post.pk, 'caching-with-redis'), ('blog_post', self.body_only.pk, 'weekly-notes')],
+        )
+        self.assertEqual(len(self.client.get(self.url, {'q': 'redis', 'limit': 1}).json()['results']), 1)
+        self.assertEqual(self.client.get(self.url).json()['results'], [])
+        self.assertEqual(self.client.get(reverse('portfolio-search', kwargs={'username': 'nobody'})).status_code, 404)
+
+    def test_endpoint_resolves_the_portfolio_through_the_resolver(self):
+        resolver.resolve('jane')
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url, {'q': 'redis'}).status_code, 200)
+        # Only the content-state query for the ETag reads the portfolio row
+        self.assertEqual(len([query for query in queries if 'FROM "portfolio_portfolio"' in query['sql']]), 1)
+        self.portfolio.is_active = False
+        self.portfolio.save()
+        self.assertEqual(self.client.get(self.url, {'q': 'django'}).status_code, 404)
+
+
+def image_upload(name='photo.png', size=(1000, 500), mode='RGB'):
+    buffer = BytesIO()
+    Image.new(mode, size, 'red').save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+
+@override_settings(
+    JOBS_EAGER=True, IMAGE_DERIVATIVE_WIDTHS=[320, 640, 1280], IMAGE_DERIVATIVE_FORMATS=['webp']
+)
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        settings_override = override_settings(MEDIA_ROOT=media.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+
+    def create_project(self, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Project.objects.create(
+                portfolio=self.portfolio, title='Shop', description='Shop', technologies='Django', **kwargs
+            )
+
+    def test_derivatives_are_bounded_and_never_upscaled(self):
+        project = self.create_project(image=image_upload())
+        project.refresh_from_db()
+        sizes = project.image_variants['formats']['webp']
+        self.assertEqual(sorted(sizes, key=int), ['320', '640', '1000'])
+        self.assertEqual(project.image_variants['source'], project.image.name)
+        with default_storage.open(sizes['320']) as file:
+            self.assertEqual(Image.open(file).size, (320, 160))
+
+    def test_thumbnail_is_generated_from_the_image(self):
+        project = self.create_project(image=image_upload())
+        project.refresh_from_db()
+        self.assertRegex(project.thumbnail.name, r'^cas/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.jpg$')
+        self.assertEqual(project.thumbnail.width, images.THUMBNAIL_WIDTH)
+        self.assertEqual(sorted(project.thumbnail_variants['formats']['webp'], key=int), ['320', '480'])
+
+    def test_serializers_expose_srcsets_for_the_current_image(self):
+        url = reverse('portfolio-projects', kwargs={'username': 'jane'})
+        project = self.create_project(image=image_upload())
+        srcset = self.client.get(url).json()['results'][0]['image_srcset']['webp']
+        self.assertRegex(srcset, r'^http://testserver/media/cas/[0-9a-f/]{6}[0-9a-f]{64}\.webp 320w, ')
+
+        # A new upload hides the old derivatives until its own are ready
+        project.image = image_upload('other.png', size=(900, 500))
+        project.save()
+        self.assertEqual(self.client.get(url).json()['results'][0]['image_srcset'], {})
+
+    def test_an_image_changed_back_is_processed_again(self):
+        url = reverse('portfolio-projects', kwargs={'username': 'jane'})
+        project = self.create_project(image=image_upload())
+        first = Project.objects.get(pk=project.pk).image.name
+        for upload in (image_upload('other.png', size=(900, 500)), image_upload()):
+            with self.captureOnCommitCallbacks(execute=True):
+                project.image = upload
+                project.save()
+        project.refresh_from_db()
+        self.assertEqual(project.image.name, first)
+        self.assertEqual(project.image_variants['source'], first)
+        self.assertNotEqual(self.client.get(url).json()['results'][0]['image_srcset'], {})
+
+    def test_clearing_the_image_clears_the_variants(self):
+        project = self.create_project(image=image_upload())
+        project.refresh_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            project.image = None
+            project.save()
+        project.refresh_from_db()
+        self.assertEqual(project.image_variants, {})
+
+    def test_transparent_images_and_other_models(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.portfolio.profile_image = image_upload(size=(200, 200), mode='RGBA')
+            self.portfolio.save()
+        self.portfolio.refresh_from_db()
+        self.assertEqual(list(self.portfolio.profile_image_variants['formats']['webp']), ['200'])
+
+    def test_saves_without_a_new_image_do_not_reprocess(self):
+        project = self.create_project(image=image_upload())
+        project.refresh_from_db()
+        with mock.patch.object(images, 'schedule') as schedule:
+            project.title = 'Renamed'
+            project.save()
+        schedule.assert_not_called()
+
+
+JOB_CALLS = []
+
+
+def record_job(value):
+    JOB_CALLS.append(value)
+
+
+def failing_job():
+    raise ValueError('boom')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        JOB_CALLS.clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio(name='Jane Doe')
+        self.portfolio.user.email = 'jane@example.com'
+        self.portfolio.user.save()
+
+    def test_jobs_run_once_per_idempotency_key(self):
+        first = jobs.enqueue(record_job, value=1, key='once')
+        self.assertEqual(jobs.enqueue(record_job, value=2, key='once'), first)
+        jobs.enqueue(record_job, value=3)
+        self.assertEqual(jobs.run_pending(), 2)
+        self.assertEqual(sorted(JOB_CALLS), [1, 3])
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {'done'})
+        self.assertEqual(jobs.run_pending(), 0)
+
+    def test_jobs_roll_back_with_the_transaction(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            jobs.enqueue(record_job, value=1)
+            raise RuntimeError
+        self.assertFalse(Job.objects.exists())
+
+    def test_failures_back_off_then_fail(self):
+        job = jobs.enqueue(failing_job, max_attempts=2)
+        with self.assertLogs('portfolio.jobs', 'WARNING'):
+            self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('ValueError: boom', job.last_error)
+        # Not due again until the backoff has passed
+        self.assertEqual(jobs.run_pending(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_at=job.created_at)
+        with self.assertLogs('portfolio.jobs', 'ERROR'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_a_job_is_claimed_by_one_worker(self):
+        job = jobs.enqueue(record_job, value=1)
+        self.assertEqual(jobs.claim('a'), job.pk)
+        self.assertIsNone(jobs.claim('b'))
+
+        # A worker that died mid-run releases the job after JOB_TIMEOUT
+        with override_settings(JOB_TIMEOUT=0):
+            self.assertEqual(jobs.requeue_stale(), 1)
+        self.assertEqual(jobs.claim('b'), job.pk)
+
+    def test_worker_purges_old_finished_jobs(self):
+        old, recent = jobs.enqueue(record_job, value=1, key='old'), jobs.enqueue(record_job, value=2, key='recent')
+        broken = jobs.enqueue(failing_job, max_attempts=1)
+        with self.assertLogs('portfolio.jobs', 'ERROR'):
+            jobs.run_pending()
+        Job.objects.filter(pk__in=[old.pk, broken.pk]).update(updated_at=datetime.now(timezone.utc) - timedelta(days=8))
+
+        call_command('runworker', '--once', stdout=StringIO())
+        self.assertEqual(set(Job.objects.values_list('pk', flat=True)), {recent.pk, broken.pk})
+        # The key is free again once its job is purged
+        self.assertNotEqual(jobs.enqueue(record_job, value=3, key='old').pk, old.pk)
+
+    def test_contact_notification_is_sent_by_the_worker(self):
+        url = reverse('portfolio-contact', kwargs={'username': 'jane'})
+        data = {'name': 'Bob', 'email': 'bob@example.com', 'subject': 'Hi', 'message': 'Hello'}
+        self.assertEqual(self.client.post(url, data).status_code, 201)
+        self.assertEqual(mail.outbox, [])
+
+        call_command('runworker', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['jane@example.com'])
+        self.assertEqual(mail.outbox[0].subject, '[Jane Doe] Hi')
+
+    def test_newsletter_confirmation_is_queued_once(self):
+        url = reverse('portfolio-newsletter-subscribe', kwargs={'username': 'jane'})
+        self.client.post(url, {'email': 'reader@example.com'})
+        self.client.post(url, {'email': 'reader@example.com'})
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(mail.outbox[0].to, ['reader@example.com'])
+
+
+class WriteThrottleTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        create_portfolio()
+        create_portfolio('john')
+        self.url = reverse('portfolio-contact', kwargs={'username': 'jane'})
+        self.data = {'name': 'Bob', 'email': 'bob@example.com', 'message': 'Hello'}
+
+    @override_settings(WRITE_RATE_LIMITS={'contact': (3, 1)})
+    def test_bursts_are_limited_per_client_and_portfolio(self):
+        for _ in range(3):
+            self.assertEqual(self.client.post(self.url, self.data).status_code, 201)
+        with self.assertNumQueries(0):
+            response = self.client.post(self.url, self.data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+
+        other_portfolio = reverse('portfolio-contact', kwargs={'username': 'john'})
+        self.assertEqual(self.client.post(other_portfolio, self.data).status_code, 201)
+        self.assertEqual(self.client.post(self.url, self.data, REMOTE_ADDR='10.0.0.2').status_code, 201)
+        self.assertEqual(ContactMessage.objects.count(), 5)
+
+    @override_settings(WRITE_RATE_LIMITS={'contact': (3, 1)})
+    def test_spoofed_forwarded_for_shares_the_bucket(self):
+        # The proxy appends the real address to whatever the client sent
+        statuses = [
+            self.client.post(self.url, self.data, HTTP_X_FORWARDED_FOR=f'10.1.0.{i}, 203.0.113.7').status_code
+            for i in range(5)
+        ]
+        self.assertEqual(statuses, [201, 201, 201, 429, 429])
+        self.assertEqual(
+            self.client.post(self.url, self.data, HTTP_X_FORWARDED_FOR='10.1.0.9, 203.0.113.8').status_code, 201
+        )
+
+        cache.get_cache().clear()
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': None}):
+            # Not behind a proxy: the header is ignored altogether
+            statuses = [
+                self.client.post(self.url, self.data, HTTP_X_FORWARDED_FOR=f'10.2.0.{i}').status_code
+                for i in range(5)
+            ]
+        self.assertEqual(statuses, [201, 201, 201, 429, 429])
+
+    @override_settings(WRITE_RATE_LIMITS={'contact': (2, 6)})
+    def test_tokens_refill_over_time(self):
+        with mock.patch('portfolio.throttling.time.time', return_value=1000.0):
+            self.client.post(self.url, self.data)
+            self.client.post(self.url, self.data)
+            self.assertEqual(self.client.post(self.url, self.data).status_code, 429)
+        with mock.patch('portfolio.throttling.time.time', return_value=1010.0):
+            self.assertEqual(self.client.post(self.url, self.data).status_code, 201)
+            self.assertEqual(self.client.post(self.url, self.data).status_code, 429)
+
+
+@override_settings(WRITE_COALESCING=True, WRITE_RATE_LIMITS={})
+class WriteCoalescingTests(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.portfolio = create_portfolio()
+        self.portfolio.user.email = 'jane@example.com'
+        self.portfolio.user.save()
+
+    def test_contact_messages_are_inserted_by_the_flush(self):
+        url = reverse('portfolio-contact', kwargs={'username': 'jane'})
+        for i in range(3):
+            response = self.client.post(url, {'name': f'Reader {i}', 'email': 'r@example.com', 'message': 'Hi'})
+            self.assertEqual(response.status_code, 202)
+        self.assertFalse(ContactMessage.objects.exists())
+        # One delayed flush for the whole burst
+        self.assertEqual(Job.objects.filter(func='portfolio.coalescing.flush').count(), 1)
+
+        self.assertEqual(coalescing.flush(), 3)
+        self.assertEqual(
+            sorted(ContactMessage.objects.values_list('name', flat=True)), ['Reader 0', 'Reader 1', 'Reader 2']
+        )
+        self.assertEqual(coalescing.flush(), 0)
+        jobs.run_pending()
+        self.assertEqual(len(mail.outbox), 3)
+
+    def test_subscriptions_are_merged_with_existing_subscribers(self):
+        Newsletter.objects.create(portfolio=self.portfolio, email='old@example.com', is_active=False)
+        Newsletter.objects.create(portfolio=self.portfolio, email='active@example.com')
+        url = reverse('portfolio-newsletter-subscribe', kwargs={'username': 'jane'})
+        for email in ('new@example.com', 'new@example.com', 'old@example.com', 'active@example.com'):
+            self.assertEqual(self.client.post(url, {'email': email}).status_code, 202)
+
+        self.assertEqual(coalescing.flush(), 4)
+        self.assertEqual(Newsletter.objects.filter(portfolio=self.portfolio, is_active=True).count(), 3)
+        jobs.run_pending()
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), ['new@example.com', 'old@example.com'])
+
+    def test_a_slot_given_up_by_the_flush_is_written_directly(self):
+        store = cache.get_cache()
+        store.set(coalescing.SEQUENCE_KEY, 1, None)
+        # Slot 1 was taken but not filled yet when the flush ran
+        self.assertEqual(coalescing.flush(), 0)
+        store.set(coalescing.SEQUENCE_KEY, 0, None)
+        self.assertFalse(coalescing.buffer('contact', portfolio_id=self.portfolio.pk, message='Hi'))
@@ -0,0 +1,72 @@
+"""
+Token-bucket rate limits for the anonymous write endpoints.
+
+Each (scope, client IP, portfolio) gets a bucket of `burst` tokens in the
+portfolio cache, refilled at `per_minute` tokens a minute. A request takes
+one token or is answered 429 with a Retry-After header. Unlike DRF's
+SimpleRateThrottle, which keeps a list of request timestamps, a bucket is
+two numbers, so a flood costs one small cache read and write per request
+and never reaches the database. The read-modify-write is not atomic:
+concurrent requests from one client can get a token more than the burst,
+which is fine for turning away spam.
+
+Clients are told apart by REMOTE_ADDR, or with DRF's NUM_PROXIES set, by
+the X-Forwarded-For entry that the last of those proxies added.
+"""
+import math
+import time
+
+from django.conf import settings
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from .cache import get_cache
+
+# scope -> (burst, tokens per minute)
+DEFAULT_RATES = {
+    'contact': (5, 1),
+    'newsletter': (5, 2),
+}
+
+
+def get_rates():
+    return getattr(settings, 'WRITE_RATE_LIMITS', DEFAULT_RATES)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Limits a view's `throttle_scope` per client IP and portfolio"""
+    wait_seconds = None
+
+    def get_ident(self, request):
+        # Without NUM_PROXIES, DRF would use X-Forwarded-For as sent by the
+        # client, who could then pick a fresh bucket for every request
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get('REMOTE_ADDR', '')
+        return super().get_ident(request)
+
+    def get_cache_key(self, request, view, scope):
+        # Idents taken from X-Forwarded-For may hold spaces, which memcached rejects
+        ident = ''.join(self.get_ident(request).split())
+        return f'throttle:{scope}:{ident}:{view.kwargs.get("username", "")}'
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        rate = get_rates().get(scope)
+        if rate is None:
+            return True
+        burst, per_minute = rate
+        refill = per_minute / 60
+        cache = get_cache()
+        key = self.get_cache_key(request, view, scope)
+        now = time.time()
+        tokens, updated = cache.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * refill)
+        if tokens < 1:
+            self.wait_seconds = (1 - tokens) / refill
+            return False
+        # Expires once the bucket would be full again anyway
+        cache.set(key, (tokens - 1, now), math.ceil(burst / refill))
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -2,8 +2,10 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import (
     PortfolioViewSet, ProjectViewSet, BlogPostViewSet,
-    ResourceViewSet, NewsletterSubscribeView, ContactMessageView
+    ResourceViewSet, FacetViewSet, SearchViewSet,
+    ResumeView, NewsletterSubscribeView, NewsletterExportView, ContactMessageView
 )
+from .bundle import BundleViewSet
 
 # Create a router for the portfolio viewset
 router = DefaultRouter()
@@ -25,8 +27,17 @@ urlpatterns = [
     
     path('api/<str:username>/resources/', ResourceViewSet.as_view({'get': 'list'}), name='portfolio-resources'),
     path('api/<str:username>/resources/<int:pk>/', ResourceViewSet.as_view({'get': 'retrieve'}), name='portfolio-resource-detail'),
-    path('api/<str:username>/resources/<int:pk>/download/', ResourceViewSet.as_view({'post': 'download'}), name='portfolio-resource-download'),
+    path('api/<str:username>/resources/<int:pk>/download/', ResourceViewSet.as_view({'get': 'download', 'post': 'download'}), name='portfolio-resource-download'),
+    path('api/<str:username>/resume/', ResumeView.as_view(), name='portfolio-resume'),
+    
+    path('api/<str:username>/facets/', FacetViewSet.as_view({'get': 'list'}), name='portfolio-facets'),
+    path('api/<str:username>/search/', SearchViewSet.as_view({'get': 'list'}), name='portfolio-search'),
+    path('api/<str:username>/bundle/', BundleViewSet.as_view({'get': 'list'}), name='portfolio-bundle'),
     
     path('api/<str:username>/newsletter/subscribe/', NewsletterSubscribeView.as_view(), name='portfolio-newsletter-subscribe'),
+    path(
+        'api/<str:username>/newsletter/subscribers.<str:fmt>', NewsletterExportView.as_view(),
+        name='portfolio-newsletter-export',
+    ),
     path('api/<str:username>/contact/', ContactMessageView.as_view(), name='portfolio-contact'),
 ]
@@ -1,11 +1,21 @@
-from rest_framework import viewsets, generics, status
+from rest_framework import viewsets, generics, permissions, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.response import Response
+from rest_framework.views import APIView
+from django.db.models import Exists, OuterRef, Prefetch
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from . import cache, coalescing, counters, delivery, jobs, notifications, search, subscribers
+from .cache import CachedResponseMixin
+from .conditional import ConditionalGetMixin, aggregate_content_state, portfolio_content_state
+from .pagination import OptionalKeysetPaginationMixin
+from .throttling import TokenBucketThrottle
+from .resolver import PortfolioLookupMixin
 from .models import (
     Portfolio, About, Skill, Project, CaseStudy, Service,
     Testimonial, Achievement, BlogPost, Resource, Newsletter,
-    ContactMessage, Hobby
+    ContactMessage, Hobby, BlogPostTag, ProjectTechnology, TagFacet, TechnologyFacet, name_slug
 )
 from .serializers import (
     PortfolioSerializer, PortfolioSummarySerializer, AboutSerializer,
@@ -16,7 +26,66 @@ from .serializers import (
 )
 
 
-class PortfolioViewSet(viewsets.ReadOnlyModelViewSet):
+# Ordered name links rendered by the *_list serializer fields
+TECHNOLOGY_LINKS = Prefetch('technology_links', queryset=ProjectTechnology.objects.all())
+TAG_LINKS = Prefetch('tag_links', queryset=BlogPostTag.objects.all())
+
+
+def project_queryset(expand=None):
+    """
+    Projects with everything ProjectSerializer renders. `expand` limits the
+    nested relations to the named ones (see PortfolioSerializer.expandable).
+    """
+    queryset = Project.objects.prefetch_related(TECHNOLOGY_LINKS)
+    if expand is None or 'case_study' in expand:
+        queryset = queryset.select_related('case_study')
+    if expand is None or 'testimonials' in expand:
+        # Reverse FK prefetch fills testimonial.project from the parent row
+        queryset = queryset.prefetch_related(Prefetch('testimonials', queryset=Testimonial.objects.all()))
+    return queryset
+
+
+def blog_post_queryset():
+    """Blog posts with the tags the serializers render"""
+    return BlogPost.objects.prefetch_related(TAG_LINKS)
+
+
+def filter_by_name(queryset, link_model, value):
+    """
+    Keep rows linked to the one tag/technology whose slug matches `value`
+    (either the slug itself or any spelling of the name).
+    """
+    if not value:
+        return queryset
+    links = link_model.objects.filter(**{
+        link_model.owner_field: OuterRef('pk'),
+        f'{link_model.name_field}__slug': name_slug(value),
+    })
+    return queryset.filter(Exists(links))
+
+
+def portfolio_detail_prefetches(prefix='', sections=None, expand=None):
+    """
+    Prefetch plan that follows the PortfolioSerializer tree.
+    Pass a prefix (e.g. 'portfolio__') to apply it through a relation, and
+    `sections`/`expand` to plan only for a pruned serializer.
+    """
+    plan = {
+        'skills': Skill.objects.all,
+        'projects': lambda: project_queryset(None if expand is None else expand.get('projects', ())),
+        'services': Service.objects.all,
+        'testimonials': lambda: Testimonial.objects.select_related('project'),
+        'achievements': Achievement.objects.all,
+        'hobbies': Hobby.objects.all,
+    }
+    return [
+        Prefetch(f'{prefix}{name}', queryset=queryset())
+        for name, queryset in plan.items()
+        if sections is None or name in sections
+    ]
+
+
+class PortfolioViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for portfolios
     Retrieve a portfolio by username
@@ -25,41 +94,114 @@ class PortfolioViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = PortfolioSerializer
     lookup_field = 'username'
     
+    def get_sparse_fields(self):
+        """
+        Parse ?fields= and ?expand= into (fields, {section: nested}); either
+        is None when the parameter is absent, meaning "everything"
+        """
+        if not hasattr(self, '_sparse_fields'):
+            fields = self._parse_list('fields')
+            expand = self._parse_list('expand')
+            errors = {}
+            if fields is not None:
+                unknown = set(fields) - set(PortfolioSerializer.Meta.fields)
+                if unknown:
+                    errors['fields'] = [f'Unknown field: {name}' for name in sorted(unknown)]
+            if expand is not None:
+                nested = {}
+                for path in expand:
+                    section, _, name = path.partition('.')
+                    if name not in PortfolioSerializer.expandable.get(section, ()):
+                        errors.setdefault('expand', []).append(f'Cannot expand: {path}')
+                    nested.setdefault(section, set()).add(name)
+                expand = nested
+            elif fields is not None:
+                # A sparse request only gets the nested objects it asks for
+                expand = {}
+            if errors:
+                raise ValidationError(errors)
+            self._sparse_fields = fields, expand
+        return self._sparse_fields
+    
+    def _parse_list(self, param):
+        if param not in self.request.query_params:
+            return None
+        value = self.request.query_params[param]
+        return [name.strip() for name in value.split(',') if name.strip()]
+    
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            return queryset
+        fields, expand = self.get_sparse_fields()
+        if fields is None or 'about' in fields:
+            queryset = queryset.select_related('about')
+        return queryset.prefetch_related(*portfolio_detail_prefetches(sections=fields, expand=expand))
+    
+    def get_serializer(self, *args, **kwargs):
+        if self.action == 'retrieve':
+            kwargs['fields'], kwargs['expand'] = self.get_sparse_fields()
+        return super().get_serializer(*args, **kwargs)
+    
+    def get_content_state(self):
+        if 'username' in self.kwargs:
+            return portfolio_content_state(self.kwargs['username'])
+        return cache.memoize(cache.GLOBAL_NAMESPACE, 'content-state', lambda: aggregate_content_state(
+            Portfolio.objects.filter(is_active=True), 'updated_at'
+        ))
+    
     def get_serializer_class(self):
         if self.action == 'list':
             return PortfolioSummarySerializer
         return PortfolioSerializer
 
 
-class ProjectViewSet(viewsets.ReadOnlyModelViewSet):
+class ProjectViewSet(PortfolioLookupMixin, OptionalKeysetPaginationMixin, ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for projects within a portfolio
     """
     serializer_class = ProjectSerializer
+    cached_actions = ('list', 'retrieve', 'featured')
+    conditional_actions = ('list', 'retrieve', 'featured')
+    
+    def get_content_state(self):
+        return portfolio_content_state(self.kwargs['username'])
     
     def get_queryset(self):
-        username = self.kwargs.get('username')
-        portfolio = get_object_or_404(Portfolio, username=username, is_active=True)
-        return Project.objects.filter(portfolio=portfolio)
+        return self.get_portfolio_queryset(self.get_portfolio_id())
+    
+    def get_portfolio_queryset(self, portfolio_id):
+        projects = project_queryset().filter(portfolio_id=portfolio_id)
+        return filter_by_name(projects, ProjectTechnology, self.request.query_params.get('tech'))
     
     @action(detail=False, methods=['get'])
     def featured(self, request, username=None):
         """Get featured projects"""
-        portfolio = get_object_or_404(Portfolio, username=username, is_active=True)
-        projects = Project.objects.filter(portfolio=portfolio, is_featured=True)
+        projects = filter_by_name(
+            project_queryset().filter(portfolio_id=self.get_portfolio_id(), is_featured=True),
+            ProjectTechnology, request.query_params.get('tech'),
+        )
         serializer = self.get_serializer(projects, many=True)
         return Response(serializer.data)
 
 
-class BlogPostViewSet(viewsets.ReadOnlyModelViewSet):
+class BlogPostViewSet(PortfolioLookupMixin, OptionalKeysetPaginationMixin, ConditionalGetMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for blog posts within a portfolio
     """
+    # retrieve counts views, so it always runs
+    cached_actions = ('list', 'featured')
+    conditional_actions = ('list', 'featured')
+    
+    def get_content_state(self):
+        return portfolio_content_state(self.kwargs['username'])
     
     def get_queryset(self):
-        username = self.kwargs.get('username')
-        portfolio = get_object_or_404(Portfolio, username=username, is_active=True)
-        return BlogPost.objects.filter(portfolio=portfolio, status='published')
+        return self.get_portfolio_queryset(self.get_portfolio_id())
+    
+    def get_portfolio_queryset(self, portfolio_id):
+        posts = blog_post_queryset().filter(portfolio_id=portfolio_id, status='published')
+        return filter_by_name(posts, BlogPostTag, self.request.query_params.get('tag'))
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -68,63 +210,149 @@ class BlogPostViewSet(viewsets.ReadOnlyModelViewSet):
     
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        # Increment view count
-        instance.views += 1
-        instance.save(update_fields=['views'])
+        # Count the view; the write is buffered and flushed in batches
+        instance.views += counters.increment(BlogPost, 'views', instance.pk)
         serializer = self.get_serializer(instance)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
     def featured(self, request, username=None):
         """Get featured blog posts"""
-        portfolio = get_object_or_404(Portfolio, username=username, is_active=True)
-        posts = BlogPost.objects.filter(portfolio=portfolio, status='published', is_featured=True)
+        posts = filter_by_name(
+            blog_post_queryset().filter(portfolio_id=self.get_portfolio_id(), status='published', is_featured=True),
+            BlogPostTag, request.query_params.get('tag'),
+        )
         serializer = self.get_serializer(posts, many=True)
         return Response(serializer.data)
 
 
-class ResourceViewSet(viewsets.ReadOnlyModelViewSet):
+class ResourceViewSet(PortfolioLookupMixin, OptionalKeysetPaginationMixin, CachedResponseMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for downloadable resources
     """
     serializer_class = ResourceSerializer
     
     def get_queryset(self):
-        username = self.kwargs.get('username')
-        portfolio = get_object_or_404(Portfolio, username=username, is_active=True)
-        return Resource.objects.filter(portfolio=portfolio)
+        return Resource.objects.filter(portfolio_id=self.get_portfolio_id())
     
-    @action(detail=True, methods=['post'])
+    def perform_content_negotiation(self, request, force=False):
+        # Downloads are files whatever the client accepts
+        return super().perform_content_negotiation(request, force=force or self.action == 'download')
+    
+    @action(detail=True, methods=['get', 'post'])
     def download(self, request, username=None, pk=None):
-        """Increment download count"""
+        """
+        GET streams the file (with Range support, see delivery.py) and
+        counts the download; POST only counts it, for clients that link
+        to the media URL
+        """
         resource = self.get_object()
-        resource.downloads += 1
-        resource.save(update_fields=['downloads'])
-        return Response({'status': 'download count updated'})
+        if request.method == 'POST':
+            counters.increment(Resource, 'downloads', resource.pk)
+            return Response({'status': 'download count updated'})
+        response = delivery.file_response(
+            request, resource.file, delivery.download_name(resource.title, resource.file.name)
+        )
+        if response.status_code in (200, 206) and delivery.is_new_download(request):
+            # A cache increment; the database is updated by the counter flush
+            counters.increment(Resource, 'downloads', resource.pk)
+        return response
 
 
-class NewsletterSubscribeView(generics.CreateAPIView):
+class ResumeView(PortfolioLookupMixin, APIView):
+    """
+    API endpoint for downloading a portfolio's resume, with Range support
+    """
+    
+    def perform_content_negotiation(self, request, force=False):
+        return super().perform_content_negotiation(request, force=True)
+    
+    def get(self, request, username=None):
+        about = About.objects.filter(portfolio_id=self.get_portfolio_id()).only('resume_file').first()
+        if about is None or not about.resume_file:
+            raise NotFound
+        return delivery.file_response(
+            request, about.resume_file, delivery.download_name(f'{username}-resume', about.resume_file.name)
+        )
+
+
+class FacetViewSet(PortfolioLookupMixin, ConditionalGetMixin, CachedResponseMixin, viewsets.ViewSet):
+    """
+    API endpoint for tag and technology counts within a portfolio.
+    Counts are maintained on save/delete, so this never scans posts.
+    """
+    cached_actions = ('list',)
+    conditional_actions = ('list',)
+    
+    def get_content_state(self):
+        return portfolio_content_state(self.kwargs['username'])
+    
+    def list(self, request, username=None):
+        portfolio_id = self.get_portfolio_id()
+        tags = TagFacet.objects.filter(portfolio_id=portfolio_id, count__gt=0).order_by('-count', 'name')
+        technologies = TechnologyFacet.objects.filter(portfolio_id=portfolio_id, count__gt=0).order_by('-count', 'name')
+        return Response({
+            'tags': dict(tags.values_list('name', 'count')),
+            'technologies': dict(technologies.values_list('name', 'count')),
+        })
+
+
+class SearchViewSet(PortfolioLookupMixin, ConditionalGetMixin, CachedResponseMixin, viewsets.ViewSet):
+    """
+    API endpoint for full-text search over published blog posts and
+    projects (including case studies) within a portfolio
+    """
+    cached_actions = ('list',)
+    conditional_actions = ('list',)
+    max_limit = 50
+    
+    def get_content_state(self):
+        return portfolio_content_state(self.kwargs['username'])
+    
+    def list(self, request, username=None):
+        portfolio_id = self.get_portfolio_id()
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), self.max_limit)
+        except ValueError:
+            limit = 20
+        return Response({'query': query, 'results': search.search(username, portfolio_id, query, limit)})
+
+
+class NewsletterSubscribeView(PortfolioLookupMixin, generics.CreateAPIView):
     """
     API endpoint for newsletter subscription
     """
     serializer_class = NewsletterSerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'newsletter'
     
     def create(self, request, *args, **kwargs):
-        username = self.kwargs.get('username')
-        portfolio = get_object_or_404(Portfolio, username=username, is_active=True)
+        portfolio_id = self.get_portfolio_id()
         
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
+        if coalescing.buffer('newsletter', portfolio_id=portfolio_id, **serializer.validated_data):
+            # Whether it is new is only known once the buffer is written
+            return Response(
+                {'message': 'Subscription received'},
+                status=status.HTTP_202_ACCEPTED
+            )
+        
         # Check if already subscribed
         email = serializer.validated_data['email']
         subscriber, created = Newsletter.objects.get_or_create(
-            portfolio=portfolio,
+            portfolio_id=portfolio_id,
             email=email,
             defaults={'name': serializer.validated_data.get('name', '')}
         )
         
         if created:
+            jobs.enqueue(
+                notifications.send_newsletter_confirmation, subscriber_id=subscriber.pk,
+                key=f'newsletter-confirmation:{subscriber.pk}',
+            )
             return Response(
                 {'message': 'Successfully subscribed to newsletter'},
                 status=status.HTTP_201_CREATED
@@ -133,6 +361,11 @@ class NewsletterSubscribeView(generics.CreateAPIView):
             if not subscriber.is_active:
                 subscriber.is_active = True
                 subscriber.save()
+                # At most one confirmation per subscriber and day
+                jobs.enqueue(
+                    notifications.send_newsletter_confirmation, subscriber_id=subscriber.pk,
+                    key=f'newsletter-confirmation:{subscriber.pk}:{timezone.now().date()}',
+                )
                 return Response(
                     {'message': 'Successfully resubscribed to newsletter'},
                     status=status.HTTP_200_OK
@@ -143,23 +376,57 @@ class NewsletterSubscribeView(generics.CreateAPIView):
             )
 
 
-class ContactMessageView(generics.CreateAPIView):
+class NewsletterExportView(APIView):
+    """
+    API endpoint for exporting a portfolio's newsletter subscribers as a
+    streamed CSV or NDJSON file; for the portfolio's owner and staff.
+    Pass ?active=1 for active subscribers only.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def perform_content_negotiation(self, request, force=False):
+        # The body is a file in the format named by the URL
+        return super().perform_content_negotiation(request, force=True)
+    
+    def get(self, request, username=None, fmt=None):
+        if fmt not in subscribers.STREAMS:
+            raise NotFound
+        portfolio = get_object_or_404(Portfolio, username=username)
+        if not (request.user.is_staff or portfolio.user_id == request.user.pk):
+            raise PermissionDenied
+        queryset = Newsletter.objects.filter(portfolio=portfolio)
+        if request.query_params.get('active') in ('1', 'true'):
+            queryset = queryset.filter(is_active=True)
+        return subscribers.export_response(request, queryset, fmt, f'{username}-subscribers')
+
+
+class ContactMessageView(PortfolioLookupMixin, generics.CreateAPIView):
     """
     API endpoint for contact form messages
     """
     serializer_class = ContactMessageSerializer
+    throttle_classes = [TokenBucketThrottle]
+    throttle_scope = 'contact'
     
     def create(self, request, *args, **kwargs):
-        username = self.kwargs.get('username')
-        portfolio = get_object_or_404(Portfolio, username=username, is_active=True)
+        portfolio_id = self.get_portfolio_id()
         
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         
-        ContactMessage.objects.create(
-            portfolio=portfolio,
+        if coalescing.buffer('contact', portfolio_id=portfolio_id, **serializer.validated_data):
+            return Response(
+                {'message': 'Message sent successfully'},
+                status=status.HTTP_202_ACCEPTED
+            )
+        
+        message = ContactMessage.objects.create(
+            portfolio_id=portfolio_id,
             **serializer.validated_data
         )
+        jobs.enqueue(
+            notifications.notify_contact_message, message_id=message.pk, key=f'contact-message:{message.pk}'
+        )
         
         return Response(
             {'message': 'Message sent successfully'},
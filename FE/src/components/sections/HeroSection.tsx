@@ -1,6 +1,7 @@
 import React from 'react';
 import { ArrowDown, Download, Mail, Github, Linkedin, Globe } from 'lucide-react';
 import type { Portfolio } from '../../types';
+import { portfolioAPI } from '../../services/api';
 
 interface HeroSectionProps {
   portfolio: Portfolio;
@@ -76,7 +77,7 @@ const HeroSection: React.FC<HeroSectionProps> = ({ portfolio }) => {
 
               {about?.resume_file && (
                 <a
-                  href={about.resume_file}
+                  href={portfolioAPI.resumeUrl(username)}
                   download
                   className="btn-outline flex items-center gap-2"
                 >
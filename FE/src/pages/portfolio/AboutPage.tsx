@@ -1,12 +1,14 @@
 import React from 'react';
 import { MapPin, Mail, Phone, ExternalLink, Download } from 'lucide-react';
 import type { About } from '../../types';
+import { portfolioAPI } from '../../services/api';
 
 interface AboutPageProps {
+  username: string;
   about?: About;
 }
 
-const AboutPage: React.FC<AboutPageProps> = ({ about }) => {
+const AboutPage: React.FC<AboutPageProps> = ({ username, about }) => {
   if (!about) {
     return (
       <div className="section-padding">
@@ -149,7 +151,7 @@ const AboutPage: React.FC<AboutPageProps> = ({ about }) => {
             {about.resume_file && (
               <div className="mt-8 text-center">
                 <a
-                  href={about.resume_file}
+                  href={portfolioAPI.resumeUrl(username)}
                   download
                   className="btn-primary inline-flex items-center gap-2"
                 >
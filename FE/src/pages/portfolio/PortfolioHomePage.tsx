@@ -2,6 +2,7 @@ import React from 'react';
 import { Link } from 'react-router-dom';
 import { ArrowRight, Download, Mail } from 'lucide-react';
 import type { Portfolio } from '../../types';
+import { portfolioAPI } from '../../services/api';
 import TimelineSection from '../../components/sections/TimelineSection';
 
 interface PortfolioHomePageProps {
@@ -61,7 +62,7 @@ const PortfolioHomePage: React.FC<PortfolioHomePageProps> = ({ portfolio }) => {
               
               {about?.resume_file && (
                 <a
-                  href={about.resume_file}
+                  href={portfolioAPI.resumeUrl(username)}
                   download
                   className="btn-outline flex items-center gap-2"
                 >
@@ -77,7 +77,7 @@ const PortfolioRouter: React.FC = () => {
     <PortfolioLayout username={portfolio.username} name={portfolio.name} profileImage={portfolio.profile_image}>
       <Routes>
         <Route path="/" element={<PortfolioHomePage portfolio={portfolio} />} />
-        <Route path="/about" element={<AboutPage about={portfolio.about} />} />
+        <Route path="/about" element={<AboutPage username={portfolio.username} about={portfolio.about} />} />
         <Route path="/projects" element={<ProjectsPage projects={portfolio.projects} />} />
         <Route path="/skills" element={<SkillsPage skills={portfolio.skills} />} />
         <Route path="/achievements" element={<AchievementsPage achievements={portfolio.achievements} />} />
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { Portfolio, BlogPost, Project, ContactFormData, NewsletterFormData, CompanyProfile, FeaturedDeveloper } from '../types';
+import type { Portfolio, BlogPost, Project, ContactFormData, NewsletterFormData, CompanyProfile, FeaturedDeveloper, PageBundle } from '../types';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
@@ -13,6 +13,14 @@ const api = axios.create({
 export const portfolioAPI = {
   // Get portfolio by username
   getPortfolio: async (username: string): Promise<Portfolio> => {
+    // Pages pre-rendered by `manage.py export_static` inline the portfolio
+    const inlined = document.getElementById('portfolio-data');
+    if (inlined?.textContent) {
+      const data: Portfolio = JSON.parse(inlined.textContent);
+      if (data.username === username) {
+        return data;
+      }
+    }
     const response = await api.get(`/api/portfolios/${username}/`);
     return response.data;
   },
@@ -53,6 +61,22 @@ export const portfolioAPI = {
     return response.data;
   },
 
+  // Get several page payloads in one request
+  getBundle: async (
+    username: string,
+    include: (keyof PageBundle)[] = ['portfolio', 'featured_projects', 'featured_posts'],
+  ): Promise<PageBundle> => {
+    const response = await api.get(`/api/${username}/bundle/`, { params: { include: include.join(',') } });
+    return response.data;
+  },
+
+  // Resume download (supports Range, so interrupted downloads resume)
+  resumeUrl: (username: string): string => `${API_BASE_URL}/api/${username}/resume/`,
+
+  // Resource download; the server counts it
+  resourceDownloadUrl: (username: string, resourceId: number): string =>
+    `${API_BASE_URL}/api/${username}/resources/${resourceId}/download/`,
+
   // Subscribe to newsletter
   subscribeNewsletter: async (username: string, data: NewsletterFormData): Promise<{ message: string }> => {
     const response = await api.post(`/api/${username}/newsletter/subscribe/`, data);
@@ -186,3 +186,11 @@ export interface FeaturedDeveloper {
   featured_since: string;
   updated_at: string;
 }
+
+export interface PageBundle {
+  portfolio?: Portfolio;
+  featured_projects?: Project[];
+  featured_posts?: BlogPost[];
+  company_profile?: CompanyProfile | null;
+  featured_developers?: FeaturedDeveloper[];
+}